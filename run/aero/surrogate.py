@@ -0,0 +1,227 @@
+"""Quadratic response surface stand-in for ADflow, fitted to recorded ADflow runs"""
+
+# Standard Python modules
+from itertools import combinations_with_replacement
+
+# External modules
+from mphys.builder import Builder
+import numpy as np
+import openmdao.api as om
+
+# Local modules
+from utils.point_specs import DV_UNITS
+
+# Functions that ADflow computes in the aero_post group instead of the coupling group
+POST_FUNCS = ["cd", "cl", "drag"]
+
+
+class QuadraticSurrogate:
+    """
+    Least squares fit of a full quadratic polynomial to a set of samples.
+
+    The inputs are normalized to [-1, 1] over the range of the samples
+    before the fit. Inputs that do not vary between the samples only enter
+    through the constant term. If there are fewer samples than terms, the
+    minimum norm fit is used, so a few samples still give a usable (if
+    crude) model.
+
+    Parameters
+    ----------
+    X : ndarray
+        Input samples with shape (n_samples, n_inputs).
+    Y : ndarray
+        Output samples with shape (n_samples, n_outputs).
+    """
+
+    def __init__(self, X, Y):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        Y = np.asarray(Y, dtype=float).reshape(X.shape[0], -1)
+
+        lower = X.min(axis=0)
+        upper = X.max(axis=0)
+        self.center = 0.5 * (upper + lower)
+        self.scale = 0.5 * (upper - lower)
+        self.scale[self.scale == 0.0] = 1.0
+
+        self.n_inputs = X.shape[1]
+        self.pairs = list(combinations_with_replacement(range(self.n_inputs), 2))
+        self.coeffs = np.linalg.lstsq(self._basis(self._normalize(X)), Y, rcond=None)[0]
+
+    def _normalize(self, X):
+        return (X - self.center) / self.scale
+
+    def _basis(self, Z):
+        quad = [Z[:, i] * Z[:, j] for i, j in self.pairs]
+        return np.column_stack([np.ones(Z.shape[0]), Z] + quad)
+
+    def evaluate(self, x):
+        """Returns the outputs at one input point."""
+        z = self._normalize(np.atleast_2d(x))
+        return (self._basis(z) @ self.coeffs)[0]
+
+    def jacobian(self, x):
+        """Returns the derivatives of the outputs wrt the inputs at one input point."""
+        z = self._normalize(np.asarray(x).ravel())
+        n = self.n_inputs
+
+        # Derivatives of the basis wrt the normalized inputs
+        dB = np.zeros((1 + n + len(self.pairs), n), dtype=z.dtype)
+        dB[1 : n + 1] = np.eye(n)
+        for k, (i, j) in enumerate(self.pairs):
+            dB[1 + n + k, i] += z[j]
+            dB[1 + n + k, j] += z[i]
+
+        return (self.coeffs.T @ dB) / self.scale
+
+
+class SurrogateAeroComp(om.ExplicitComponent):
+    """Evaluates a QuadraticSurrogate for a set of ADflow functionals."""
+
+    def initialize(self):
+        self.options.declare("surrogate", types=QuadraticSurrogate, recordable=False, desc="The fitted surrogate")
+        self.options.declare("input_names", types=list, desc="Names of the aero DVs in the order of the fit")
+        self.options.declare("output_names", types=list, desc="Names of the functionals in the order of the fit")
+
+    def setup(self):
+        for name in self.options["input_names"]:
+            self.add_input(name, units=DV_UNITS[name])
+
+        # ADflow returns its functionals without units, so the surrogate does the same
+        for name in self.options["output_names"]:
+            self.add_output(name)
+
+        self.declare_partials("*", "*")
+
+    def _get_x(self, inputs):
+        return np.array([inputs[name][0] for name in self.options["input_names"]])
+
+    def compute(self, inputs, outputs):
+        y = self.options["surrogate"].evaluate(self._get_x(inputs))
+        for name, val in zip(self.options["output_names"], y):
+            outputs[name] = val
+
+    def compute_partials(self, inputs, partials):
+        jac = self.options["surrogate"].jacobian(self._get_x(inputs))
+        for i, out_name in enumerate(self.options["output_names"]):
+            for j, in_name in enumerate(self.options["input_names"]):
+                partials[out_name, in_name] = jac[i, j]
+
+
+class SurrogateAeroGroup(om.Group):
+    """Takes the place of the ADflow coupling or post group. The ADflow specific calls are accepted and ignored."""
+
+    def initialize(self):
+        self.options.declare("surrogate", types=QuadraticSurrogate, recordable=False, desc="The fitted surrogate")
+        self.options.declare("input_names", types=list, desc="Names of the aero DVs in the order of the fit")
+        self.options.declare("output_names", types=list, desc="Names of the functionals in the order of the fit")
+
+    def setup(self):
+        self.add_subsystem(
+            "surrogate",
+            SurrogateAeroComp(
+                surrogate=self.options["surrogate"],
+                input_names=self.options["input_names"],
+                output_names=self.options["output_names"],
+            ),
+            promotes=["*"],
+        )
+
+    def mphys_set_ap(self, ap):
+        self.ap = ap
+
+    def mphys_add_prop_funcs(self, prop_funcs):
+        missing = sorted(set(prop_funcs) - set(self.options["output_names"]))
+        if len(missing) > 0:
+            raise ValueError(f"The aero surrogate has no data for the functions {missing}")
+
+
+class AeroSurrogateBuilder(Builder):
+    """
+    Builds surrogate aero groups from a file of recorded ADflow samples.
+
+    The file is written by save_samples and holds the input and output
+    samples of the coupling and post groups for one point. The surrogates
+    are fitted when the builder is initialized.
+    """
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+
+    def initialize(self, comm):
+        with np.load(self.data_file) as data:
+            self.input_names = [str(name) for name in data["input_names"]]
+            self.coupling_funcs = [str(name) for name in data["coupling_names"]]
+            self.post_funcs = [str(name) for name in data["post_names"]]
+
+            self.coupling_surrogate = QuadraticSurrogate(data["X"], data["Y_coupling"])
+            self.post_surrogate = QuadraticSurrogate(data["X"], data["Y_post"])
+
+    def get_mesh_coordinate_subsystem(self, scenario_name=None):
+        # There is no mesh, but parallel scenarios still add this subsystem
+        return om.Group()
+
+    def get_coupling_group_subsystem(self, scenario_name=None):
+        return SurrogateAeroGroup(
+            surrogate=self.coupling_surrogate, input_names=self.input_names, output_names=self.coupling_funcs
+        )
+
+    def get_post_coupling_subsystem(self, scenario_name=None):
+        return SurrogateAeroGroup(
+            surrogate=self.post_surrogate, input_names=self.input_names, output_names=self.post_funcs
+        )
+
+
+def get_input_names(model):
+    """Returns the names of the aero DVs that the surrogate is fitted to for a fan model."""
+    if model == "az":
+        return ["alpha", "mach", "altitude", "thrust", "heat"]
+    return ["alpha", "mach", "altitude", "Ps", "Ptot", "Ttot"]
+
+
+def read_recorder(case_file, scenario_path, input_names, coupling_funcs, post_funcs=POST_FUNCS):
+    """
+    Reads the samples of one scenario from the driver cases of a recorder file.
+
+    Cases that do not have all of the variables are skipped.
+
+    Returns
+    -------
+    X, Y_coupling, Y_post : ndarray
+        The input and output samples.
+    """
+    cr = om.CaseReader(case_file)
+
+    coupling = f"{scenario_path}.coupling.aero"
+    post = f"{scenario_path}.aero_post"
+
+    X, Y_coupling, Y_post = [], [], []
+    for case_id in cr.list_cases("driver", recurse=False, out_stream=None):
+        case = cr.get_case(case_id)
+        try:
+            x = [case.get_val(f"{coupling}.{name}", units=DV_UNITS[name])[0] for name in input_names]
+            y_coupling = [case.get_val(f"{coupling}.{name}")[0] for name in coupling_funcs]
+            y_post = [case.get_val(f"{post}.{name}")[0] for name in post_funcs]
+        except KeyError:
+            continue
+
+        X.append(x)
+        Y_coupling.append(y_coupling)
+        Y_post.append(y_post)
+
+    if len(X) == 0:
+        raise ValueError(f"No driver case in {case_file} has all of the aero variables of {scenario_path}")
+
+    return np.array(X), np.array(Y_coupling), np.array(Y_post)
+
+
+def save_samples(data_file, input_names, coupling_funcs, post_funcs, X, Y_coupling, Y_post):
+    """Writes samples to a file that AeroSurrogateBuilder can read."""
+    np.savez(
+        data_file,
+        input_names=np.array(input_names),
+        coupling_names=np.array(coupling_funcs),
+        post_names=np.array(post_funcs),
+        X=np.asarray(X, dtype=float),
+        Y_coupling=np.asarray(Y_coupling, dtype=float),
+        Y_post=np.asarray(Y_post, dtype=float),
+    )
@@ -4,25 +4,89 @@ import os
 # External modules
 from adflow.mphys import ADflowBuilder
 from baseclasses import AeroProblem
-from mphys.multipoint import Multipoint
+from mphys.multipoint import Multipoint, MultipointParallel
 from mphys.scenario_aeropropulsive import ScenarioAeropropulsive
 from mpi4py import MPI
 import numpy as np
 import openmdao.api as om
-from pygeo.mphys import OM_DVGEOCOMP
 
 # Local modules
+from aero.surrogate import AeroSurrogateBuilder
 from bc_coupling import BCCouplingBuilder
+from geometry.embedding_cache import EmbeddingCache
+from geometry.geo_builder import VSPGeometryBuilder
 from geometry.geo_comps import GeoLink
 from geometry.geo_vars import geo_vars
+from geometry.thickness import BatchedThicknessDVGeoComp
+from geometry.vsp_jacobian import LazyVSPJacobian
 from propulsion.propulsion_group import PoddedFanBuilder
+from utils.phase_timer import PhaseTimer
+from utils.coupling_solver import InterfaceAcceleratedNLBGS
 from utils.point_specs import AREA_REF, CHORD_REF, DV_UNITS, get_point_specs
+from utils.startup_timer import startup_phase
+from utils.surface_files import use_binary_surfaces
+
+# Functions that can be added to every ADflow integration surface
+FUNCS = [
+    "mdot",
+    "mavgptot",
+    "aavgptot",
+    "mavgttot",
+    "mavgps",
+    "aavgps",
+    "mavgmn",
+    "forcexpressure",
+    "forcexmomentum",
+    "forcexviscous",
+    "area",
+    "mavgvx",
+    "mavgvy",
+    "mavgvz",
+    "fx",
+    "fy",
+    "fz",
+]
+
+# Connections from the ADflow functionals to propulsion
+AERO_TO_PROP_CONN = {
+    "aavgptot_fan_face": "aero:P_tot:fan_face",
+    "aavgptot_fan_exit": "aero:P_tot:fan_exit",
+    "aavgps_fan_face": "aero:P_stat:fan_face",
+    "area_fan_face": "aero:half_area:fan_face",  # half
+    "area_fan_exit": "aero:half_area:fan_exit",  # half
+    "mdot_fan_exit": "aero:half_mdot:fan_exit",  # half
+    "mdot_fan_face": "aero:half_mdot:fan_face",  # half
+    "mavgvx_fan_face": "aero:V:fan_face",
+    "drag_wall": "aero:half_drag",  # half
+}
+
+# Connections from the ADflow functionals to the BC coupling component
+AERO_TO_BC_CONN = {
+    "aavgps_fan_exit": "aero:P_stat:fan_exit",
+    "aavgps_fan_face": "aero:P_stat:fan_face",
+    "mavgvx_fan_exit": "aero:V:fan_exit",
+    "mavgvx_fan_face": "aero:V:fan_face",
+    "mavgttot_fan_exit": "aero:T_tot:fan_exit",
+    "mavgttot_fan_face": "aero:T_tot:fan_face",
+    "aavgptot_fan_exit": "aero:P_tot:fan_exit",
+}
 
 # --- Get MPI info ---
 COMM = MPI.COMM_WORLD
 RANK = COMM.rank
 
 
+class ParallelScenarios(MultipointParallel):
+    """Runs the scenarios of all points concurrently, each on its own subset of the comm."""
+
+    def initialize(self):
+        self.options.declare("scenarios", types=dict, recordable=False, desc="Scenarios keyed by the point name")
+
+    def setup(self):
+        for point, scenario in self.options["scenarios"].items():
+            self.mphys_add_scenario(point, scenario)
+
+
 class Top(Multipoint):
     def initialize(self):
         self.options.declare("model", default="bc", values=["az", "bc"], desc="Model type, either az or bc")
@@ -30,13 +94,71 @@ class Top(Multipoint):
         self.options.declare("input_dir", default="./INPUT", types=str, desc="Input directory")
         self.options.declare("level", default="L2", values=["L0", "L0.5", "L1", "L1.5", "L2"], desc="Mesh level")
         self.options.declare("multiblock", default=False, types=bool, desc="Flag to use multiblock meshes.")
-        self.options.declare("debug", default=False, types=bool, desc="Flag to run in debugging mode.")
+        self.options.declare(
+            "debug", default=False, types=bool, desc="Flag to run in debugging mode. Computes all ADflow functionals."
+        )
         self.options.declare(
             "feedfwd", default=False, types=bool, desc="Flag to use feed-forward coupling.  Only works for az version"
         )
         self.options.declare(
             "target_net_thrust", default=6000, desc="Target net thrust"
         )
+        self.options.declare(
+            "parallel", default=False, types=bool, desc="Flag to evaluate the points in parallel on split comms."
+        )
+        self.options.declare(
+            "aero_surrogate",
+            default=None,
+            types=(str, type(None)),
+            desc="File with recorded ADflow samples. If given, a surrogate fitted to them replaces ADflow "
+            "and the geometry is left out.",
+        )
+        self.options.declare(
+            "timing", default=False, types=bool, desc="Flag to time the subsystems and write a trace to output_dir/timing"
+        )
+        self.options.declare(
+            "fast_fan",
+            default=False,
+            types=bool,
+            desc="Flag to use the closed form fan model instead of the pyCycle one in the coupling",
+        )
+        self.options.declare(
+            "coupling_acceleration",
+            default="none",
+            values=["none", "aitken", "anderson"],
+            desc="Acceleration of the fan heat in the NLBGS coupling of the az version",
+        )
+        self.options.declare(
+            "aero_funcs",
+            default=[],
+            types=list,
+            desc="ADflow functionals to compute in addition to the connected ones and the responses",
+        )
+        self.options.declare(
+            "write_constraints",
+            default=False,
+            types=bool,
+            desc="Flag to write the thickness constraints to a Tecplot file in output_dir",
+        )
+        self.options.declare(
+            "geo_cache",
+            default=None,
+            types=(str, type(None)),
+            desc="Directory to cache the embedding of the mesh in the VSP geometry in. None embeds it every setup.",
+        )
+        self.options.declare(
+            "binary_surfaces",
+            default=False,
+            types=bool,
+            desc="Flag to map the binary copies of the integration surface and actuator zone files if there are any",
+        )
+        self.options.declare(
+            "vsp_fd_workers",
+            default=0,
+            types=int,
+            desc="Number of local processes to finite difference the VSP geometry with. 0 spreads the DVs over the "
+            "procs of the geometry instead.",
+        )
 
     def setup(self):
         # --- Read in the options ---
@@ -46,6 +168,10 @@ class Top(Multipoint):
         level = self.options["level"]
         mb = self.options["multiblock"]
         feedfwd = self.options["feedfwd"]
+        parallel = self.options["parallel"]
+        aero_surrogate = self.options["aero_surrogate"]
+        debug = self.options["debug"]
+        fast_fan = self.options["fast_fan"]
 
         # Set some useful vars based on the options
         self.mb_mesh = "_mb" if mb else ""
@@ -53,11 +179,15 @@ class Top(Multipoint):
         # --- Get the inital values ---
         self.init_values = get_point_specs(feedfwd=feedfwd)
 
+        # We build one scenario for every point in the specs
+        self.points = list(self.init_values.alpha.keys())
+
         ##############################
         # Aero
         ##############################
         # Set the grid file
         grid_file = os.path.join(input_dir, "volume_mesh", f"pod{self.mb_mesh}_v2_{model}_vol_{level}.cgns")
+        self.grid_file = grid_file
 
         # Default ADflow options
         aero_options = {
@@ -128,80 +258,298 @@ class Top(Multipoint):
         # Mesh options for IDWarp
         mesh_options = {"gridFile": grid_file, "LdefFact":15.0}
 
-        # Create the Aero Builder
-        self.aero_builder = ADflowBuilder(
-            options=aero_options,
-            mesh_options=mesh_options,
-            scenario="aeropropulsive",
-            err_on_convergence_fail={"az": False, "bc": True}[model],
-            restart_failed_analysis={"az": False, "bc": True}[model],
-        )
-        self.aero_builder.initialize(self.comm)
+        # Create the Aero Builder. In parallel, every point gets its own solver that the scenario
+        # initializes on its comm, in serial all points share the same solver.
+        def get_aero_builder():
+            if aero_surrogate is not None:
+                return AeroSurrogateBuilder(aero_surrogate)
+
+            return ADflowBuilder(
+                options=aero_options.copy(),
+                mesh_options=mesh_options.copy(),
+                scenario="aeropropulsive",
+                err_on_convergence_fail={"az": False, "bc": True}[model],
+                restart_failed_analysis={"az": False, "bc": True}[model],
+            )
+
+        with startup_phase("setup: aero builders"):
+            if parallel:
+                self.aero_builders = {point: get_aero_builder() for point in self.points}
+            else:
+                self.aero_builder = get_aero_builder()
+                self.aero_builder.initialize(self.comm)
+                self.aero_builders = {point: self.aero_builder for point in self.points}
 
         ##############################
         # Propulsion
         ##############################
-        prop_builder = PoddedFanBuilder(fan_model=model, outdir=output_dir)
+        prop_builder = PoddedFanBuilder(fan_model=model, outdir=output_dir, debug=debug, fast_fan=fast_fan)
         prop_builder.initialize(self.comm)
 
         ##############################
         # BC Coupling
         ##############################
-        bc_coupling_builder = BCCouplingBuilder() if model == "bc" else None
+        bc_coupling_builder = BCCouplingBuilder(outdir=output_dir, debug=debug) if model == "bc" else None
 
         ##############################
         # Mphys
         ##############################
         # Add IVC's for design variables of different disciplines
         self.add_subsystem("aero_dvs", om.IndepVarComp())
-        self.add_subsystem("geo_dvs", om.IndepVarComp())
 
         ##############################
         # Geometry
         ##############################
-        # Add the geometry linking component
-        self.add_subsystem("geo_link", GeoLink())
-
-        # Add the mesh component
-        self.add_subsystem("mesh", self.aero_builder.get_mesh_coordinate_subsystem())
-
-        # Geometry with VSP
-        self.add_subsystem(
-            "geo",
-            OM_DVGEOCOMP(
-                file=os.path.join(input_dir, "pod_v2.vsp3"),
-                type="vsp",
-                options={"scale": 0.0254, "comps": ["Nacelle", "Core"], "projTol": 0.01},
-            ),
-        )
+        # The geometric DVs and the linking component, the surrogate has no geometry to set
+        if aero_surrogate is None:
+            self.add_subsystem("geo_dvs", om.IndepVarComp())
+            self.add_subsystem("geo_link", GeoLink())
+
+        geo_file = os.path.join(input_dir, "pod_v2.vsp3")
+        geo_options = {"scale": 0.0254, "comps": ["Nacelle", "Core"], "projTol": 0.01}
+
+        if parallel:
+            # Each scenario adds its own mesh and geometry on its comm
+            scenarios = {}
+            for point in self.points:
+                scenarios[point] = ScenarioAeropropulsive(
+                    aero_builder=self.aero_builders[point],
+                    prop_builder=PoddedFanBuilder(fan_model=model, outdir=output_dir, debug=debug, fast_fan=fast_fan),
+                    balance_builder=BCCouplingBuilder(outdir=output_dir, debug=debug) if model == "bc" else None,
+                    geometry_builder=VSPGeometryBuilder(geo_file, options=geo_options) if aero_surrogate is None else None,
+                    in_MultipointParallel=True,
+                )
+
+            self.add_subsystem("multipoint", ParallelScenarios(scenarios=scenarios))
 
-        # Add Scenario for cruise0 point
-        self.mphys_add_scenario(
-            "cruise0",
-            ScenarioAeropropulsive(
-                aero_builder=self.aero_builder, prop_builder=prop_builder, balance_builder=bc_coupling_builder
-            ),
-        )
+        else:
+            # The surrogate does not depend on the shape, so it needs neither mesh nor geometry
+            if aero_surrogate is None:
+                # Add the mesh component
+                self.add_subsystem("mesh", self.aero_builder.get_mesh_coordinate_subsystem())
+
+                # Geometry with VSP
+                self.add_subsystem("geo", BatchedThicknessDVGeoComp(file=geo_file, type="vsp", options=geo_options))
+
+            # Add a scenario for each point
+            for point in self.points:
+                self.mphys_add_scenario(
+                    point,
+                    ScenarioAeropropulsive(
+                        aero_builder=self.aero_builder, prop_builder=prop_builder, balance_builder=bc_coupling_builder
+                    ),
+                )
+
+    def scenario_path(self, point):
+        """Returns the path of the scenario for a point relative to the top of the model."""
+        return f"multipoint.{point}" if self.options["parallel"] else point
+
+    def geo_path(self, point):
+        """Returns the path of the geometry component used by a point relative to the top of the model."""
+        return f"multipoint.{point}.geometry" if self.options["parallel"] else "geo"
+
+    def _az_file(self):
+        """Returns the actuator zone file of the mesh level."""
+        return os.path.join(self.options["input_dir"], "actuator_zone", f"actuator_{self.options['level']}.xyz")
+
+    def _int_surf_files(self):
+        """Returns the integration surface files of the mesh level keyed by the surface name."""
+        model = self.options["model"]
+        level = self.options["level"]
+
+        # Names need to be different for fan face and fan exit int surfs
+        # depending on the fan model.  This is due to the difference in
+        # the BC and AZ mesh.
+        fan_face_name = "fan_face" if model == "az" else "fan_face_mysurf"
+        fan_exit_name = "fan_exit" if model == "az" else "fan_exit_mysurf"
+        # These are added for both the AZ and BC versions
+        int_surf_files = {
+            fan_face_name: f"fan_face_{level}_R2.xyz",
+            fan_exit_name: f"fan_exit_{level}_R2.xyz",
+            "inlet": f"inlet_{level}.xyz",
+            "nozzle": f"nozzle_{level}.xyz",
+        }
+        surf_dir = os.path.join(self.options["input_dir"], "integration_surfaces")
+        return {surf: os.path.join(surf_dir, file_name) for surf, file_name in int_surf_files.items()}
+
+    def input_files(self):
+        """Returns the input files the model reads. The surrogate replaces the mesh, geometry and surface files."""
+        if self.options["aero_surrogate"] is not None:
+            return [self.options["aero_surrogate"]]
+
+        files = [self.grid_file, os.path.join(self.options["input_dir"], "pod_v2.vsp3")]
+        if self.options["model"] == "az":
+            files.append(self._az_file())
+        return files + list(self._int_surf_files().values())
 
     def configure(self):
         # --- Read in the options ---
         model = self.options["model"]
-        output_dir = self.options["output_dir"]
-        input_dir = self.options["input_dir"]
-        level = self.options["level"]
-        debug = self.options["debug"]
         target_net_thrust = self.options["target_net_thrust"]
         feedfwd = self.options["feedfwd"]
+        parallel = self.options["parallel"]
+        aero_surrogate = self.options["aero_surrogate"]
+
+        # --- Get the scenarios that live on this proc ---
+        if parallel:
+            self.local_scenarios = {scenario.name: scenario for scenario in self.multipoint._subsystems_myproc}
+        else:
+            self.local_scenarios = {point: getattr(self, point) for point in self.points}
 
         ##############################
         # CFD Config
         ##############################
-        # --- Get the CFD Solver from the aero builder ---
-        CFDSolver = self.aero_builder.solver
+        # Only the ADflow functionals that are connected or used as responses are computed, unless debugging
+        consumed_funcs = None if self.options["debug"] else self._consumed_funcs()
+
+        # Configure each solver on this proc once. In serial this is the single shared solver.
+        configured_builders = []
+        for point in self.local_scenarios:
+            aero_builder = self.aero_builders[point]
+            if aero_builder not in configured_builders:
+                if aero_surrogate is None:
+                    with startup_phase("configure: CFD solver"):
+                        coupling_funcs = self._setup_cfd_solver(aero_builder.solver, consumed_funcs)
+                else:
+                    coupling_funcs = aero_builder.coupling_funcs
+                configured_builders.append(aero_builder)
+
+        # Keep a handle on the local solver and its functions for the run script
+        self.aero_builder = configured_builders[0]
+        self.coupling_funcs = coupling_funcs
+
+        # Create a list to store function names for functions that are
+        # computed in the aero_post group
+        aero_post_funcs = ["cl", "cd", "drag"]
+
+        ##############################
+        # Scenario Config
+        ##############################
+        self.aero_problems = {}
+        for point, scenario in self.local_scenarios.items():
+            # Create the aero problem
+            ap = AeroProblem(
+                name=f"{point}{self.mb_mesh}_{model}",
+                alpha=self.init_values.alpha[point],
+                mach=self.init_values.mach[point],
+                altitude=self.init_values.altitude[point],
+                areaRef=AREA_REF,
+                chordRef=CHORD_REF,
+                evalFuncs=sorted(aero_post_funcs.copy()),
+            )
+
+            # Add DV's common to both models
+            ap.addDV("alpha", value=self.init_values.alpha[point], name="alpha", units=DV_UNITS["alpha"])
+            ap.addDV("mach", value=self.init_values.mach[point], name="mach", units=DV_UNITS["mach"])
+            ap.addDV("altitude", value=self.init_values.altitude[point], name="altitude", units=DV_UNITS["altitude"])
+
+            # Actuator zone DVs
+            if model == "az":
+                ap.setBCVar("Thrust", self.init_values.thrust0[point], "actuator_region")
+                ap.addDV("Thrust", family="actuator_region", units=DV_UNITS["thrust"], name="thrust")
+
+                ap.setBCVar("Heat", self.init_values.heat0[point], "actuator_region")
+                ap.addDV("Heat", family="actuator_region", units=DV_UNITS["heat"], name="heat")
+
+            # Boundary condition DVs
+            else:
+                ap.setBCVar("Pressure", self.init_values.Ps0[point], "fan_face")
+                ap.addDV("Pressure", family="fan_face", units=DV_UNITS["Ps"], name="Ps")
+
+                ap.setBCVar("PressureStagnation", self.init_values.Ptot0[point], "fan_exit")
+                ap.addDV("PressureStagnation", family="fan_exit", units=DV_UNITS["Ptot"], name="Ptot")
+
+                ap.setBCVar("TemperatureStagnation", self.init_values.Ttot0[point], "fan_exit")
+                ap.addDV("TemperatureStagnation", family="fan_exit", units=DV_UNITS["Ttot"], name="Ttot")
+
+            # Set the aeroproblem for the groups in the scenario
+            self.aero_problems[point] = ap
+            scenario.coupling.aero.mphys_set_ap(ap)
+            scenario.aero_post.mphys_set_ap(ap)
+
+            # Add all of the functions for the coupling group
+            scenario.coupling.aero.mphys_add_prop_funcs(coupling_funcs)
+
+        # The IVC outputs and connections have to be the same on all procs,
+        # so these are done for every point and not only the local ones
+        for point in self.points:
+            self._connect_point(point, target_net_thrust)
+
+        ##############################
+        # Geometry Configuration
+        ##############################
+        # The surrogate has no mesh or geometry to configure
+        if aero_surrogate is None:
+            with startup_phase("configure: geometry"):
+                self._configure_geometry()
+
+        ################################################################################
+        # SOLVER OPTIONS
+        ################################################################################
+        for scenario in self.local_scenarios.values():
+            if model == "az" and not feedfwd:
+                # the actuator zone does a NLBGS iteartion until CFD and prop agree.
+                # The fan heat fed back to the actuator zone can be accelerated.
+                scenario.coupling.nonlinear_solver = InterfaceAcceleratedNLBGS(
+                    maxiter=10,
+                    use_apply_nonlinear=False,
+                    err_on_non_converge=True,
+                    atol=1e-2,
+                    rtol=1e-20,
+                    acceleration=self.options["coupling_acceleration"],
+                    interface=["prop.aero:half_delta_heat"],
+                )
+                scenario.coupling.linear_solver = om.LinearBlockGS(
+                    maxiter=4,
+                    atol=1e-20,
+                    rtol=1e-10,
+                )
+
+            else:
+                # the BC version currently on consistency constraints
+                scenario.coupling.nonlinear_solver = om.NonlinearRunOnce()
+                scenario.coupling.linear_solver = om.LinearRunOnce()
+
+            scenario.coupling.set_solver_print(level=2)
+            scenario.coupling.prop.podded_fan.set_solver_print(level=-1)
+            scenario.coupling.prop.podded_fan.set_solver_print(level=2, depth=1)
+            scenario.coupling.linear_solver.options["iprint"] = 2
+
+        # Opt-in timers for the subsystems. Everything is set up at this point, so they can be wrapped.
+        if self.options["timing"]:
+            self.phase_timer = PhaseTimer(self, os.path.join(self.options["output_dir"], "timing"))
+
+    def _consumed_funcs(self):
+        """Returns the names of the ADflow functionals that are connected, used as responses or requested."""
+        consumed_funcs = set(AERO_TO_PROP_CONN) | set(self.options["aero_funcs"])
+        if self.options["model"] == "az":
+            consumed_funcs.add("flowpower_actuator_region")
+        else:
+            consumed_funcs.update(AERO_TO_BC_CONN)
+
+        # Objectives and constraints that the run script added on the aero outputs, e.g. the fan face Mach number
+        for meta in self._responses.values():
+            if ".coupling.aero." in meta["name"]:
+                consumed_funcs.add(meta["name"].split(".")[-1])
+
+        return consumed_funcs
+
+    def _setup_cfd_solver(self, CFDSolver, consumed_funcs=None):
+        """Adds the actuator zone, integration surfaces and coupling functions to an ADflow solver.
+
+        Only the functions in consumed_funcs are added, or all of them if it is None.
+        Returns the sorted list of functions computed within the coupling loop.
+        """
+        model = self.options["model"]
+        debug = self.options["debug"]
+
+        # Map the surface files converted with convert_surfaces.py instead of parsing them on every proc
+        if self.options["binary_surfaces"]:
+            use_binary_surfaces(CFDSolver)
 
         # --- Actuator Zone ---
         if model == "az":
-            az_file = os.path.join(input_dir, "actuator_zone", f"actuator_{level}.xyz")
+            az_file = self._az_file()
             axis1 = np.array([0, 0, 0])
             axis2 = np.array([1, 0, 0])
             CFDSolver.addActuatorRegion(az_file, axis1, axis2, "actuator_region", thrust=10000.0, torque=0.0, heat=0.0)
@@ -209,34 +557,14 @@ class Top(Multipoint):
         # --- Add integration surfaces ---
         surfs = []
 
-        # Names need to be different for fan face and fan exit int surfs
-        # depending on the fan model.  This is due to the difference in
-        # the BC and AZ mesh.
-        fan_face_name = "fan_face" if model == "az" else "fan_face_mysurf"
-        fan_exit_name = "fan_exit" if model == "az" else "fan_exit_mysurf"
-        # These are added for both the AZ and BC versions
-        # Fan face
-        CFDSolver.addIntegrationSurface(
-            os.path.join(input_dir, "integration_surfaces", f"fan_face_{level}_R2.xyz"), fan_face_name
-        )
-        surfs.append(fan_face_name)
-
-        # Fan exit
-        CFDSolver.addIntegrationSurface(
-            os.path.join(input_dir, "integration_surfaces", f"fan_exit_{level}_R2.xyz"), fan_exit_name
-        )
-        surfs.append(fan_exit_name)
-
-        # Inlet
-        CFDSolver.addIntegrationSurface(os.path.join(input_dir, "integration_surfaces", f"inlet_{level}.xyz"), "inlet")
-        surfs.append("inlet")
-
-        # Nozzle
-        CFDSolver.addIntegrationSurface(
-            os.path.join(input_dir, "integration_surfaces", f"nozzle_{level}.xyz"), "nozzle"
-        )
-        surfs.append("nozzle")
+        def is_used(func, surf):
+            return consumed_funcs is None or f"{func}_{surf}" in consumed_funcs
 
+        for surf, surf_file in self._int_surf_files().items():
+            # A surface that none of the used functionals is integrated over is not added at all
+            if any(is_used(func, surf) for func in FUNCS):
+                CFDSolver.addIntegrationSurface(surf_file, surf)
+                surfs.append(surf)
 
         if model == "bc":
             surfs.append("fan_face")
@@ -245,151 +573,84 @@ class Top(Multipoint):
         # --- Finalize the integration surfaces ---
         CFDSolver.finalizeUserIntegrationSurfaces()
 
-        # --- Add functions to the surfaces ---
-        funcs = [
-            "mdot",
-            "mavgptot",
-            "aavgptot",
-            "mavgttot",
-            "mavgps",
-            "aavgps",
-            "mavgmn",
-            "forcexpressure",
-            "forcexmomentum",
-            "forcexviscous",
-            "area",
-            "mavgvx",
-            "mavgvy",
-            "mavgvz",
-            "fx",
-            "fy",
-            "fz",
-        ]
 
         # Create a list to store the full function names after we add them
         # to ADflow.  These are functions that will be computed within
         # the coupling loop.
+        # Unused functionals are not added, so they are neither integrated nor adjoint right hand sides
         coupling_funcs = []
         for surf in surfs:
-            for func in funcs:
-                if RANK == 0 and debug:
-                    print(f"Adding ADflow function: {func} to family: {surf}")
-                coupling_funcs.append(CFDSolver.addFunction(func, surf))
+            for func in FUNCS:
+                if is_used(func, surf):
+                    if RANK == 0 and debug:
+                        print(f"Adding ADflow function: {func} to family: {surf}")
+                    coupling_funcs.append(CFDSolver.addFunction(func, surf))
 
         # Define wall drag for performance calculations
         # This uses the auto-generated 'wall' family
-        coupling_funcs.append(CFDSolver.addFunction("drag", "wall"))
+        if is_used("drag", "wall"):
+            coupling_funcs.append(CFDSolver.addFunction("drag", "wall"))
 
         # Add the az flowpower
-        if model == "az":
+        if model == "az" and is_used("flowpower", "actuator_region"):
             coupling_funcs.append(CFDSolver.addFunction("flowpower", "actuator_region"))
 
         # Add integrated drag other forces
-        coupling_funcs.extend(["drag", "fx", "fy", "fz", "cfx"])
+        coupling_funcs.extend(
+            func for func in ["drag", "fx", "fy", "fz", "cfx"] if consumed_funcs is None or func in consumed_funcs
+        )
 
         # Sort the funcs to get them in alphabetical order
         coupling_funcs.sort()
 
-        # Create a list to store function names for functions that are
-        # computed in the aero_post group
-        aero_post_funcs = ["cl", "cd", "drag"]
+        return coupling_funcs
 
-        ##############################
-        # Scenario Config
-        ##############################
-        # Get the scenario group cruise0 point
-        scenario = getattr(self, "cruise0")
-
-        # Create the aero problem
-        ap = AeroProblem(
-            name=f"cruise0{self.mb_mesh}_{model}",
-            alpha=self.init_values.alpha["cruise0"],
-            mach=self.init_values.mach["cruise0"],
-            altitude=self.init_values.altitude["cruise0"],
-            areaRef=AREA_REF,
-            chordRef=CHORD_REF,
-            evalFuncs=sorted(aero_post_funcs.copy()),
-        )
-
-        # Add DV's common to both models
-        ap.addDV("alpha", value=self.init_values.alpha["cruise0"], name="alpha", units=DV_UNITS["alpha"])
-        ap.addDV("mach", value=self.init_values.mach["cruise0"], name="mach", units=DV_UNITS["mach"])
-        ap.addDV("altitude", value=self.init_values.altitude["cruise0"], name="altitude", units=DV_UNITS["altitude"])
-
-        # Actuator zone DVs
-        if model == "az":
-            ap.setBCVar("Thrust", self.init_values.thrust0["cruise0"], "actuator_region")
-            ap.addDV("Thrust", family="actuator_region", units=DV_UNITS["thrust"], name="thrust")
-
-            ap.setBCVar("Heat", self.init_values.heat0["cruise0"], "actuator_region")
-            ap.addDV("Heat", family="actuator_region", units=DV_UNITS["heat"], name="heat")
-
-        # Boundary condition DVs
-        else:
-            ap.setBCVar("Pressure", self.init_values.Ps0["cruise0"], "fan_face")
-            ap.addDV("Pressure", family="fan_face", units=DV_UNITS["Ps"], name="Ps")
-
-            ap.setBCVar("PressureStagnation", self.init_values.Ptot0["cruise0"], "fan_exit")
-            ap.addDV("PressureStagnation", family="fan_exit", units=DV_UNITS["Ptot"], name="Ptot")
-
-            ap.setBCVar("TemperatureStagnation", self.init_values.Ttot0["cruise0"], "fan_exit")
-            ap.addDV("TemperatureStagnation", family="fan_exit", units=DV_UNITS["Ttot"], name="Ttot")
-
-        # Set the aeroproblem for the groups in the scenario
-        scenario.coupling.aero.mphys_set_ap(ap)
-        scenario.aero_post.mphys_set_ap(ap)
+    def _connect_point(self, point, target_net_thrust):
+        """Adds the aero DVs of a point to the IVC and makes the aeropropulsive connections of its scenario."""
+        model = self.options["model"]
+        feedfwd = self.options["feedfwd"]
+        path = self.scenario_path(point)
 
         # Add the DVs that are common to both model versions to the
         # aero dvs IVC
         for key in ["alpha", "mach", "altitude"]:
             # Set the name, value, and units for this variable
-            dv_name = f"{key}_cruise0"
-            dv_value = ap.DVs[key].value
+            dv_name = f"{key}_{point}"
+            dv_value = getattr(self.init_values, key)[point]
             units = DV_UNITS[key]
 
             # Add the DV to the IVC
             self.aero_dvs.add_output(dv_name, val=dv_value, units=units)
             # Connect the IVC to the coupling and aero post groups
-            self.connect(f"aero_dvs.{dv_name}", [f"cruise0.coupling.aero.{key}", f"cruise0.aero_post.{key}"])
+            self.connect(f"aero_dvs.{dv_name}", [f"{path}.coupling.aero.{key}", f"{path}.aero_post.{key}"])
 
         # Add the thrust for both fan models
-        self.aero_dvs.add_output(f"thrust_cruise0", val=self.init_values.thrust0["cruise0"], units=DV_UNITS["thrust"])
+        self.aero_dvs.add_output(f"thrust_{point}", val=self.init_values.thrust0[point], units=DV_UNITS["thrust"])
         if model=='bc':
-            self.aero_dvs.add_output(f"target_net_thrust_cruise0", val=target_net_thrust, units=DV_UNITS["thrust"])
+            self.aero_dvs.add_output(f"target_net_thrust_{point}", val=target_net_thrust, units=DV_UNITS["thrust"])
         # Add/connect model specific IVC variables
         if model == "az":
             self.connect(
-                "aero_dvs.thrust_cruise0",
+                f"aero_dvs.thrust_{point}",
                 [
-                    "cruise0.coupling.aero.thrust",
-                    "cruise0.aero_post.thrust",
-                    "cruise0.coupling.prop.aero:half_fan_thrust",
+                    f"{path}.coupling.aero.thrust",
+                    f"{path}.aero_post.thrust",
+                    f"{path}.coupling.prop.aero:half_fan_thrust",
                 ],
             )
 
         else:
             # we are doing a BC version so fan thrust connects to the balance group
-            self.connect("aero_dvs.thrust_cruise0", ["cruise0.coupling.prop.aero:half_fan_thrust"])
+            self.connect(f"aero_dvs.thrust_{point}", [f"{path}.coupling.prop.aero:half_fan_thrust"])
 
             for key in ["Ps", "Ptot", "Ttot"]:
                 # Set the name, value, and units for this variable
-                dv_name = f"{key}_cruise0"
-                dv_val = ap.DVs[key].value
+                dv_name = f"{key}_{point}"
+                dv_val = getattr(self.init_values, f"{key}0")[point]
                 units = DV_UNITS[key]
                 self.aero_dvs.add_output(dv_name, val=dv_val, units=units)
 
-                self.connect(f"aero_dvs.{dv_name}", [f"cruise0.coupling.aero.{key}", f"cruise0.aero_post.{key}"])
-
-            # Make connections from ADflow functionals to the BC coupling component
-            aero_to_bc_connections = {
-                "aavgps_fan_exit": "aero:P_stat:fan_exit",
-                "aavgps_fan_face": "aero:P_stat:fan_face",
-                "mavgvx_fan_exit": "aero:V:fan_exit",
-                "mavgvx_fan_face": "aero:V:fan_face",
-                "mavgttot_fan_exit": "aero:T_tot:fan_exit",
-                "mavgttot_fan_face": "aero:T_tot:fan_face",
-                "aavgptot_fan_exit": "aero:P_tot:fan_exit",
-            }
+                self.connect(f"aero_dvs.{dv_name}", [f"{path}.coupling.aero.{key}", f"{path}.aero_post.{key}"])
 
             full_body_to_bc_conns = {
                 "aero:mdot:fan_exit": "aero:mdot:fan_exit",
@@ -398,19 +659,17 @@ class Top(Multipoint):
                 "aero:area:fan_face": "aero:area:fan_face",
             }
 
-            for key, val in aero_to_bc_connections.items():
-                self.connect(f"cruise0.coupling.aero.{key}", f"cruise0.coupling.balance.{val}")
+            # Make connections from ADflow functionals to the BC coupling component
+            for key, val in AERO_TO_BC_CONN.items():
+                self.connect(f"{path}.coupling.aero.{key}", f"{path}.coupling.balance.{val}")
 
             for key, val in full_body_to_bc_conns.items():
-                self.connect(f"cruise0.coupling.prop.{key}", f"cruise0.coupling.balance.{val}")
+                self.connect(f"{path}.coupling.prop.{key}", f"{path}.coupling.balance.{val}")
 
             # Add fan exit Mach to the IVC
-            fan_mach = "fan_exit_mach_cruise0"
+            fan_mach = f"fan_exit_mach_{point}"
             self.aero_dvs.add_output(fan_mach, val=0.5, units=None)
-            self.connect(f"aero_dvs.{fan_mach}", ["cruise0.coupling.prop.fan.MN"])
-
-        # Add all of the functions for the coupling group
-        scenario.coupling.aero.mphys_add_prop_funcs(coupling_funcs)
+            self.connect(f"aero_dvs.{fan_mach}", [f"{path}.coupling.prop.fan.MN"])
 
         ##############################
         # Aeropropulsive Configuration
@@ -420,9 +679,10 @@ class Top(Multipoint):
         if model == "az":
             if not feedfwd:
                 prop_to_aero_conn = {"aero:half_delta_heat": "heat"}
-                self.connect("cruise0.coupling.prop.aero:half_delta_heat", "cruise0.aero_post.heat")
+                self.connect(f"{path}.coupling.prop.aero:half_delta_heat", f"{path}.aero_post.heat")
             else:
-                scenario.coupling.aero.set_input_defaults("heat", val=0.0)
+                if point in self.local_scenarios:
+                    self.local_scenarios[point].coupling.aero.set_input_defaults("heat", val=0.0)
                 prop_to_aero_conn = {}
 
         # Make aeropropulsive connections for the boundary condition version
@@ -440,73 +700,101 @@ class Top(Multipoint):
             }
 
             for key, val in prop_to_bc_conns.items():
-                self.connect(f"cruise0.coupling.prop.{key}", f"cruise0.coupling.balance.{val}")
+                self.connect(f"{path}.coupling.prop.{key}", f"{path}.coupling.balance.{val}")
 
         # Connections from aero to propulsion
-        aero_to_prop_conn = {
-            "aavgptot_fan_face": "aero:P_tot:fan_face",
-            "aavgptot_fan_exit": "aero:P_tot:fan_exit",
-            "aavgps_fan_face": "aero:P_stat:fan_face",
-            "area_fan_face": "aero:half_area:fan_face",  # half
-            "area_fan_exit": "aero:half_area:fan_exit",  # half
-            "mdot_fan_exit": "aero:half_mdot:fan_exit",  # half
-            "mdot_fan_face": "aero:half_mdot:fan_face",  # half
-            "mavgvx_fan_face": "aero:V:fan_face",
-            "drag_wall": "aero:half_drag",  # half
-        }
+        aero_to_prop_conn = AERO_TO_PROP_CONN.copy()
 
         if model == "az":
             # save the actuator power as AZ power
             aero_to_prop_conn["flowpower_actuator_region"] = "aero:half_fan_power"  # half
 
         for key, val in prop_to_aero_conn.items():
-            self.connect(f"cruise0.coupling.prop.{key}", f"cruise0.coupling.aero.{val}")
+            self.connect(f"{path}.coupling.prop.{key}", f"{path}.coupling.aero.{val}")
 
         for key, val in aero_to_prop_conn.items():
-            self.connect(f"cruise0.coupling.aero.{key}", f"cruise0.coupling.prop.{val}")
+            self.connect(f"{path}.coupling.aero.{key}", f"{path}.coupling.prop.{val}")
 
         if model=="bc":
-            self.connect("cruise0.coupling.aero.drag_wall", "cruise0.coupling.balance.aero:half_drag")
-            self.connect("aero_dvs.target_net_thrust_cruise0", "cruise0.coupling.balance.target_net_thrust")
+            self.connect(f"{path}.coupling.aero.drag_wall", f"{path}.coupling.balance.aero:half_drag")
+            self.connect(f"aero_dvs.target_net_thrust_{point}", f"{path}.coupling.balance.target_net_thrust")
+
+    def _configure_geometry(self):
+        """Embeds the mesh in the geometry of every local point and connects the geometric DVs and mesh coordinates."""
+        parallel = self.options["parallel"]
+        write_constraints = self.options["write_constraints"]
+
+        # The lazy Jacobians of the local geometries, keyed by their path
+        self.vsp_jacobians = {}
+
+        if parallel:
+            for point, scenario in self.local_scenarios.items():
+                xdv = self._setup_geometry(
+                    scenario.geometry,
+                    scenario.aero_mesh,
+                    write_constraints=write_constraints and point == self.points[0],
+                )
+        else:
+            xdv = self._setup_geometry(self.geo, self.mesh, write_constraints=write_constraints)
+
+        # connect dvs to the ivc (with initial values), the linked ones are set by the linking comp
+        geo_paths = [self.geo_path(point) for point in self.points] if parallel else ["geo"]
+        linked_dvs = self.geo_link.targets
+        for key, val in xdv.items():
+            if key not in linked_dvs:
+                self.geo_dvs.add_output(key, val=val)
+                self.connect(f"geo_dvs.{key}", [f"{geo}.{key}" for geo in geo_paths])
+
+        # connect the linking comp to its source dvs and the geometry
+        self.geo_link.connect_dvs(self, "geo_dvs", geo_paths)
+
+        # connect the mesh coordinates
+        if parallel:
+            for point in self.points:
+                path = self.scenario_path(point)
+                self.connect(f"{path}.x_aero0", f"{path}.x_aero")
+        else:
+            self.connect("mesh.x_aero0", "geo.x_aero_in")
+            for point in self.points:
+                self.connect("geo.x_aero0", f"{point}.x_aero")
+
+    def _setup_geometry(self, geoComp, mesh, write_constraints=False):
+        """Embeds the surface mesh in the VSP geometry and adds the DVs and thickness constraints.
+
+        Returns the names and initial values of the VSP DVs.
+        """
+        output_dir = self.options["output_dir"]
+        geo_cache = self.options["geo_cache"]
+
+        # Reuse the projections of the points onto the VSP surfaces from an earlier setup
+        if geo_cache is not None:
+            embedding_cache = EmbeddingCache(geo_cache, self.options["level"], geoComp.options["file"], geoComp.comm)
+            embedding_cache.wrap(geoComp.DVGeos["defaultDVGeo"])
+
+        # Only finite difference the geometry when a derivative of a new design is needed
+        vsp_jacobian = LazyVSPJacobian(geoComp.comm, num_workers=self.options["vsp_fd_workers"])
+        vsp_jacobian.wrap(geoComp.DVGeos["defaultDVGeo"])
+        self.vsp_jacobians[geoComp.pathname] = vsp_jacobian
 
-        ##############################
-        # Geometry Configuration
-        ##############################
         # create geometric DV setup
-        coords = self.mesh.mphys_get_surface_mesh()
+        coords = mesh.mphys_get_surface_mesh()
 
         # add pointset
-        self.geo.nom_add_discipline_coords("aero", coords)
+        with startup_phase("configure: embed surface mesh"):
+            geoComp.nom_add_discipline_coords("aero", coords)
 
         # create constraint DV setup
-        tri_points = self.mesh.mphys_get_triangulated_surface()
-        self.geo.nom_setConstraintSurface(tri_points)
+        with startup_phase("configure: constraint surface"):
+            if geo_cache is not None:
+                tri_points = embedding_cache.triangulated_surface(mesh, self.grid_file)
+            else:
+                tri_points = mesh.mphys_get_triangulated_surface()
+            geoComp.nom_setConstraintSurface(tri_points)
 
         # add DVs on the geo comp
-        geoComp = self.geo
         for var in geo_vars:
             geoComp.nom_addVSPVariable(var.comp, var.group, var.var, scaledStep=False, dh=var.dh)
 
-        # this brings in all the names and values of the DVs
-        xdv = self.geo.DVGeos["defaultDVGeo"].getValues()
-
-        # connect dvs to the ivc (with initial values)
-        for key, val in xdv.items():
-            # omit the two cross sections we set with an exec comp
-            if key not in ["Nacelle:XSecCurve_8:Circle_Diameter", "Nacelle:XSecCurve_2:Circle_Diameter"]:
-                self.geo_dvs.add_output(key, val=val)
-                self.connect(f"geo_dvs.{key}", f"geo.{key}")
-
-        # connect the advanced linking stuff separately
-        self.connect("geo_dvs.Nacelle:XSecCurve_0:Circle_Diameter", "geo_link.XSecCurve_0")
-        self.connect("geo_dvs.Nacelle:XSecCurve_1:Circle_Diameter", "geo_link.XSecCurve_1")
-        self.connect("geo_link.XSecCurve_8", "geo.Nacelle:XSecCurve_8:Circle_Diameter")
-        self.connect("geo_link.XSecCurve_2", "geo.Nacelle:XSecCurve_2:Circle_Diameter")
-
-        # connect the mesh coordinates
-        self.connect("mesh.x_aero0", "geo.x_aero_in")
-        self.connect("geo.x_aero0", "cruise0.x_aero")
-
         ################################################################################
         # THICKNESS CONSTRAINTS
         ################################################################################
@@ -516,12 +804,13 @@ class Top(Multipoint):
         # we do the full upper nacelle for this
         pt1 = [-0.17, 0.01, 1.05]
         pt2 = [2.11, 0.01, 0.86]
-        geoComp.nom_addThicknessConstraints1D(
-            "upper_thickness",
-            np.vstack([pt1, pt2]),
-            10,
-            normal,
-        )
+        with startup_phase("configure: thickness constraints"):
+            geoComp.nom_addThicknessConstraints1D(
+                "upper_thickness",
+                np.vstack([pt1, pt2]),
+                10,
+                normal,
+            )
 
         # projection normal for the outer location
         normal = [0.0, 1.0, 0.0]
@@ -529,47 +818,22 @@ class Top(Multipoint):
         # rest of the sections are circular
         pt1 = [-0.17, 0.95, 0.0]
         pt2 = [0.59, 0.95, 0.0]
-        geoComp.nom_addThicknessConstraints1D(
-            "right_thickness",
-            np.vstack([pt1, pt2]),
-            4,
-            normal,
-        )
+        with startup_phase("configure: thickness constraints"):
+            geoComp.nom_addThicknessConstraints1D(
+                "right_thickness",
+                np.vstack([pt1, pt2]),
+                4,
+                normal,
+            )
 
         # write constraints to a file
-        if self.comm.rank == 0:
+        if write_constraints and geoComp.comm.rank == 0:
             file_name = os.path.join(output_dir, "thickness_constraints.dat")
             print(f"Writing constraints to file: {file_name}")
-            self.geo.DVCon.writeTecplot(file_name)
-
-        ################################################################################
-        # SOLVER OPTIONS
-        ################################################################################
+            geoComp.nom_writeTecplot(file_name)
 
-        # get the scenario group
-        scenario = getattr(self, "cruise0")
-
-        if model == "az" and not feedfwd:
-            # the actuator zone does a NLBGS iteartion until CFD and prop agree
-            scenario.coupling.nonlinear_solver = om.NonlinearBlockGS(
-                maxiter=10,
-                use_apply_nonlinear=False,
-                err_on_non_converge=True,
-                atol=1e-2,
-                rtol=1e-20,
-            )
-            scenario.coupling.linear_solver = om.LinearBlockGS(
-                maxiter=4,
-                atol=1e-20,
-                rtol=1e-10,
-            )
+        if geo_cache is not None and geoComp.comm.rank == 0:
+            print(f"Geometry embedding cache: {embedding_cache.summary()}", flush=True)
 
-        else:
-            # the BC version currently on consistency constraints
-            scenario.coupling.nonlinear_solver = om.NonlinearRunOnce()
-            scenario.coupling.linear_solver = om.LinearRunOnce()
-
-        scenario.coupling.set_solver_print(level=2)
-        scenario.coupling.prop.podded_fan.set_solver_print(level=-1)
-        scenario.coupling.prop.podded_fan.set_solver_print(level=2, depth=1)
-        scenario.coupling.linear_solver.options["iprint"] = 2
\ No newline at end of file
+        # this brings in all the names and values of the DVs
+        return geoComp.DVGeos["defaultDVGeo"].getValues()
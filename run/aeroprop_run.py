@@ -1,5 +1,6 @@
 # Standard Python modules
 import argparse
+import cProfile
 import json
 import os
 from pprint import pprint as pp
@@ -8,12 +9,24 @@ from pathlib import Path
 # External modules
 from aeroprop_mda import Top
 from mpi4py import MPI
+import numpy as np
 import openmdao.api as om
 
 # Local modules
-from geometry.geo_vars import geo_vars
+from aero.surrogate import POST_FUNCS, get_input_names
+from geometry.geo_vars import geo_vars, linked_geo_vars
+from propulsion.fan import PoddedFan
+from propulsion.fast_fan import PODDED_FAN_INPUTS, compare_with_pycycle
 from utils.add_geo_dvs import add_geo_dvs
+from utils.adaptive_tol import AdaptiveTolerance
+from utils.checkpoint import Checkpoint
+from utils.coupling_solver import InterfaceAcceleratedNLBGS
+from utils.eval_cache import EvaluationCache
+from utils.history import StreamRecorder
+from utils.parallel_totals import parallel_check_totals, split_comm
 from utils.point_specs import get_point_specs
+from utils.startup_timer import report_startup, startup_phase
+from utils.sweep import read_sweep_table, run_sweep
 
 # ==============================================================================
 # Command Line Arguments
@@ -23,9 +36,23 @@ parser.add_argument(
     "--task",
     default="opt",
     nargs="*",
-    help="Task to be done. See the bottom half of aero_run file for the available options",
+    help="Task to be done: run, opt, sweep or check_totals. See the bottom half of aero_run file for details",
+)
+parser.add_argument(
+    "--sweep_file",
+    default=None,
+    help="CSV table of alpha (deg), mach, altitude (m) and optionally thrust (N) for the sweep task",
 )
 parser.add_argument("--totals_type", default="opt_prob", help="Type of totals check to be run.")
+parser.add_argument(
+    "--totals_groups",
+    type=int,
+    default=1,
+    help="Number of independent copies of the problem that the procs are split into for check_totals. "
+    "Each copy perturbs its share of the DVs",
+)
+parser.add_argument("--totals_method", default="fd", choices=["fd", "cs"], help="Approximation used by check_totals")
+parser.add_argument("--totals_step", type=float, default=None, help="Step size used by check_totals")
 
 # CFD parameters
 parser.add_argument("--input_dir", default="./INPUT", help="Input file directory")
@@ -40,7 +67,8 @@ parser.add_argument(
     "--debug",
     default=False,
     action="store_true",
-    help="Prints some debugging info for CFD surfaces",
+    help="Prints some debugging info for CFD surfaces, computes all ADflow functionals instead of only the used ones "
+    "and adds the debug components, which write the coupling variables to OUTPUT/debug_<rank>.jsonl",
 )
 parser.add_argument("--version", default="v1", help="Version of the mesh and geometry.")
 parser.add_argument(
@@ -64,6 +92,38 @@ parser.add_argument(
     default=6000,
     help="Design thrust at nominal cruise. This is the half-body value so the total thrust is twice this number",
 )
+parser.add_argument(
+    "--fast_fan",
+    default=False,
+    action="store_true",
+    help="Flag to use the closed form fan model in the coupling. The pyCycle fan is evaluated at the final design "
+    "point inputs of a run or optimization to verify it",
+)
+parser.add_argument(
+    "--coupling_acceleration",
+    default="none",
+    choices=["none", "aitken", "anderson"],
+    help="Acceleration of the fan heat in the NLBGS coupling of the AZ version",
+)
+parser.add_argument(
+    "--parallel",
+    default=False,
+    action="store_true",
+    help="Flag to evaluate all points from the point specs in parallel, each on its own subset of the procs",
+)
+parser.add_argument(
+    "--aero_surrogate",
+    default=None,
+    help="File with recorded ADflow samples, see fit_aero_surrogate.py. If given, a surrogate fitted to them "
+    "replaces ADflow and the geometry is left out. Without the geometric DVs, the FPR is not constrained",
+)
+parser.add_argument(
+    "--record_aero_samples",
+    default=False,
+    action="store_true",
+    help="Flag to only record the aero DVs and functionals of the ADflow runs of an optimization, which is all that "
+    "fit_aero_surrogate.py reads",
+)
 parser.add_argument(
     "--feedfwd",
     default=False,
@@ -76,13 +136,100 @@ parser.add_argument(
     "--driver", default="snopt", choices=["scipy", "snopt"], help="Optimizer to use. Only tested with SNOPT"
 )
 
+parser.add_argument("--opt_tol", type=float, default=1e-6, help="Major optimality tolerance set in SNOPT.")
 parser.add_argument("--msl", type=float, default=0.1, help="Major step limit parameter for SNOPT")
 parser.add_argument("--timelimit", type=float, default=7200.0, help="Time limit set in SNOPT.")
+parser.add_argument(
+    "--restart",
+    default=False,
+    action="store_true",
+    help="Flag to resume an optimization in the same output directory. SNOPT hot starts from the old opt.hst and the "
+    "flow and fan states are restored from the last checkpoint",
+)
+parser.add_argument(
+    "--init_design",
+    default=None,
+    help="JSON file with the values of the design variables to start from, e.g. the design.json of an optimization "
+    "on a coarser mesh",
+)
+parser.add_argument(
+    "--init_checkpoint",
+    default=None,
+    help="Checkpoint directory of an earlier run whose fan states are restored before the first analysis. The flow "
+    "states are only restored if the mesh level is the same",
+)
+parser.add_argument(
+    "--adaptive_tol",
+    type=float,
+    default=0.0,
+    help="Loosest relative CFD and adjoint tolerance of an optimization. The tolerances tighten to the default ones "
+    "as the SNOPT optimality and feasibility drop. 0 keeps the default tolerances for the whole optimization",
+)
+parser.add_argument(
+    "--eval_cache",
+    type=int,
+    default=0,
+    help="Number of designs to keep in the evaluation cache in OUTPUT/eval_cache. Repeated designs are not evaluated "
+    "again. 0 turns the cache off",
+)
+parser.add_argument(
+    "--timing",
+    default=False,
+    action="store_true",
+    help="Flag to time the subsystems. A trace of every analysis and derivative evaluation is written to OUTPUT/timing",
+)
+parser.add_argument(
+    "--profile_startup",
+    default=False,
+    action="store_true",
+    help="Flag to print the time of every setup phase and write them to OUTPUT/startup.json, and a cProfile of the "
+    "setup on the root proc to OUTPUT/startup.prof",
+)
+parser.add_argument("--n2", default=False, action="store_true", help="Flag to write the n2 diagram of the model")
+parser.add_argument(
+    "--write_constraints",
+    default=False,
+    action="store_true",
+    help="Flag to write the thickness constraints to a Tecplot file",
+)
+parser.add_argument(
+    "--geo_cache",
+    default=None,
+    help="Directory to cache the embedding of the mesh in the VSP geometry in, so later setups with the same mesh "
+    "level, VSP file and number of procs skip the projections",
+)
+parser.add_argument(
+    "--binary_surfaces",
+    action="store_true",
+    help="Flag to map the binary copies of the integration surface and actuator zone files that convert_surfaces.py "
+    "writes instead of parsing the text files on every proc",
+)
+parser.add_argument(
+    "--vsp_fd_workers",
+    type=int,
+    default=0,
+    help="Number of forked processes per proc that finite difference the VSP geometry. By default the DVs are "
+    "spread over the procs",
+)
+parser.add_argument(
+    "--recorder",
+    default="sqlite",
+    choices=["sqlite", "stream"],
+    help="Driver recorder. stream writes a compact history to OUTPUT/history that utils.history.HistoryReader reads",
+)
 
 
 
 args = parser.parse_args()
 
+# Split the procs into independent problems for a parallel totals check.
+# Each copy writes to its own output directory.
+if "check_totals" in args.task and args.totals_groups > 1:
+    prob_comm, totals_color = split_comm(args.totals_groups)
+    args.output_dir = os.path.join(args.output_dir, f"totals_group_{totals_color}")
+else:
+    prob_comm = MPI.COMM_WORLD
+
 # check the output directory here and create if necessary
 Path(args.output_dir).mkdir(parents=True, exist_ok=True)
 # ==============================================================================
@@ -99,7 +246,7 @@ if MPI.COMM_WORLD.rank == 0:
 # OpenMDAO Setup
 # ==============================================================================
 # --- Create the problem and add the model ---
-prob = om.Problem()
+prob = om.Problem(comm=prob_comm)
 prob.model = model = Top(
     model=args.model,
     output_dir=args.output_dir,
@@ -109,6 +256,17 @@ prob.model = model = Top(
     debug=args.debug,
     feedfwd=args.feedfwd,
     target_net_thrust=args.thrust,
+    parallel=args.parallel,
+    fast_fan=args.fast_fan,
+    coupling_acceleration=args.coupling_acceleration,
+    aero_surrogate=args.aero_surrogate,
+    timing=args.timing,
+    write_constraints=args.write_constraints,
+    geo_cache=args.geo_cache,
+    binary_surfaces=args.binary_surfaces,
+    vsp_fd_workers=args.vsp_fd_workers,
+    # The sweep writes the fan face Mach number, which is only a constraint of the optimization
+    aero_funcs=["mavgmn_fan_face"] if "sweep" in args.task else [],
 )
 
 mini_opt_analysis = False
@@ -116,81 +274,89 @@ mini_opt_analysis = False
 # --- Get the point specs ---
 pt_specs = get_point_specs(feedfwd=args.feedfwd)
 
+# The first point is the design point, any other points are only analyzed
+design_pt = list(pt_specs.alpha.keys())[0]
+design_path = model.scenario_path(design_pt)
+
 
 if "opt" in args.task or "bc" in args.task or "check_totals" in args.task:
 
     # --- Add the objective function ---
     if args.model == "az":
-        model.add_objective("cruise0.coupling.prop.total_shaft_power", cache_linear_solution=True, ref=1000.0)
+        model.add_objective(f"{design_path}.coupling.prop.total_shaft_power", cache_linear_solution=True, ref=1000.0)
     else:
-        model.add_objective("cruise0.coupling.prop.prop:shaft_power", cache_linear_solution=True, ref=1000.0)
+        model.add_objective(f"{design_path}.coupling.prop.prop:shaft_power", cache_linear_solution=True, ref=1000.0)
 
     # --- Constraints ---
     # Design point constraints
 
-    # Fan pressure ratio constraint on design point
-    model.add_constraint("cruise0.coupling.prop.FPR", equals=args.fpr, cache_linear_solution=True, ref=1.0)
+    # Fan pressure ratio constraint on design point.
+    # Without the geometric DVs the FPR follows from the thrust and flow DVs, so it is only a result with the surrogate
+    if args.aero_surrogate is None:
+        model.add_constraint(f"{design_path}.coupling.prop.FPR", equals=args.fpr, cache_linear_solution=True, ref=1.0)
 
     if args.model=='az':
         # Net thrust constraint on design point for AZ
-        model.add_constraint("cruise0.coupling.prop.Fn", equals=args.thrust, cache_linear_solution=True, ref=1000.0)
+        model.add_constraint(
+            f"{design_path}.coupling.prop.Fn", equals=args.thrust, cache_linear_solution=True, ref=1000.0
+        )
 
     # Fan face mach number constraint on design point
-    model.add_constraint("cruise0.coupling.aero.mavgmn_fan_face", upper=0.6, cache_linear_solution=True, ref=1.0)
+    model.add_constraint(f"{design_path}.coupling.aero.mavgmn_fan_face", upper=0.6, cache_linear_solution=True, ref=1.0)
 
     # BC constraints
     if args.model == "bc":
 
         #we need to satisfy the 3 conservation equations with constraints
-        model.add_constraint("cruise0.coupling.balance.res_V", equals=0.0, cache_linear_solution=True, ref=100.0)
+        model.add_constraint(f"{design_path}.coupling.balance.res_V", equals=0.0, cache_linear_solution=True, ref=100.0)
         model.add_constraint(
-            "cruise0.coupling.balance.res_mdot", equals=0.0, cache_linear_solution=True, ref=100.0
+            f"{design_path}.coupling.balance.res_mdot", equals=0.0, cache_linear_solution=True, ref=100.0
         )
         model.add_constraint(
-            "cruise0.coupling.balance.res_area", equals=0.0, cache_linear_solution=True, ref=10.0
+            f"{design_path}.coupling.balance.res_area", equals=0.0, cache_linear_solution=True, ref=10.0
         )
 
         # net thrust constraint
         model.add_constraint(
-            "cruise0.coupling.balance.res_net_thrust", equals=0.0, cache_linear_solution=True, ref=1000.0
+            f"{design_path}.coupling.balance.res_net_thrust", equals=0.0, cache_linear_solution=True, ref=1000.0
         )
 
 
-    # Add thickness constraints
-    model.add_constraint("geo.upper_thickness", lower=1.0, upper=3.0, cache_linear_solution=True, ref=1.0)
-    model.add_constraint("geo.right_thickness", lower=1.0, upper=3.0, cache_linear_solution=True, ref=1.0)
+    # Add thickness constraints, there is no geometry with the aero surrogate
+    if args.aero_surrogate is None:
+        model.add_constraint(
+            f"{model.geo_path(design_pt)}.upper_thickness", lower=1.0, upper=3.0, cache_linear_solution=True, ref=1.0
+        )
+        model.add_constraint(
+            f"{model.geo_path(design_pt)}.right_thickness", lower=1.0, upper=3.0, cache_linear_solution=True, ref=1.0
+        )
 
     # --- Design Variables ---
     # Thrust is added for AZ version
     if args.model=='az':
-            model.add_design_var("aero_dvs.thrust_cruise0", lower=5000.0, upper=16000, ref=10000)
+            model.add_design_var(f"aero_dvs.thrust_{design_pt}", lower=5000.0, upper=16000, ref=10000)
 
     # Add DVs for the BC only
     if args.model == "bc" :
 
-        model.add_design_var("aero_dvs.fan_exit_mach_cruise0", lower=0.2, upper=0.6, ref=1.0)
-        model.add_design_var("aero_dvs.Ps_cruise0", lower=20000, upper=40000, ref=10000)
-        model.add_design_var("aero_dvs.Ptot_cruise0", lower=30000, upper=60000, ref=10000)
-        model.add_design_var("aero_dvs.Ttot_cruise0", lower=200.0, upper=400.0, ref=100.0)
+        model.add_design_var(f"aero_dvs.fan_exit_mach_{design_pt}", lower=0.2, upper=0.6, ref=1.0)
+        model.add_design_var(f"aero_dvs.Ps_{design_pt}", lower=20000, upper=40000, ref=10000)
+        model.add_design_var(f"aero_dvs.Ptot_{design_pt}", lower=30000, upper=60000, ref=10000)
+        model.add_design_var(f"aero_dvs.Ttot_{design_pt}", lower=200.0, upper=400.0, ref=100.0)
 
 
     # Geometric DVs
-    # Add the number of the cross section and angle that you want to
-    # add to these lists
-    nacelle_xsecs = [0, 1, 3, 4, 5, 6, 7]
-    nacelle_angles = [0, 3, 5, 6, 7]
-    core_xsecs = [3]
-    core_angles = [3]
-
-    # Create a filter that has the component, group, and number for
-    # the cross sections and angles we want to add as DVs
+    # Create a filter that has the component and the patterns of
+    # the cross sections and angles we want to add as DVs.
+    # Braces select the numbers of the groups, e.g. XSecCurve_{0,1,3-7}
     geo_dv_filter = {
-        "Nacelle": [f"XSecCurve_{i}" for i in nacelle_xsecs] + [f"XSec_{i}" for i in nacelle_angles],
-        "Core": [f"XSecCurve_{i}" for i in core_xsecs] + [f"XSec_{i}" for i in core_angles],
+        "Nacelle": ["XSecCurve_{0,1,3-7}", "XSec_{0,3,5-7}"],
+        "Core": ["XSecCurve_3", "XSec_3"],
     }
 
-    # add geometric dvs
-    add_geo_dvs(model, geo_vars, geo_dv_filter)
+    # add geometric dvs, the linked ones are set by the linking comp
+    if args.aero_surrogate is None:
+        add_geo_dvs(model, geo_vars, geo_dv_filter, exclude=[link.target for link in linked_geo_vars])
 
 # --- Optimizer settings ---
 if args.driver == "snopt":
@@ -206,7 +372,7 @@ if args.driver == "snopt":
 
     prob.driver.opt_settings = {
         "Major feasibility tolerance": maj_feas_tol,
-        "Major optimality tolerance": 1e-6,
+        "Major optimality tolerance": args.opt_tol,
         "Verify level": 0,
         "Major iterations limit": 600,
         "Minor iterations limit": 1000000,
@@ -224,39 +390,205 @@ if args.driver == "snopt":
 
     prob.driver.hist_file = os.path.join(args.output_dir, "opt.hst")
 
-    # Add recorders to the driver and problem
-    recorder = om.SqliteRecorder(os.path.join(args.output_dir, "recorder.sql"))
-    prob.driver.add_recorder(recorder)
+    # The old history is moved aside and replayed, the new history gets all of its iterations again
+    if args.restart:
+        hotstart_file = os.path.join(args.output_dir, "opt_hotstart.hst")
+        if MPI.COMM_WORLD.rank == 0 and os.path.isfile(prob.driver.hist_file):
+            os.replace(prob.driver.hist_file, hotstart_file)
+        MPI.COMM_WORLD.barrier()
+        prob.driver.hotstart_file = hotstart_file
 
 elif args.driver == "scipy":
     prob.driver = om.ScipyOptimizeDriver(
         optimizer="SLSQP", debug_print=["desvars", "ln_cons", "nl_cons", "objs"], disp=True
     )
 
+# Add recorders to the driver
+if args.recorder == "stream":
+    recorder = StreamRecorder(os.path.join(args.output_dir, "history"), append=args.restart)
+else:
+    recorder = om.SqliteRecorder(os.path.join(args.output_dir, "recorder.sql"))
+prob.driver.add_recorder(recorder)
+
 # --- Setup the model ---
-prob.setup(mode="rev")
-om.n2(prob, show_browser=False, outfile=os.path.join(args.output_dir, f"pod_{args.model}.html"))
+if args.profile_startup and MPI.COMM_WORLD.rank == 0:
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+with startup_phase("setup"):
+    prob.setup(mode="rev")
+
+# The recorders are set up in final_setup, so this comes first.
+# Only record the aero DVs and functionals of the ADflow runs if asked, they are the samples of an aero surrogate
+if args.record_aero_samples and args.aero_surrogate is None:
+    aero_vars = get_input_names(args.model) + model.coupling_funcs
+    prob.driver.recording_options["includes"] = [f"*.coupling.aero.{name}" for name in aero_vars] + [
+        f"*.aero_post.{name}" for name in POST_FUNCS
+    ]
+
+with startup_phase("final_setup"):
+    prob.final_setup()
+
+if args.profile_startup:
+    if MPI.COMM_WORLD.rank == 0:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(args.output_dir, "startup.prof"))
+    report_startup(prob.comm, os.path.join(args.output_dir, "startup.json"))
+
+# Checkpoint the flow and fan states of every optimization evaluation, and restore them for a restart
+checkpoint = Checkpoint(model, os.path.join(args.output_dir, "checkpoint"))
+if "opt" in args.task:
+    checkpoint.attach()
+if args.restart:
+    restored = checkpoint.load()
+    print(f"Restored the checkpoint of {restored} on rank {MPI.COMM_WORLD.rank}", flush=True)
+
+# Start from the design and the states of an earlier run, e.g. on a coarser mesh
+if args.init_design is not None:
+    with open(args.init_design) as f:
+        init_design = json.load(f)
+    if MPI.COMM_WORLD.rank == 0:
+        print(f"Starting from the design of {args.init_design} on level {init_design['level']}", flush=True)
+    for name, val in init_design["design_vars"].items():
+        prob.set_val(name, val)
+
+if args.init_checkpoint is not None:
+    init_checkpoint = Checkpoint(model, args.init_checkpoint)
+    restored = init_checkpoint.load(flow=init_checkpoint.saved_level() == args.level)
+    print(f"Restored the states of {restored} from {args.init_checkpoint} on rank {MPI.COMM_WORLD.rank}", flush=True)
+
+# Tag the timing records with the optimizer iteration
+if args.timing:
+    model.phase_timer.attach_driver(prob.driver)
+
+# Serve the designs the optimizer repeats from the evaluation cache
+if args.eval_cache > 0:
+    eval_cache = EvaluationCache(
+        model, prob.driver, os.path.join(args.output_dir, "eval_cache"), max_entries=args.eval_cache
+    )
+
+if args.n2:
+    om.n2(prob, show_browser=False, outfile=os.path.join(args.output_dir, f"pod_{args.model}.html"))
 
 # analysis task
 if "run" in args.task:
     # write volume solutions with this mode
-    model.aero_builder.solver.setOption("writevolumesolution", True)
-    model.aero_builder.solver.setOption("writetecplotsurfacesolution", True)
+    if args.aero_surrogate is None:
+        model.aero_builder.solver.setOption("writevolumesolution", True)
+        model.aero_builder.solver.setOption("writetecplotsurfacesolution", True)
     prob.run_model()
     model.list_outputs(units=True)
 
 # optimization task
 if "opt" in args.task:
+    # The driver only reads the responses, so only its evaluations are served from the cache
+    if args.eval_cache > 0:
+        eval_cache.attach()
+
+    # Loose flow and adjoint solves while SNOPT is far from the optimum, the other tasks stay fully converged
+    use_adaptive_tol = args.adaptive_tol > 0.0 and args.driver == "snopt" and args.aero_surrogate is None
+    if use_adaptive_tol:
+        adaptive_tol = AdaptiveTolerance(
+            model,
+            opt_tol=prob.driver.opt_settings["Major optimality tolerance"],
+            feas_tol=prob.driver.opt_settings["Major feasibility tolerance"],
+            loose=args.adaptive_tol,
+        )
+        adaptive_tol.attach(prob.driver, eval_cache=eval_cache if args.eval_cache > 0 else None)
+
     prob.run_driver()
+
+    if use_adaptive_tol:
+        adaptive_tol.detach()
+
+    # The final evaluation of the driver at the optimum may be a hit, which leaves the other outputs of another design
+    if args.eval_cache > 0:
+        eval_cache.detach()
+        if not eval_cache.is_current():
+            prob.run_model()
     prob.model.list_outputs(units=True)
-    # do one last call to write the volume files
-    prob.model.aero_builder.solver.setOption("writevolumesolution", True)
-    prob.model.aero_builder.solver.setOption("writetecplotsurfacesolution", True)
 
-    scenario = getattr(prob.model, "cruise0")
-    scenario.aero_post.nom_write_solution(baseName="opt_final_cruise0")
+    # The final design, to start an optimization on a finer mesh from
+    design_vars = prob.driver.get_design_var_values(driver_scaling=False)
+    if MPI.COMM_WORLD.rank == 0:
+        with open(os.path.join(args.output_dir, "design.json"), "w") as f:
+            design = {name: np.atleast_1d(val).tolist() for name, val in design_vars.items()}
+            json.dump({"level": args.level, "design_vars": design}, f, indent=2)
+    # do one last call to write the volume files
+    if args.aero_surrogate is None:
+        prob.model.aero_builder.solver.setOption("writevolumesolution", True)
+        prob.model.aero_builder.solver.setOption("writetecplotsurfacesolution", True)
+
+        for point, scenario in prob.model.local_scenarios.items():
+            scenario.aero_post.nom_write_solution(baseName=f"opt_final_{point}")
+
+# verify the closed form fan against pyCycle at the final fan inputs of the design point
+if args.fast_fan and ("run" in args.task or "opt" in args.task):
+    fan_values = {
+        name: prob.get_val(f"{design_path}.coupling.prop.{name}", units=units, get_remote=True)[0]
+        for name, units in PODDED_FAN_INPUTS.items()
+    }
+    if MPI.COMM_WORLD.rank == 0:
+        print("Fast fan verification (pyCycle, closed form, relative difference):", flush=True)
+        for name, (val_pyc, val_fast) in compare_with_pycycle(fan_values).items():
+            print(f"  {name}: {val_pyc:.6g}, {val_fast:.6g}, {(val_fast - val_pyc) / val_pyc:.3e}", flush=True)
+
+# off-design sweep over the flight conditions of a table, all with the design point scenario
+if "sweep" in args.task:
+    sweep_inputs = {key: f"aero_dvs.{key}_{design_pt}" for key in ["alpha", "mach", "altitude"]}
+    sweep_outputs = {
+        "FPR": f"{design_path}.coupling.prop.FPR",
+        "Fn": f"{design_path}.coupling.prop.Fn",
+        "cl": f"{design_path}.aero_post.cl",
+        "cd": f"{design_path}.aero_post.cd",
+        "mavgmn_fan_face": f"{design_path}.coupling.aero.mavgmn_fan_face",
+    }
+    if args.model == "az":
+        sweep_inputs["thrust"] = f"aero_dvs.thrust_{design_pt}"
+        sweep_outputs["shaft_power"] = f"{design_path}.coupling.prop.total_shaft_power"
+    else:
+        sweep_inputs["thrust"] = f"aero_dvs.target_net_thrust_{design_pt}"
+        sweep_outputs["shaft_power"] = f"{design_path}.coupling.prop.prop:shaft_power"
+        # The BC version is only consistent where these residuals are zero
+        for res in ["res_V", "res_mdot", "res_area", "res_net_thrust"]:
+            sweep_outputs[res] = f"{design_path}.coupling.balance.{res}"
+
+    sweep_start = {key: getattr(pt_specs, key)[design_pt] for key in ["alpha", "mach", "altitude"]}
+    run_sweep(
+        prob,
+        sweep_inputs,
+        sweep_outputs,
+        read_sweep_table(args.sweep_file),
+        os.path.join(args.output_dir, "sweep.csv"),
+        start=sweep_start,
+        checkpoint=Checkpoint(model, os.path.join(args.output_dir, "sweep_checkpoint")),
+    )
 
 # checking total derivatives
 if "check_totals" in args.task:
     prob.run_model()
-    prob.check_totals()
+    if args.totals_groups > 1:
+        parallel_check_totals(
+            prob, totals_color, args.totals_groups, method=args.totals_method, step=args.totals_step
+        )
+    else:
+        prob.check_totals(method=args.totals_method, step=args.totals_step)
+
+if args.eval_cache > 0 and MPI.COMM_WORLD.rank == 0:
+    print(f"Evaluation cache: {eval_cache.summary()}", flush=True)
+
+# report how often the VSP geometry was finite differenced
+for path, vsp_jacobian in getattr(prob.model, "vsp_jacobians", {}).items():
+    if vsp_jacobian.comm.rank == 0:
+        print(f"{path} geometry derivatives: {vsp_jacobian.summary()}", flush=True)
+
+# report the block iterations of the AZ coupling
+for scenario in prob.model.local_scenarios.values():
+    coupling_solver = scenario.coupling.nonlinear_solver
+    if isinstance(coupling_solver, InterfaceAcceleratedNLBGS) and scenario.comm.rank == 0:
+        print(f"{scenario.pathname} coupling: {coupling_solver.summary()}", flush=True)
+
+# report how often the fan solves could start from a cached state
+for podded_fan in prob.model.system_iter(recurse=True, typ=PoddedFan):
+    if podded_fan.comm.rank == 0:
+        print(f"{podded_fan.pathname} warm start: {podded_fan.state_cache.summary()}", flush=True)
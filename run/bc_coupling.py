@@ -1,10 +1,15 @@
+# Standard Python modules
+import os
+
 # External modules
 from mphys.builder import Builder
 import openmdao.api as om
-from tabulate import tabulate
+
+# Local modules
+from utils.debug_sink import DebugComp
 
 
-class BCCouplingDebug(om.ExplicitComponent):
+class BCCouplingDebug(DebugComp):
     def setup(self):
         self.add_input("enr:fan_face", units="kW")
         self.add_input("enr:fan_exit", units="kW")
@@ -47,22 +52,6 @@ class BCCouplingDebug(om.ExplicitComponent):
         self.add_input("res_enr", desc="energy residual", units="kW")
         self.add_input("prop:shaft_power", units="kW")
 
-        self.add_output("foo")
-
-    def compute(self, inputs, outputs):
-        outputs["foo"] = 1.0
-        if self.comm.rank == 0:
-            print("\n*****************************", flush=True)
-            print("***     BC DEBUG OUTPUT     ***", flush=True)
-            print("*******************************", flush=True)
-
-            meta = self._var_abs2meta["input"]
-            table = [[key.split(".")[-1], val[0], meta["cruise0.coupling.balance.debug_balance."+key]["units"]] for key, val in inputs.items()]
-            headers = ["Name", "Value", "Units"]
-            print(tabulate(table, headers=headers, colalign=("right", "left", "left"), floatfmt=".4f"))
-
-            print("*******************************\n", flush=True)
-
 
 class BCStaticsConservation(om.ExplicitComponent):
     def setup(self):
@@ -99,14 +88,36 @@ class BCStaticsConservation(om.ExplicitComponent):
         self.add_output("res_P_tot", desc="Static pressure residual at the fan exit", units="Pa")
         self.add_output("res_T_tot", desc="Static pressure residual at the fan exit", units="degK")
 
-        self.declare_partials("res_P_tot", ["aero:P_tot:fan_exit", "prop:P_tot:fan_exit"], method="cs")
-        self.declare_partials("res_T_tot", ["aero:T_tot:fan_exit", "prop:T_tot:fan_exit"], method="cs")
-
-        self.declare_partials("res_Ps", ["aero:P_stat:fan_exit", "prop:P_stat:fan_exit"], method="cs")
-        self.declare_partials("res_V", ["aero:V:fan_exit", "prop:V:fan_exit"], method="cs")
-        self.declare_partials("res_mdot", ["aero:mdot:fan_exit", "prop:mdot:fan_exit"], method="cs")
-        self.declare_partials("res_area", ["aero:area:fan_exit", "prop:area:fan_exit"], method="cs")
-        self.declare_partials("res_net_thrust", ["aero:area:fan_exit","aero:area:fan_face", "aero:mdot:fan_face","aero:mdot:fan_exit","aero:V:fan_exit","aero:V:fan_face","aero:P_stat:fan_face","aero:P_stat:fan_exit","aero:half_drag","target_net_thrust"], method="cs")
+        # The matching residuals are plain differences, so their partials are constant
+        self.declare_partials("res_P_tot", "aero:P_tot:fan_exit", val=1.0)
+        self.declare_partials("res_P_tot", "prop:P_tot:fan_exit", val=-1.0)
+        self.declare_partials("res_T_tot", "aero:T_tot:fan_exit", val=1.0)
+        self.declare_partials("res_T_tot", "prop:T_tot:fan_exit", val=-1.0)
+
+        self.declare_partials("res_Ps", "aero:P_stat:fan_exit", val=1.0)
+        self.declare_partials("res_Ps", "prop:P_stat:fan_exit", val=-1.0)
+        self.declare_partials("res_V", "aero:V:fan_exit", val=1.0)
+        self.declare_partials("res_V", "prop:V:fan_exit", val=-1.0)
+        self.declare_partials("res_mdot", "aero:mdot:fan_exit", val=1.0)
+        self.declare_partials("res_mdot", "prop:mdot:fan_exit", val=-1.0)
+        self.declare_partials("res_area", "aero:area:fan_exit", val=1.0)
+        self.declare_partials("res_area", "prop:area:fan_exit", val=-1.0)
+
+        # The thrust residual is bilinear in the momentum and pressure terms
+        self.declare_partials(
+            "res_net_thrust",
+            [
+                "aero:area:fan_exit",
+                "aero:area:fan_face",
+                "aero:mdot:fan_face",
+                "aero:mdot:fan_exit",
+                "aero:V:fan_exit",
+                "aero:V:fan_face",
+                "aero:P_stat:fan_face",
+                "aero:P_stat:fan_exit",
+            ],
+        )
+        self.declare_partials("res_net_thrust", ["aero:half_drag", "target_net_thrust"], val=-2.0)
 
     def compute(self, inputs, outputs):
         aero_P_out = inputs["aero:P_stat:fan_exit"]
@@ -139,6 +150,17 @@ class BCStaticsConservation(om.ExplicitComponent):
         outputs["res_area"] = aero_area_out - prop_area_out
         outputs["res_net_thrust"] = Thrust_fan - 2*aero_drag -2*target_netthrust
 
+    def compute_partials(self, inputs, partials):
+        partials["res_net_thrust", "aero:mdot:fan_exit"] = inputs["aero:V:fan_exit"]
+        partials["res_net_thrust", "aero:V:fan_exit"] = inputs["aero:mdot:fan_exit"]
+        partials["res_net_thrust", "aero:P_stat:fan_exit"] = inputs["aero:area:fan_exit"]
+        partials["res_net_thrust", "aero:area:fan_exit"] = inputs["aero:P_stat:fan_exit"]
+
+        partials["res_net_thrust", "aero:mdot:fan_face"] = -inputs["aero:V:fan_face"]
+        partials["res_net_thrust", "aero:V:fan_face"] = -inputs["aero:mdot:fan_face"]
+        partials["res_net_thrust", "aero:P_stat:fan_face"] = -inputs["aero:area:fan_face"]
+        partials["res_net_thrust", "aero:area:fan_face"] = -inputs["aero:P_stat:fan_face"]
+
 
 class BCEnergyConservation(om.ExplicitComponent):
     def initialize(self):
@@ -155,11 +177,14 @@ class BCEnergyConservation(om.ExplicitComponent):
         self.add_output("enr:fan_exit", desc="Energy leaving the control volume around the fan", units="kW")
         self.add_output("res_enr", desc="Energy residual", units="kW")
 
+        self.declare_partials("enr:fan_face", "prop:shaft_power", val=0.5)
+        self.declare_partials("enr:fan_face", ["aero:mdot:fan_face", "aero:T_tot:fan_face"])
+        self.declare_partials("enr:fan_exit", ["aero:mdot:fan_exit", "aero:T_tot:fan_exit"])
+
+        self.declare_partials("res_enr", "prop:shaft_power", val=0.5)
         self.declare_partials(
-            "enr:fan_face", ["prop:shaft_power", "aero:mdot:fan_face", "aero:T_tot:fan_face"], method="cs"
+            "res_enr", ["aero:mdot:fan_face", "aero:T_tot:fan_face", "aero:mdot:fan_exit", "aero:T_tot:fan_exit"]
         )
-        self.declare_partials("enr:fan_exit", ["aero:mdot:fan_exit", "aero:T_tot:fan_exit"], method="cs")
-        self.declare_partials("res_enr", "*", method="cs")
 
     def compute(self, inputs, outputs):
         shaft_power = inputs["prop:shaft_power"]
@@ -173,20 +198,43 @@ class BCEnergyConservation(om.ExplicitComponent):
         outputs["enr:fan_exit"] = mdot_out * T_out * self.options["Cp"]
         outputs["res_enr"] = outputs["enr:fan_face"] - outputs["enr:fan_exit"]
 
+    def compute_partials(self, inputs, partials):
+        Cp = self.options["Cp"]
+
+        partials["enr:fan_face", "aero:mdot:fan_face"] = -inputs["aero:T_tot:fan_face"] * Cp
+        partials["enr:fan_face", "aero:T_tot:fan_face"] = -inputs["aero:mdot:fan_face"] * Cp
+        partials["enr:fan_exit", "aero:mdot:fan_exit"] = inputs["aero:T_tot:fan_exit"] * Cp
+        partials["enr:fan_exit", "aero:T_tot:fan_exit"] = inputs["aero:mdot:fan_exit"] * Cp
+
+        partials["res_enr", "aero:mdot:fan_face"] = partials["enr:fan_face", "aero:mdot:fan_face"]
+        partials["res_enr", "aero:T_tot:fan_face"] = partials["enr:fan_face", "aero:T_tot:fan_face"]
+        partials["res_enr", "aero:mdot:fan_exit"] = -partials["enr:fan_exit", "aero:mdot:fan_exit"]
+        partials["res_enr", "aero:T_tot:fan_exit"] = -partials["enr:fan_exit", "aero:T_tot:fan_exit"]
+
 
 class BCCouplingGroup(om.Group):
+    def initialize(self):
+        self.options.declare(
+            "debug_file", default=None, types=(str, type(None)), desc="Debug sink file. No debug comp is added if None"
+        )
+
     def setup(self):
+        debug_file = self.options["debug_file"]
+
         self.add_subsystem("energy_cons", BCEnergyConservation(), promotes=["*"])
         self.add_subsystem("static_cons", BCStaticsConservation(), promotes=["*"])
-        self.add_subsystem("debug_balance", BCCouplingDebug(), promotes=["*"])
+        if debug_file is not None:
+            self.add_subsystem("debug_balance", BCCouplingDebug(debug_file=debug_file), promotes=["*"])
 
 
 class BCCouplingBuilder(Builder):
-    def __init__(self):
-        pass
+    def __init__(self, outdir="./", debug=False):
+        self.outdir = outdir
+        self.debug = debug
 
     def get_coupling_group_subsystem(self, scenario_name=None):
-        return BCCouplingGroup()
+        debug_file = os.path.join(self.outdir, "debug.jsonl") if self.debug else None
+        return BCCouplingGroup(debug_file=debug_file)
 
     # def get_post_coupling_subsystem(self, scenario_name=None):
     #     return BCCouplingGroup()
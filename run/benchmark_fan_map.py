@@ -0,0 +1,125 @@
+# Standard Python modules
+import argparse
+import time
+
+# External modules
+import numpy as np
+import openmdao.api as om
+from openmdao.components.interp_util.interp import InterpND
+from pycycle.elements.compressor_map import CompressorMap
+
+# Local modules
+from propulsion.fan_map_table import FanMapTable, TableCompressorMap
+from propulsion.n3_fan_map import FanMap
+
+# ==============================================================================
+# Command Line Arguments
+# ==============================================================================
+parser = argparse.ArgumentParser(
+    description="Compares the fan map interpolations of the PoddedFan map_method option: batch query time, slope "
+    "jumps at the map points and the Newton solves of the off-design map inverse"
+)
+parser.add_argument("--num_points", type=int, default=100000, help="Number of points of the batch queries")
+parser.add_argument("--num_solves", type=int, default=60, help="Number of map inverse solves per Rline band")
+parser.add_argument("--seed", type=int, default=0, help="Seed of the random map points")
+args = parser.parse_args()
+
+methods = ["slinear", "pchip", "akima"]
+rng = np.random.default_rng(args.seed)
+lower = [p["values"][0] for p in FanMap.param_data]
+upper = [p["values"][-1] for p in FanMap.param_data]
+
+# ==============================================================================
+# Batch queries of the map
+# ==============================================================================
+print(f"Batch evaluation of WcMap and its derivatives at {args.num_points} points")
+pts = rng.uniform(lower, upper, (args.num_points, 3))
+grids = [np.asarray(p["values"], dtype=float) for p in FanMap.param_data]
+wc = np.asarray(FanMap.WcMap, dtype=float)
+
+interp = InterpND(method="slinear", points=grids, values=wc, extrapolate=True)
+t0 = time.time()
+interp.interpolate(pts, compute_derivative=True)
+print(f"  OpenMDAO slinear: {time.time() - t0:.3f} s")
+
+tables = {}
+for method in methods:
+    tables[method] = FanMapTable(method=method)
+    t0 = time.time()
+    tables[method].evaluate(pts[:, 0], pts[:, 1], pts[:, 2], compute_derivs=True)
+    print(f"  FanMapTable {method}: {time.time() - t0:.3f} s")
+
+# ==============================================================================
+# Continuity of the derivatives at the map points
+# ==============================================================================
+print("Largest jump of dWcMap/dRlineMap across the Rline points, relative to the largest slope")
+alpha, Nc = np.meshgrid(grids[0], grids[1], indexing="ij")
+eps = 1e-7 * np.min(np.diff(grids[2]))
+for method in methods:
+    jumps = []
+    slopes = []
+    for Rline in grids[2][1:-1]:
+        derivs = [
+            tables[method].evaluate(alpha, Nc, Rline + s, compute_derivs=True)[1]["WcMap", "RlineMap"]
+            for s in (-eps, eps)
+        ]
+        jumps.append(np.abs(derivs[1] - derivs[0]).max())
+        slopes.append(np.abs(derivs[0]).max())
+    print(f"  {method}: {max(jumps) / max(slopes):.2e}")
+
+# ==============================================================================
+# Off-design map inverse
+# ==============================================================================
+# The design map of aeroprop is solved in the fan balance, so the targets are points of the current map
+print(f"Newton solves of NcMap and RlineMap for the corrected speed and flow of {args.num_solves} map points")
+
+
+def map_inverse(method):
+    # The pyCycle map is the baseline, the others read the FanMapTable like PoddedFan
+    if method == "pycycle":
+        comp_map = CompressorMap(map_data=FanMap, design=False, interp_method="slinear", extrap=True)
+    else:
+        comp_map = TableCompressorMap(map_data=FanMap, design=False, table_method=method)
+
+    prob = om.Problem(reports=False)
+    prob.model.add_subsystem("map", comp_map, promotes=["*"])
+    newton = prob.model.nonlinear_solver = om.NewtonSolver(
+        solve_subsystems=False, maxiter=30, atol=1e-10, rtol=1e-10, iprint=-1, err_on_non_converge=False
+    )
+    newton.linesearch = om.BoundsEnforceLS()
+    prob.model.linear_solver = om.DirectSolver()
+    prob.setup()
+    for scalar in ["s_PR", "s_eff", "s_Wc", "s_Nc"]:
+        prob.set_val(scalar, 1.0)
+    return prob
+
+
+for band in [(1.0, 1.3), (1.1, 2.6), (2.4, 2.9)]:
+    Nc = rng.uniform(0.55, 1.08, args.num_solves)
+    Rline = rng.uniform(*band, args.num_solves)
+    Wc = tables["slinear"].evaluate(0.0, Nc, Rline)["WcMap"]
+
+    print(f"  RlineMap {band[0]} to {band[1]}")
+    for method in ["pycycle"] + methods:
+        prob = map_inverse(method)
+        iters = []
+        failures = 0
+        t0 = time.time()
+        for n, w in zip(Nc, Wc):
+            prob.set_val("Nc", n, units="rpm")
+            prob.set_val("Wc", w, units="lbm/s")
+            prob.set_val("NcMap", 0.99)
+            prob.set_val("RlineMap", 2.0)
+            try:
+                prob.run_model()
+            except Exception:
+                # e.g. a singular Jacobian on a flat part of the map
+                failures += 1
+                continue
+            iters.append(prob.model.nonlinear_solver._iter_count)
+            failures += np.abs(prob.model._residuals.asarray()).max() > 1e-6
+
+        print(
+            f"    {method}: {np.mean(iters):.2f} mean, {max(iters, default=0)} max iterations, {failures} failures, "
+            f"{(time.time() - t0) / args.num_solves:.4f} s per solve"
+        )
@@ -0,0 +1,40 @@
+# Standard Python modules
+import argparse
+import glob
+import os
+import time
+
+# Local modules
+from utils.surface_files import convert_surface_file
+
+# ==============================================================================
+# Command Line Arguments
+# ==============================================================================
+parser = argparse.ArgumentParser(
+    description="Converts the Plot3D integration surface and actuator zone files to binary copies that "
+    "aeroprop_run.py --binary_surfaces maps instead of parsing the text on every proc"
+)
+parser.add_argument("--input_dir", default="./INPUT", help="Input directory")
+parser.add_argument("--levels", default=None, help="Comma separated mesh levels to convert, all levels if not given")
+args = parser.parse_args()
+
+# ==============================================================================
+# Convert the surface files
+# ==============================================================================
+xyz_files = []
+for sub_dir in ["integration_surfaces", "actuator_zone"]:
+    xyz_files += sorted(glob.glob(os.path.join(args.input_dir, sub_dir, "*.xyz")))
+
+if args.levels is not None:
+    levels = args.levels.split(",")
+    # The level is one of the underscore separated parts of the name, e.g. fan_face_L1.5_R2.xyz
+    xyz_files = [
+        xyz_file for xyz_file in xyz_files if set(levels) & set(os.path.basename(xyz_file)[:-4].split("_"))
+    ]
+
+for xyz_file in xyz_files:
+    t0 = time.time()
+    num_pts, num_quads = convert_surface_file(xyz_file)
+    print(f"Converted {xyz_file}: {num_pts} points, {num_quads} quads in {time.time() - t0:.2f} s")
+
+print(f"Converted {len(xyz_files)} surface files")
@@ -0,0 +1,41 @@
+# Standard Python modules
+import argparse
+
+# External modules
+import numpy as np
+import openmdao.api as om
+
+# Local modules
+from aero.surrogate import POST_FUNCS, QuadraticSurrogate, get_input_names, read_recorder, save_samples
+
+# ==============================================================================
+# Command Line Arguments
+# ==============================================================================
+parser = argparse.ArgumentParser(
+    description="Collects the aero samples of an aeroprop_run recorder file for use with --aero_surrogate"
+)
+parser.add_argument("recorder", help="Recorder file of an ADflow run, e.g. OUTPUT/recorder.sql")
+parser.add_argument("--output", default="aero_surrogate.npz", help="File to write the samples to")
+parser.add_argument("--model", default="az", choices=["az", "bc"], help="Fan model used in the recorded run")
+parser.add_argument("--point", default="cruise0", help="Path of the scenario to read the samples of")
+args = parser.parse_args()
+
+# ==============================================================================
+# Read and save the samples
+# ==============================================================================
+input_names = get_input_names(args.model)
+
+# The coupling functions are all outputs of the aero coupling group that were recorded
+cr = om.CaseReader(args.recorder)
+prefix = f"{args.point}.coupling.aero."
+recorded = cr.list_source_vars("driver", out_stream=None)["outputs"]
+coupling_funcs = sorted(name[len(prefix) :] for name in recorded if name.startswith(prefix))
+
+X, Y_coupling, Y_post = read_recorder(args.recorder, args.point, input_names, coupling_funcs)
+save_samples(args.output, input_names, coupling_funcs, POST_FUNCS, X, Y_coupling, Y_post)
+
+# Report how well a fit to all samples reproduces them
+fit = QuadraticSurrogate(X, Y_coupling)
+err = np.max(np.abs(np.array([fit.evaluate(x) for x in X]) - Y_coupling), axis=0)
+print(f"Wrote {X.shape[0]} samples of {len(coupling_funcs)} coupling functions to {args.output}")
+print(f"Largest fit error at the samples: {np.max(err):.4e} ({coupling_funcs[np.argmax(err)]})")
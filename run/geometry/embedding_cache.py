@@ -0,0 +1,126 @@
+"""On-disk cache of the point sets embedded in a VSP geometry and of the triangulated constraint surface"""
+
+# Standard Python modules
+import hashlib
+import os
+import pickle
+
+# External modules
+import numpy as np
+
+# Attributes of DVGeometryVSP that addPointSet adds an entry to, keyed by the point set name
+POINT_SET_ATTRS = ["pointSets", "points", "updated", "updatedJac"]
+
+
+def file_hash(file_name):
+    """Returns the sha1 hash of the contents of a file."""
+    sha = hashlib.sha1()
+    with open(file_name, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Caches the projections of point sets onto a VSP geometry.
+
+    Embedding a point set in DVGeometryVSP projects every point onto the
+    VSP surfaces, which is a large part of the setup time on the fine
+    meshes. The cache wraps addPointSet of a DVGeo, so the surface mesh
+    and the points of the thickness constraints are only projected once.
+    Every proc keeps its own files because the point sets are distributed.
+    A point set is only read from the cache if the files of all procs are
+    there, otherwise all procs embed it again.
+    The key is made from the mesh level, the hash of the VSP file, the
+    number of procs and the points themselves, so changing any of them
+    embeds the points again.
+
+    The triangulated surface of the thickness constraints is cached by the
+    name, size and modification time of the grid file and the number of procs.
+
+    Parameters
+    ----------
+    path : str
+        Directory to store the cached embeddings in.
+    level : str
+        Mesh level.
+    vsp_file : str
+        The VSP file of the geometry.
+    comm : MPI.Comm
+        Comm of the geometry component.
+    """
+
+    def __init__(self, path, level, vsp_file, comm):
+        self.path = path
+        self.comm = comm
+        self.hits = 0
+        self.misses = 0
+
+        self._prefix = f"{level}_{file_hash(vsp_file)}_{comm.size}"
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, name, key):
+        return os.path.join(self.path, f"{name}_{key}_{self.comm.rank}.pkl")
+
+    def _load(self, file_name):
+        """Returns the object of a file on this proc if all procs have one, otherwise None on all procs."""
+        obj = None
+        if os.path.isfile(file_name):
+            with open(file_name, "rb") as f:
+                obj = pickle.load(f)
+
+        # What follows a miss is collective, e.g. the projections of addPointSet, so all procs have to agree on a hit
+        if self.comm.allreduce(obj is None):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return obj
+
+    def _dump(self, file_name, obj):
+        tmp_file = f"{file_name}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(obj, f)
+        os.replace(tmp_file, file_name)
+
+    def wrap(self, DVGeo):
+        """Makes addPointSet of a DVGeometryVSP read and write the cache."""
+        add_point_set = DVGeo.addPointSet
+
+        def cached_add_point_set(points, ptName, **kwargs):
+            points = np.asarray(points)
+            sha = hashlib.sha1(self._prefix.encode())
+            sha.update(np.ascontiguousarray(points, dtype=float).tobytes())
+            file_name = self._file(ptName, sha.hexdigest())
+
+            entry = self._load(file_name)
+            if entry is not None:
+                if ptName not in DVGeo.ptSetNames:
+                    DVGeo.ptSetNames.append(ptName)
+                for attr, val in entry.items():
+                    getattr(DVGeo, attr)[ptName] = val
+                return
+
+            add_point_set(points, ptName, **kwargs)
+            entry = {attr: getattr(DVGeo, attr)[ptName] for attr in POINT_SET_ATTRS if ptName in getattr(DVGeo, attr)}
+            self._dump(file_name, entry)
+
+        DVGeo.addPointSet = cached_add_point_set
+
+    def triangulated_surface(self, mesh, grid_file):
+        """Returns the triangulated surface of a mesh component, from the cache if the grid file is unchanged."""
+        stat = os.stat(grid_file)
+        key = f"{os.path.basename(grid_file)}_{stat.st_size}_{stat.st_mtime_ns}_{self.comm.size}"
+        file_name = self._file("tri_surface", hashlib.sha1(key.encode()).hexdigest())
+
+        tri_points = self._load(file_name)
+        if tri_points is None:
+            tri_points = mesh.mphys_get_triangulated_surface()
+            self._dump(file_name, tri_points)
+
+        return tri_points
+
+    def summary(self):
+        """Returns a one-line summary of the cache use on this proc."""
+        return f"{self.hits} hits, {self.misses} misses"
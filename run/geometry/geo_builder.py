@@ -0,0 +1,19 @@
+# External modules
+from mphys.builder import Builder
+
+# Local modules
+from .thickness import BatchedThicknessDVGeoComp
+
+
+class VSPGeometryBuilder(Builder):
+    """Builds one OpenVSP geometry component per scenario for parallel multipoint runs."""
+
+    def __init__(self, file, options=None):
+        self.file = file
+        self.options = options if options is not None else {}
+
+    def initialize(self, comm):
+        pass
+
+    def get_mesh_coordinate_subsystem(self, scenario_name=None):
+        return BatchedThicknessDVGeoComp(file=self.file, type="vsp", options=self.options)
@@ -1,31 +1,79 @@
 # External modules
+import numpy as np
 import openmdao.api as om
 
+# Local modules
+from .geo_vars import linked_geo_vars
 
-class TELink(om.ExplicitComponent):
-    def setup(self):
-        self.add_input("XSecCurve_0", desc="Nacelle inner trailing edge diameter")
 
-        self.add_output("XSecCurve_8", desc="Nacelle outer trailing edge diameter")
+class GeoLink(om.ExplicitComponent):
+    """
+    Sets the linked geometry DVs as affine functions of the other geometry DVs.
 
-        self.declare_partials("XSecCurve_8", "XSecCurve_0", val=1.0)
+    All links are evaluated as one matrix product, so the Jacobian is
+    constant and only has the nonzeros of the link coefficients. The inputs
+    and outputs are named like the DVs, comp:group:var.
+    """
 
-    def compute(self, inputs, outputs):
-        outputs["XSecCurve_8"] = inputs["XSecCurve_0"] + 0.2
+    def initialize(self):
+        self.options.declare(
+            "links", default=linked_geo_vars, types=list, desc="List of LinkedGeoVar tuples of the links to evaluate"
+        )
 
+    @property
+    def targets(self):
+        """Names of the linked DVs that this component sets."""
+        return [link.target for link in self.options["links"]]
+
+    @property
+    def sources(self):
+        """Names of the DVs that the linked DVs depend on."""
+        return list(dict.fromkeys(source for link in self.options["links"] for source in link.sources))
 
-class FanLink(om.ExplicitComponent):
     def setup(self):
-        self.add_input("XSecCurve_1", desc="Fan exit diameter")
+        links = self.options["links"]
+        targets = self.targets
+        sources = self.sources
+
+        # Chained links would depend on the order of evaluation
+        chained = set(targets) & set(sources)
+        if chained:
+            raise ValueError(f"Linked geometry DVs cannot be sources of other links: {sorted(chained)}")
 
-        self.add_output("XSecCurve_2", desc="Fan face diameter")
+        self._coeffs = np.zeros((len(targets), len(sources)))
+        self._offsets = np.array([link.offset for link in links], dtype=float)
 
-        self.declare_partials("XSecCurve_2", "XSecCurve_1", val=1.0)
+        for source in sources:
+            self.add_input(source)
+
+        for i, link in enumerate(links):
+            self.add_output(link.target)
+            for source, coeff in link.sources.items():
+                j = sources.index(source)
+                self._coeffs[i, j] = coeff
+                self.declare_partials(link.target, source, val=coeff)
 
     def compute(self, inputs, outputs):
-        outputs["XSecCurve_2"] = inputs["XSecCurve_1"]
+        x = np.array([inputs[source][0] for source in self.sources])
+        y = self._coeffs.dot(x) + self._offsets
+        for target, val in zip(self.targets, y):
+            outputs[target] = val
 
-class GeoLink(om.Group):
-    def setup(self):
-        self.add_subsystem("te_link", TELink(), promotes=["*"])
-        self.add_subsystem("fan_link", FanLink(), promotes=["*"])
+    def connect_dvs(self, group, dv_path, geo_paths):
+        """
+        Connects the source DVs to this component and the linked DVs to the geometry components.
+
+        Parameters
+        ----------
+        group : Group
+            The group that contains this component, the DVs and the geometry components.
+        dv_path : str
+            Path of the component with the DVs relative to the group.
+        geo_paths : list(str)
+            Paths of the geometry components relative to the group.
+        """
+        path = self.pathname[len(group.pathname) + 1 :] if group.pathname else self.pathname
+        for source in self.sources:
+            group.connect(f"{dv_path}.{source}", f"{path}.{source}")
+        for target in self.targets:
+            group.connect(f"{path}.{target}", [f"{geo}.{target}" for geo in geo_paths])
@@ -8,6 +8,11 @@ comp_core = "Core"
 # --- Named tuple for geometry variables ---
 GeoVar = namedtuple("GeoVar", ["comp", "group", "var", "lower", "upper", "ref", "dh"])
 
+# --- Named tuple for linked geometry variables ---
+# The target DV is set to offset + sum(coeff * source DV) instead of being a DV itself.
+# DVs are named comp:group:var, sources is a dict of the source DVs and their coefficients.
+LinkedGeoVar = namedtuple("LinkedGeoVar", ["target", "sources", "offset"])
+
 
 # list of variables to add:
 geo_vars = [
@@ -56,3 +61,20 @@ geo_vars = [
     # outer nozzle L=R @ -8
     GeoVar(comp=comp_nacelle, group="XSec_7", var="TopLAngle", lower=-60, upper=60, ref=1.0, dh=1e-6),
 ]
+
+
+# list of variables that are linked to others:
+linked_geo_vars = [
+    # nacelle outer TE is 0.2 in larger than the inner TE
+    LinkedGeoVar(
+        target=f"{comp_nacelle}:XSecCurve_8:Circle_Diameter",
+        sources={f"{comp_nacelle}:XSecCurve_0:Circle_Diameter": 1.0},
+        offset=0.2,
+    ),
+    # fan face is the same as the fan exit
+    LinkedGeoVar(
+        target=f"{comp_nacelle}:XSecCurve_2:Circle_Diameter",
+        sources={f"{comp_nacelle}:XSecCurve_1:Circle_Diameter": 1.0},
+        offset=0.0,
+    ),
+]
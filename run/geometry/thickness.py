@@ -0,0 +1,117 @@
+"""Geometry component that evaluates all thickness constraints and their Jacobian in one batch"""
+
+# External modules
+import numpy as np
+from pygeo.mphys import OM_DVGEOCOMP
+from scipy.sparse import csr_matrix
+
+
+class BatchedThicknessDVGeoComp(OM_DVGEOCOMP):
+    """
+    OM_DVGEOCOMP that evaluates the thickness constraints itself instead of through DVCon.
+
+    The points of every thickness constraint are projected onto the
+    constraint surface and embedded in the VSP geometry once, when the
+    constraint is added. DVCon then evaluates every constraint on its own
+    and builds a dense (nCon, 2 nCon, 3) seed for the sensitivities of
+    every one of them. Here the thicknesses of all constraints are
+    evaluated at once, and their Jacobian to the VSP DVs is the product of
+    the sparse derivatives of the thicknesses to the points with the
+    stacked finite difference Jacobians of the point sets, which DVGeo
+    computes once per design for all point sets anyway. The cost grows
+    linearly with the number of thickness stations.
+    """
+
+    def initialize(self):
+        super().initialize()
+        self.thickness_cons = {}
+        self._thickness_jac = None
+
+    def nom_addThicknessConstraints1D(self, name, ptList, nCon, axis, scaled=True, **kwargs):
+        self.DVCon.addThicknessConstraints1D(ptList, nCon, axis, name=name, scaled=scaled, addToPyOpt=False, **kwargs)
+
+        # DVCon embedded the points, the constraint is evaluated here with the others
+        self.thickness_cons[name] = self.DVCon.constraints["thickCon"].pop(name)
+        self.add_output(name, distributed=False, val=np.ones(nCon), shape=nCon)
+
+    def nom_writeTecplot(self, file_name):
+        """Writes the DVCon constraints and the thickness constraints evaluated here to a Tecplot file."""
+        thick_cons = self.DVCon.constraints.setdefault("thickCon", {})
+        thick_cons.update(self.thickness_cons)
+        try:
+            self.DVCon.writeTecplot(file_name)
+        finally:
+            for name in self.thickness_cons:
+                thick_cons.pop(name)
+
+    def _thickness_points(self):
+        """Returns the current points of all thickness constraints, in pairs."""
+        coords = []
+        for con in self.thickness_cons.values():
+            con.coords = con.DVGeo.update(con.name)
+            coords.append(con.coords)
+        return np.concatenate(coords)
+
+    def _thickness_scale(self):
+        """Returns the factor every thickness is multiplied with, 1 / D0 for the scaled constraints."""
+        return np.concatenate(
+            [1.0 / con.D0 if con.scaled else np.ones(con.nCon) for con in self.thickness_cons.values()]
+        )
+
+    def compute(self, inputs, outputs):
+        super().compute(inputs, outputs)
+
+        # The design changed, so the Jacobian of the last design is stale
+        self._thickness_jac = None
+        if not self.thickness_cons:
+            return
+
+        coords = self._thickness_points()
+        thickness = np.linalg.norm(coords[0::2] - coords[1::2], axis=1) * self._thickness_scale()
+
+        start = 0
+        for name, con in self.thickness_cons.items():
+            outputs[name] = thickness[start : start + con.nCon]
+            start += con.nCon
+
+    def _compute_thickness_jac(self):
+        """Returns the names of the VSP DVs and the Jacobian of all thicknesses to them."""
+        cons = list(self.thickness_cons.values())
+        DVGeo = cons[0].DVGeo
+
+        # Brings the finite difference Jacobians of the point sets up to date, nothing is done if they are
+        for con in cons:
+            DVGeo.totalSensitivity(np.zeros((1, len(con.coords), 3)), con.name)
+        point_jac = np.vstack([DVGeo.pointSets[con.name].jac for con in cons])
+
+        # Every thickness only depends on the 3 coordinates of its 2 points
+        coords = np.concatenate([con.coords for con in cons])
+        num_cons = len(coords) // 2
+        diff = coords[0::2] - coords[1::2]
+        dthickness = diff / np.linalg.norm(diff, axis=1)[:, None] * self._thickness_scale()[:, None]
+
+        rows = np.repeat(np.arange(num_cons), 6)
+        cols = (6 * np.arange(num_cons)[:, None] + np.arange(6)).ravel()
+        vals = np.hstack([dthickness, -dthickness]).ravel()
+        dthickness_dpts = csr_matrix((vals, (rows, cols)), shape=(num_cons, point_jac.shape[0]))
+
+        return list(DVGeo.getValues()), dthickness_dpts @ point_jac
+
+    def compute_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        super().compute_jacvec_product(inputs, d_inputs, d_outputs, mode)
+
+        if mode != "rev" or len(list(d_inputs.keys())) == 0 or not self.thickness_cons:
+            return
+
+        # Only computed once per design, this is called once for every thickness
+        if self._thickness_jac is None:
+            self._thickness_jac = self._compute_thickness_jac()
+        dv_names, jac = self._thickness_jac
+
+        # Like the DVCon constraints, the contribution is only added on the root proc and reduced by OpenMDAO
+        if self.comm.rank == 0:
+            dout = np.concatenate([d_outputs[name] for name in self.thickness_cons])
+            dx = jac.T.dot(dout)
+            for i, dv_name in enumerate(dv_names):
+                if dv_name in d_inputs:
+                    d_inputs[dv_name] += dx[i]
@@ -0,0 +1,117 @@
+"""Finite difference Jacobian of the VSP point sets, computed once per design and optionally on a local process pool"""
+
+# Standard Python modules
+import multiprocessing
+
+# External modules
+import numpy as np
+
+# State of the Jacobian being computed, set before the pool is forked so the workers inherit it
+_FD_STATE = None
+
+
+def _perturbed_points(i):
+    """Returns the finite difference derivatives of all point sets to DV i. Runs in a forked worker."""
+    DVGeo, x0, dv_names, pts0 = _FD_STATE
+    name = dv_names[i]
+    dh = DVGeo.DVs[name].dh
+
+    # A worker computes several DVs, so all of them are set to undo the previous perturbation
+    DVGeo.setDesignVars({**x0, name: x0[name] + dh})
+    return {pt_name: ((DVGeo.update(pt_name) - pts) / dh).ravel() for pt_name, pts in pts0.items()}
+
+
+class LazyVSPJacobian:
+    """
+    Computes the Jacobian of the point sets of a DVGeometryVSP only when a derivative needs it.
+
+    DVGeometryVSP finite differences the point sets with respect to every
+    VSP parameter, one VSP regeneration per DV, whenever the DVs are set.
+    Most model evaluations, e.g. in a line search, never ask for a
+    derivative, and the DVs are often set to the values they already have.
+    With the wrapper, setting unchanged DVs does nothing and the Jacobian
+    is only computed when a sensitivity of the current design is asked for,
+    after which it is reused until a DV changes.
+
+    The perturbations are spread over the procs of the DVGeo comm by
+    DVGeometryVSP. With num_workers > 1, they are instead spread over a
+    pool of forked processes on every proc, each of which only evaluates
+    the local points. The workers do not use MPI.
+
+    Parameters
+    ----------
+    comm : MPI.Comm
+        Comm of the geometry component.
+    num_workers : int
+        Number of local processes to compute the Jacobian with. 0 or 1
+        uses the parallel finite differences of DVGeometryVSP.
+    """
+
+    def __init__(self, comm, num_workers=0):
+        self.comm = comm
+        self.num_workers = num_workers
+        self.num_sets = 0
+        self.num_unchanged = 0
+        self.num_jacobians = 0
+
+    def wrap(self, DVGeo):
+        """Makes setDesignVars of a DVGeometryVSP skip unchanged DVs and defer the Jacobian to the first sensitivity."""
+        set_design_vars = DVGeo.setDesignVars
+        compute_surf_jacobian = DVGeo._computeSurfJacobian
+        deferring = [False]
+
+        def lazy_set_design_vars(dvDict):
+            current = DVGeo.getValues()
+            keys = [key for key in dvDict if key in current]
+            self.num_sets += 1
+            if all(np.array_equal(np.ravel(dvDict[key]), np.ravel(current[key])) for key in keys):
+                self.num_unchanged += 1
+                return
+
+            deferring[0] = True
+            try:
+                set_design_vars(dvDict)
+            finally:
+                deferring[0] = False
+
+        def lazy_compute_surf_jacobian(*args, **kwargs):
+            # Only flag the Jacobians as stale, totalSensitivity computes them when they are needed
+            if deferring[0]:
+                for name in DVGeo.pointSets:
+                    DVGeo.pointSets[name].jac = None
+                    DVGeo.updatedJac[name] = False
+                return
+
+            self.num_jacobians += 1
+            if self.num_workers > 1:
+                self._pool_jacobian(DVGeo)
+            else:
+                compute_surf_jacobian(*args, **kwargs)
+
+        DVGeo.setDesignVars = lazy_set_design_vars
+        DVGeo._computeSurfJacobian = lazy_compute_surf_jacobian
+
+    def _pool_jacobian(self, DVGeo):
+        global _FD_STATE
+
+        x0 = DVGeo.getValues()
+        dv_names = list(x0)
+        pts0 = {name: DVGeo.update(name) for name in DVGeo.pointSets}
+
+        _FD_STATE = (DVGeo, x0, dv_names, pts0)
+        try:
+            with multiprocessing.get_context("fork").Pool(min(self.num_workers, len(dv_names))) as pool:
+                columns = pool.map(_perturbed_points, range(len(dv_names)))
+        finally:
+            _FD_STATE = None
+
+        for name in pts0:
+            DVGeo.pointSets[name].jac = np.column_stack([col[name] for col in columns])
+            DVGeo.updatedJac[name] = True
+
+    def summary(self):
+        """Returns a one-line summary of the DV updates and Jacobians on this proc."""
+        return (
+            f"{self.num_jacobians} Jacobians for {self.num_sets} DV updates, "
+            f"{self.num_unchanged} of which did not change the DVs"
+        )
@@ -0,0 +1,54 @@
+# Standard Python modules
+import argparse
+import os
+import subprocess
+import sys
+
+# ==============================================================================
+# Command Line Arguments
+# ==============================================================================
+parser = argparse.ArgumentParser(
+    description="Optimizes on a sequence of meshes from coarse to fine with aeroprop_run.py. Every level starts from "
+    "the final design and fan states of the previous one. Other arguments are passed on to aeroprop_run.py"
+)
+parser.add_argument("--levels", default="L2,L1,L0", help="Comma separated mesh levels, from the coarsest to the finest")
+parser.add_argument("--nprocs", type=int, default=1, help="Number of procs of every optimization")
+parser.add_argument("--mpirun", default="mpirun", help="Command that launches the MPI jobs")
+parser.add_argument(
+    "--output_dir", default="./OUTPUT/", help="Output file directory, every level writes to a subdirectory"
+)
+parser.add_argument(
+    "--coarse_opt_tol",
+    type=float,
+    default=1e-4,
+    help="Major optimality tolerance on all but the finest level. The design only has to be close for the next one",
+)
+parser.add_argument("--opt_tol", type=float, default=1e-6, help="Major optimality tolerance on the finest level")
+args, run_args = parser.parse_known_args()
+
+levels = args.levels.split(",")
+run_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aeroprop_run.py")
+
+# ==============================================================================
+# Optimize every level
+# ==============================================================================
+prev_dir = None
+for i, level in enumerate(levels):
+    output_dir = os.path.join(args.output_dir, level)
+    opt_tol = args.opt_tol if i == len(levels) - 1 else args.coarse_opt_tol
+
+    cmd = [args.mpirun, "-n", str(args.nprocs), sys.executable, run_file, "--task", "opt", "--level", level]
+    cmd += ["--output_dir", output_dir, "--opt_tol", str(opt_tol)]
+    if prev_dir is not None:
+        cmd += ["--init_design", os.path.join(prev_dir, "design.json")]
+        cmd += ["--init_checkpoint", os.path.join(prev_dir, "checkpoint")]
+    cmd += run_args
+
+    print(f"Optimizing on {level}: {' '.join(cmd)}", flush=True)
+    result = subprocess.run(cmd)
+    if result.returncode != 0:
+        sys.exit(f"The optimization on {level} failed with return code {result.returncode}")
+
+    prev_dir = output_dir
+
+print(f"Finished the mesh sequence {args.levels}, the final design is in {os.path.join(prev_dir, 'design.json')}")
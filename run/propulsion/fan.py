@@ -1,19 +1,28 @@
 # External modules
+import numpy as np
 import openmdao.api as om
 import pycycle.api as pyc
 
 # Local modules
+from .fan_state_cache import FanStateCache, WarmStartNewton
+from .fan_map_table import TableCompressor
 from .n3_fan_map import FanMap
 
 
 class FPR(om.ExplicitComponent):
+    def initialize(self):
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
+
     def setup(self):
-        self.add_input("aero:P_tot:fan_face", desc="Total pressure at the fan face", units="Pa")
-        self.add_input("aero:P_tot:fan_exit", desc="Total pressure at the fan exit", units="Pa")
+        nn = self.options["num_nodes"]
+
+        self.add_input("aero:P_tot:fan_face", shape=nn, desc="Total pressure at the fan face", units="Pa")
+        self.add_input("aero:P_tot:fan_exit", shape=nn, desc="Total pressure at the fan exit", units="Pa")
 
-        self.add_output("FPR", desc="Fan pressure ratio")
+        self.add_output("FPR", shape=nn, desc="Fan pressure ratio")
 
-        self.declare_partials("*", "*")
+        ar = np.arange(nn)
+        self.declare_partials("*", "*", rows=ar, cols=ar)
 
     def compute(self, inputs, outputs):
         outputs["FPR"] = inputs["aero:P_tot:fan_exit"] / inputs["aero:P_tot:fan_face"]
@@ -48,8 +57,38 @@ class FanPerformance(om.ExplicitComponent):
 
 
 class PoddedFan(pyc.Cycle):
+    # CFD inputs that the converged fan state depends on
+    cache_inputs = [
+        "aero:P_stat:fan_face",
+        "aero:mdot:fan_face",
+        "aero:area:fan_face",
+        "aero:V:fan_face",
+    ]
+
+    def initialize(self):
+        super().initialize()
+        self.options.declare(
+            "warm_start", default=True, types=bool, desc="Flag to start the Newton solve from cached converged states"
+        )
+        self.options.declare("cache_size", default=50, types=int, desc="Number of converged states to cache")
+        self.options.declare(
+            "cache_tol", default=0.05, types=float, desc="Relative difference of the inputs for a cache hit"
+        )
+        self.options.declare(
+            "map_method",
+            default="slinear",
+            values=["slinear", "pchip", "akima"],
+            desc="Fan map interpolation. pchip and akima are smooth and monotone between the map points. The design "
+            "mode only reads the map at the design point, so it only changes the off-design results",
+        )
+
     def setup(self):
         design = self.options["design"]
+        map_method = self.options["map_method"]
+
+        self.state_cache = FanStateCache(max_size=self.options["cache_size"], tol=self.options["cache_tol"])
+        self._cache_key = None
+        self._cache_paths = None
 
         self.add_subsystem(
             "cfd_start",
@@ -62,7 +101,8 @@ class PoddedFan(pyc.Cycle):
             ],
         )
         self.add_subsystem("fpr", FPR(), promotes_inputs=["*"], promotes_outputs=["*"])
-        self.add_subsystem("fan", pyc.Compressor(map_data=FanMap, design=design, map_extrap=True))
+        # All fans share the spline table of the map instead of setting up three interpolations each
+        self.add_subsystem("fan", TableCompressor(map_data=FanMap, design=design, table_method=map_method))
         self.add_subsystem(
             "perf",
             FanPerformance(),
@@ -84,7 +124,7 @@ class PoddedFan(pyc.Cycle):
         self.connect("fan.enth_rise.ht_out", "perf.prop:h_real")
         self.connect("fan.ideal_flow.h", "perf.prop:h_ideal")
 
-        newton = self.nonlinear_solver = om.NewtonSolver()
+        newton = self.nonlinear_solver = WarmStartNewton()
         newton.options["atol"] = 1e-10
         newton.options["rtol"] = 1e-10
         newton.options["iprint"] = 2
@@ -97,3 +137,95 @@ class PoddedFan(pyc.Cycle):
         self.linear_solver = om.DirectSolver()
 
         super().setup()
+
+    def guess_nonlinear(self, inputs, outputs, residuals):
+        if not self.options["warm_start"]:
+            return
+
+        # The promoted inputs feed several components, so read each one from its first target
+        if self._cache_paths is None:
+            meta = self.get_io_metadata(iotypes="input", return_rel_names=True)
+            self._cache_paths = {}
+            for rel_name, var_meta in meta.items():
+                self._cache_paths.setdefault(var_meta["prom_name"], rel_name)
+
+        values = [inputs[self._cache_paths[name]][0] for name in self.cache_inputs]
+        FPR = inputs["fpr.aero:P_tot:fan_exit"][0] / inputs["fpr.aero:P_tot:fan_face"][0]
+        self._cache_key = np.array(values + [FPR]).real
+
+        # The solver stores the converged state under this key once it is done
+        state = self.state_cache.lookup(self._cache_key)
+        if state is not None:
+            outputs.set_val(state)
+
+    def save_state(self, file_name):
+        """Writes the current outputs and the cached converged states to a file."""
+        np.savez(file_name, outputs=self._outputs.asarray(), **self.state_cache.to_arrays())
+
+    def load_state(self, file_name):
+        """Restores the outputs and the cached converged states from a file written by save_state."""
+        with np.load(file_name) as data:
+            self._outputs.set_val(data["outputs"])
+            self.state_cache.from_arrays(data["cache_keys"], data["cache_states"])
+
+
+class FanNodeGather(om.ExplicitComponent):
+    """Collects the scalar outputs of each PoddedFan node into arrays of length num_nodes."""
+
+    def initialize(self):
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
+        self.options.declare("var_units", types=dict, desc="Units of the gathered variables keyed by name")
+
+    def setup(self):
+        nn = self.options["num_nodes"]
+
+        for name, units in self.options["var_units"].items():
+            self.add_output(name, shape=nn, units=units)
+            for i in range(nn):
+                self.add_input(f"{name}_{i}", units=units)
+                self.declare_partials(name, f"{name}_{i}", rows=[i], cols=[0], val=1.0)
+
+    def compute(self, inputs, outputs):
+        nn = self.options["num_nodes"]
+
+        for name in self.options["var_units"]:
+            outputs[name] = [inputs[f"{name}_{i}"][0] for i in range(nn)]
+
+
+class MultiPoddedFan(om.Group):
+    """
+    Evaluates one PoddedFan cycle for each of num_nodes flight conditions.
+
+    pyCycle flow stations only support scalar values, so the thermodynamic
+    cycle is still built once per node. The group takes the CFD inputs as
+    arrays of length num_nodes and gathers the fan outputs back into arrays
+    so that it is a drop-in replacement for a single PoddedFan.
+    """
+
+    def initialize(self):
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
+        self.options.declare("design", default=True)
+
+    def setup(self):
+        nn = self.options["num_nodes"]
+        design = self.options["design"]
+
+        fan_inputs = [
+            "aero:P_stat:fan_face",
+            "aero:mdot:fan_face",
+            "aero:area:fan_face",
+            "aero:V:fan_face",
+            "aero:P_tot:fan_face",
+            "aero:P_tot:fan_exit",
+        ]
+        fan_outputs = {"FPR": None, "prop:shaft_power": "kW", "prop:delta_heat": "kW"}
+
+        for i in range(nn):
+            self.add_subsystem(f"node_{i}", PoddedFan(design=design))
+            self.promotes(f"node_{i}", inputs=fan_inputs, src_indices=[i], src_shape=(nn,))
+
+        gather = FanNodeGather(num_nodes=nn, var_units=fan_outputs)
+        self.add_subsystem("gather", gather, promotes_outputs=list(fan_outputs))
+        for name in fan_outputs:
+            for i in range(nn):
+                self.connect(f"node_{i}.{name}", f"gather.{name}_{i}")
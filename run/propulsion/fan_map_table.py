@@ -0,0 +1,322 @@
+"""Precomputed interpolation tables for the fan map with a batched evaluation API"""
+
+# Standard Python modules
+import hashlib
+
+# External modules
+import numpy as np
+import openmdao.api as om
+import pycycle.api as pyc
+from pycycle.elements.compressor_map import CompressorMap
+from scipy.interpolate import Akima1DInterpolator, PchipInterpolator
+
+# Local modules
+from .n3_fan_map import FanMap
+
+# Tables that were already built in this process, keyed by their hash
+_TABLES = {}
+
+# Interpolation methods whose slopes at the nodes depend on the values, so they are fit per output
+HERMITE_METHODS = {"pchip": PchipInterpolator, "akima": Akima1DInterpolator}
+
+# Power form of the cubic Hermite basis in t, rows for y0, h * m0, y1 and h * m1
+_HERMITE = np.array(
+    [
+        [1.0, 0.0, -3.0, 2.0],
+        [0.0, 1.0, -2.0, 1.0],
+        [0.0, 0.0, 3.0, -2.0],
+        [0.0, 0.0, -1.0, 1.0],
+    ]
+)
+
+
+def _spline_slopes(x):
+    """Returns the matrix that maps node values to the slopes of a natural cubic spline through them."""
+    n = x.size
+    h = np.diff(x)
+
+    A = np.zeros((n, n))
+    B = np.zeros((n, n))
+
+    # Natural end conditions
+    A[0, 0:2] = [2.0, 1.0]
+    B[0, 0:2] = [-3.0 / h[0], 3.0 / h[0]]
+    A[-1, -2:] = [1.0, 2.0]
+    B[-1, -2:] = [-3.0 / h[-1], 3.0 / h[-1]]
+
+    # Slope continuity of the second derivative at the interior nodes
+    for i in range(1, n - 1):
+        A[i, i - 1 : i + 2] = [h[i], 2.0 * (h[i - 1] + h[i]), h[i - 1]]
+        B[i, i - 1] = -3.0 * h[i] / h[i - 1]
+        B[i, i] = 3.0 * (h[i] / h[i - 1] - h[i - 1] / h[i])
+        B[i, i + 1] = 3.0 * h[i - 1] / h[i]
+
+    return np.linalg.solve(A, B)
+
+
+def _axis_operator(x, method):
+    """Returns the (n-1, order, n) operator that maps node values along one axis to the
+    polynomial coefficients of each interval in the normalized coordinate t in [0, 1]."""
+    n = x.size
+    h = np.diff(x)
+    eye = np.eye(n)
+
+    if method == "slinear":
+        M = np.zeros((n - 1, 2, n))
+        for i in range(n - 1):
+            M[i, 0] = eye[i]
+            M[i, 1] = eye[i + 1] - eye[i]
+
+    elif method == "cubic":
+        S = _spline_slopes(x)
+        M = np.zeros((n - 1, 4, n))
+        for i in range(n - 1):
+            y0, y1 = eye[i], eye[i + 1]
+            m0, m1 = h[i] * S[i], h[i] * S[i + 1]
+            # Power form of the cubic Hermite polynomial in the interval
+            M[i, 0] = y0
+            M[i, 1] = m0
+            M[i, 2] = 3.0 * (y1 - y0) - 2.0 * m0 - m1
+            M[i, 3] = 2.0 * (y0 - y1) + m0 + m1
+
+    else:
+        raise ValueError(f"Unknown fan map interpolation method '{method}'")
+
+    return M
+
+
+def _node_slopes(x, y, axis, method):
+    """Returns the slopes at the nodes of the monotone interpolation of y along one axis."""
+    if x.size == 2:
+        # Both methods are linear between two nodes
+        slope = np.diff(y, axis=axis) / (x[1] - x[0])
+        return np.repeat(slope, 2, axis=axis)
+
+    return HERMITE_METHODS[method](x, y, axis=axis).derivative()(x)
+
+
+def _hermite_fit(grids, values, method):
+    """
+    Returns the per-cell power form coefficients of a tensor-product cubic Hermite interpolation.
+
+    The slopes along every axis come from the 1D monotone interpolation of
+    the values along that axis, and the mixed derivatives from applying it
+    to the slopes of the other axes, like the cross terms of a
+    tensor-product spline. Along the grid lines the interpolation is the
+    1D one, so plateaus in the data stay flat and the map does not overshoot.
+    """
+    n0, n1, n2 = [x.size - 1 for x in grids]
+    h = np.meshgrid(*[np.diff(x) for x in grids], indexing="ij")
+
+    # Derivatives at the nodes along every subset of the axes, e.g. derivs[1, 0, 1] = d2 f / dx0 dx2
+    derivs = {(0, 0, 0): values}
+    for axis in range(3):
+        for key in list(derivs):
+            new_key = tuple(1 if i == axis else d for i, d in enumerate(key))
+            derivs[new_key] = _node_slopes(grids[axis], derivs[key], axis, method)
+
+    # Hermite data of every cell, the index along each axis is 2 * side + derivative
+    data = np.zeros((n0, n1, n2, 4, 4, 4))
+    for key, f in derivs.items():
+        scale = h[0] ** key[0] * h[1] ** key[1] * h[2] ** key[2]
+        for s0 in range(2):
+            for s1 in range(2):
+                for s2 in range(2):
+                    corner = f[s0 : s0 + n0, s1 : s1 + n1, s2 : s2 + n2]
+                    data[:, :, :, 2 * s0 + key[0], 2 * s1 + key[1], 2 * s2 + key[2]] = corner * scale
+
+    return np.einsum("ijkuvw,ua,vb,wc->ijkabc", data, _HERMITE, _HERMITE, _HERMITE, optimize=True)
+
+
+def _powers(t, order):
+    """Returns the powers of t and their derivatives up to the given order."""
+    exps = np.arange(order)
+    P = t[:, None] ** exps
+    dP = np.zeros_like(P)
+    dP[:, 1:] = exps[1:] * t[:, None] ** (exps[1:] - 1)
+    return P, dP
+
+
+class FanMapTable:
+    """
+    Tensor-product spline representation of a pyCycle style compressor map.
+
+    The per-cell polynomial coefficients are computed once and shared by all
+    users in the process, keyed by a hash of the map data and the
+    interpolation method. Points outside the map are extrapolated with the
+    polynomial of the closest cell.
+
+    Parameters
+    ----------
+    map_data : MapData
+        The map data, with param_data and output_data in the pyCycle format.
+    method : str
+        Interpolation method. slinear and cubic are linear and natural
+        cubic splines. pchip and akima are C1 cubic Hermite interpolations
+        with the slopes of the monotone 1D methods of the same name, which
+        keep the plateaus of the map flat.
+    """
+
+    def __init__(self, map_data=FanMap, method="slinear"):
+        self.method = method
+        self.params = [p["name"] for p in map_data.param_data]
+        self.outputs = [o["name"] for o in map_data.output_data]
+        self.grids = [np.asarray(p["values"], dtype=float) for p in map_data.param_data]
+        self.steps = [np.diff(x) for x in self.grids]
+
+        values = {o["name"]: np.asarray(o["values"], dtype=float) for o in map_data.output_data}
+        self.key = self._hash(values)
+
+        if self.key not in _TABLES:
+            _TABLES[self.key] = self._fit(values)
+        self.coeffs = _TABLES[self.key]
+
+    def _hash(self, values):
+        sha = hashlib.sha1(self.method.encode())
+        for x in self.grids:
+            sha.update(np.ascontiguousarray(x).tobytes())
+        for name in self.outputs:
+            sha.update(name.encode())
+            sha.update(np.ascontiguousarray(values[name]).tobytes())
+        return sha.hexdigest()[:16]
+
+    def _fit(self, values):
+        if self.method in HERMITE_METHODS:
+            return {name: _hermite_fit(self.grids, values[name], self.method) for name in self.outputs}
+
+        M0, M1, M2 = [_axis_operator(x, self.method) for x in self.grids]
+        return {
+            name: np.einsum("iap,jbq,kcr,pqr->ijkabc", M0, M1, M2, values[name], optimize=True)
+            for name in self.outputs
+        }
+
+    def evaluate(self, alpha, Nc, Rline, compute_derivs=False):
+        """
+        Evaluates the map at any number of points at once.
+
+        Parameters
+        ----------
+        alpha, Nc, Rline : float or array_like
+            Map coordinates. They are broadcast against each other.
+        compute_derivs : bool
+            Flag to also return the derivatives of the outputs.
+
+        Returns
+        -------
+        values : dict
+            Output values keyed by the output name.
+        derivs : dict
+            Derivatives keyed by (output, param). Only returned if compute_derivs is True.
+        """
+        # Keep complex inputs so that the table can be complex stepped
+        pts = np.broadcast_arrays(*[np.atleast_1d(v) for v in (alpha, Nc, Rline)])
+        dtype = np.result_type(float, *pts)
+        pts = [v.astype(dtype) for v in pts]
+
+        idx = []
+        powers = []
+        for x, h, v in zip(self.grids, self.steps, pts):
+            i = np.clip(np.searchsorted(x, v.real.ravel(), side="right") - 1, 0, x.size - 2)
+            t = (v.ravel() - x[i]) / h[i]
+            idx.append(i)
+            powers.append(_powers(t, 2 if self.method == "slinear" else 4))
+
+        (P0, dP0), (P1, dP1), (P2, dP2) = powers
+
+        values = {}
+        derivs = {}
+        for name in self.outputs:
+            c = self.coeffs[name][idx[0], idx[1], idx[2]]
+            values[name] = np.einsum("nabc,na,nb,nc->n", c, P0, P1, P2).reshape(pts[0].shape)
+
+            if compute_derivs:
+                for param, dP, h, i in zip(
+                    self.params, [(dP0, P1, P2), (P0, dP1, P2), (P0, P1, dP2)], self.steps, idx
+                ):
+                    d = np.einsum("nabc,na,nb,nc->n", c, *dP) / h[i]
+                    derivs[name, param] = d.reshape(pts[0].shape)
+
+        if compute_derivs:
+            return values, derivs
+        return values
+
+
+class FanMapComp(om.ExplicitComponent):
+    """Reads the fan map at num_nodes points using a cached FanMapTable."""
+
+    def initialize(self):
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of points evaluated at once")
+        self.options.declare("map_data", default=FanMap, recordable=False, desc="Map data in the pyCycle format")
+        self.options.declare(
+            "method", default="slinear", values=["slinear", "cubic", "pchip", "akima"], desc="Interpolation method"
+        )
+
+    def setup(self):
+        nn = self.options["num_nodes"]
+        map_data = self.options["map_data"]
+
+        self._table = FanMapTable(map_data, method=self.options["method"])
+
+        for p in map_data.param_data:
+            self.add_input(p["name"], val=p["default"], shape=nn, units=p["units"])
+        for o in map_data.output_data:
+            self.add_output(o["name"], val=o["default"], shape=nn, units=o["units"])
+
+        ar = np.arange(nn)
+        self.declare_partials("*", "*", rows=ar, cols=ar)
+
+    def compute(self, inputs, outputs):
+        values = self._table.evaluate(*[inputs[name] for name in self._table.params])
+        for name, val in values.items():
+            outputs[name] = val
+
+    def compute_partials(self, inputs, partials):
+        _, derivs = self._table.evaluate(*[inputs[name] for name in self._table.params], compute_derivs=True)
+        for key, val in derivs.items():
+            partials[key] = val
+
+
+class TableCompressorMap(CompressorMap):
+    """
+    pyCycle CompressorMap that reads the map with FanMapComps.
+
+    CompressorMap reads the map at the operating point and at the two stall
+    margin points, each time with a new MetaModelStructuredComp that sets up
+    its own interpolation of the map data. Here every read is a FanMapComp,
+    and all of them share one FanMapTable.
+    """
+
+    def initialize(self):
+        super().initialize()
+        self.options.declare(
+            "table_method",
+            default="slinear",
+            values=["slinear", "cubic", "pchip", "akima"],
+            desc="Interpolation method of the FanMapTable",
+        )
+
+    def add_subsystem(self, name, subsys, **kwargs):
+        if isinstance(subsys, om.MetaModelStructuredComp):
+            subsys = FanMapComp(map_data=self.options["map_data"], method=self.options["table_method"])
+        return super().add_subsystem(name, subsys, **kwargs)
+
+
+class TableCompressor(pyc.Compressor):
+    """pyCycle Compressor whose map is a TableCompressorMap. The map is always extrapolated."""
+
+    def initialize(self):
+        super().initialize()
+        self.options.declare(
+            "table_method",
+            default="slinear",
+            values=["slinear", "cubic", "pchip", "akima"],
+            desc="Interpolation method of the FanMapTable",
+        )
+
+    def add_subsystem(self, name, subsys, **kwargs):
+        if isinstance(subsys, CompressorMap) and not isinstance(subsys, TableCompressorMap):
+            options = self.options
+            subsys = TableCompressorMap(
+                map_data=options["map_data"], design=options["design"], table_method=options["table_method"]
+            )
+        return super().add_subsystem(name, subsys, **kwargs)
@@ -0,0 +1,96 @@
+# Standard Python modules
+from collections import deque
+
+# External modules
+import numpy as np
+import openmdao.api as om
+
+
+class FanStateCache:
+    """
+    Stores converged PoddedFan states keyed by the CFD inputs to the fan.
+
+    The keys are compared with the largest relative difference of their
+    entries. A lookup is a hit if the nearest stored key is within tol of
+    the requested one, in which case its state is returned so the Newton
+    solve can start from it. The oldest states are dropped once max_size
+    states are stored.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of states to keep.
+    tol : float
+        Largest relative difference of the keys that still counts as a hit.
+    """
+
+    def __init__(self, max_size=50, tol=0.05):
+        self.tol = tol
+        self.keys = deque(maxlen=max_size)
+        self.states = deque(maxlen=max_size)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, state):
+        """Stores a copy of a converged state."""
+        # Repeated solves at the same inputs only refresh the last state
+        if len(self.keys) > 0 and np.array_equal(self.keys[-1], key):
+            self.states[-1] = np.array(state, copy=True)
+            return
+
+        self.keys.append(np.array(key, dtype=float))
+        self.states.append(np.array(state, copy=True))
+
+    def lookup(self, key):
+        """Returns the stored state nearest to key, or None if there is none within tol."""
+        if len(self.keys) == 0:
+            self.misses += 1
+            return None
+
+        keys = np.array(self.keys)
+        scale = np.maximum(np.abs(keys), 1e-12)
+        dist = np.max(np.abs(keys - key) / scale, axis=1)
+        nearest = np.argmin(dist)
+
+        if dist[nearest] > self.tol:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self.states[nearest]
+
+    def to_arrays(self):
+        """Returns the stored keys and states as arrays, e.g. to save them with np.savez."""
+        return {"cache_keys": np.array(self.keys), "cache_states": np.array(self.states)}
+
+    def from_arrays(self, cache_keys, cache_states):
+        """Replaces the stored keys and states with the ones from to_arrays."""
+        self.keys.clear()
+        self.states.clear()
+        for key, state in zip(cache_keys, cache_states):
+            self.add(key, state)
+
+    def summary(self):
+        """Returns a one-line summary of the cache use."""
+        calls = self.hits + self.misses
+        rate = 100.0 * self.hits / calls if calls > 0 else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), {len(self)} states stored"
+
+
+class WarmStartNewton(om.NewtonSolver):
+    """
+    Newton solver that stores the converged outputs of its system in the
+    system's state_cache, under the key the system set in guess_nonlinear.
+    The solver has to raise on non-convergence (err_on_non_converge), so
+    that only states that met the tolerances are stored.
+    """
+
+    def solve(self):
+        super().solve()
+
+        system = self._system()
+        if getattr(system, "_cache_key", None) is not None:
+            system.state_cache.add(system._cache_key, system._outputs.asarray())
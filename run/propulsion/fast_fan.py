@@ -0,0 +1,211 @@
+"""Closed form ideal gas fan model with analytic derivatives, a fast stand-in for the pyCycle PoddedFan"""
+
+# External modules
+import numpy as np
+import openmdao.api as om
+
+# Local modules
+from .fan import FPR
+
+# Ideal gas properties of air
+GAMMA = 1.4
+R_AIR = 287.05  # J/(kg K)
+CP_AIR = GAMMA * R_AIR / (GAMMA - 1.0)  # J/(kg K)
+
+# Promoted inputs of the PoddedFan and the units compare_with_pycycle takes them in
+PODDED_FAN_INPUTS = {
+    "aero:P_stat:fan_face": "Pa",
+    "aero:mdot:fan_face": "kg/s",
+    "aero:area:fan_face": "m**2",
+    "aero:V:fan_face": "m/s",
+    "aero:P_tot:fan_face": "Pa",
+    "aero:P_tot:fan_exit": "Pa",
+}
+
+# Inputs of the fan, in the order of the gradients below
+FAN_INPUTS = ["aero:P_stat:fan_face", "aero:mdot:fan_face", "aero:area:fan_face", "aero:V:fan_face", "FPR", "MN"]
+
+
+class FastFan(om.ExplicitComponent):
+    """
+    Design point fan cycle from closed form ideal gas relations.
+
+    The inlet total conditions follow from the CFD static pressure,
+    velocity, mass flow and area at the fan face. The temperature ratio of
+    the fan follows from the FPR and a fixed polytropic efficiency, which
+    is what the balance of the pyCycle PoddedFan converges to in design
+    mode. The exit flow station is evaluated at the exit Mach number MN
+    and uses the same names as the pyCycle compressor, so the BC coupling
+    connects to it unchanged. All nodes are evaluated at once and the
+    partials are the exact derivatives of the closed form relations.
+    """
+
+    def initialize(self):
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
+        self.options.declare("eff_poly", default=0.97, types=float, desc="Polytropic efficiency of the fan")
+
+    def setup(self):
+        nn = self.options["num_nodes"]
+
+        self.add_input("aero:P_stat:fan_face", shape=nn, desc="Static pressure from CFD at the fan face", units="Pa")
+        self.add_input("aero:mdot:fan_face", shape=nn, desc="Mass flow rate from CFD at the fan face", units="kg/s")
+        self.add_input("aero:area:fan_face", shape=nn, desc="Area from CFD at the fan face", units="m**2")
+        self.add_input("aero:V:fan_face", shape=nn, desc="Static velocity from CFD at the fan face", units="m/s")
+        self.add_input("FPR", shape=nn, val=1.3, desc="Fan pressure ratio")
+        self.add_input("MN", shape=nn, val=0.5, desc="Mach number of the exit flow station")
+
+        self.add_output("eff", shape=nn, val=0.97, desc="Adiabatic efficiency of the fan")
+        self.add_output("prop:shaft_power", shape=nn, desc="Shaft power output", units="kW")
+        self.add_output("prop:delta_heat", shape=nn, desc="Energy lost as heat from fan efficiency losses", units="kW")
+        self.add_output("Fl_O:tot:P", shape=nn, val=3e4, desc="Total pressure at the fan exit", units="Pa")
+        self.add_output("Fl_O:tot:T", shape=nn, val=250.0, desc="Total temperature at the fan exit", units="degK")
+        self.add_output("Fl_O:stat:P", shape=nn, val=3e4, desc="Static pressure at the fan exit", units="Pa")
+        self.add_output("Fl_O:stat:V", shape=nn, val=150.0, desc="Static velocity at the fan exit", units="m/s")
+        self.add_output("Fl_O:stat:area", shape=nn, val=0.5, desc="Area at the fan exit", units="m**2")
+        self.add_output("Fl_O:stat:W", shape=nn, val=30.0, desc="Mass flow rate at the fan exit", units="kg/s")
+
+        # Every output only depends on the same node of its inputs. The gradients at a typical
+        # operating point tell which inputs it depends on at all.
+        ar = np.arange(nn)
+        x_typical = np.array([[3e4], [30.0], [0.5], [150.0], [1.3], [0.5]])
+        self._wrt = {}
+        for name, (_, grad) in self._outputs_and_grads(x_typical).items():
+            self._wrt[name] = [i for i in range(len(FAN_INPUTS)) if grad[i, 0] != 0.0]
+            self.declare_partials(name, [FAN_INPUTS[i] for i in self._wrt[name]], rows=ar, cols=ar)
+
+    def _outputs_and_grads(self, x):
+        """
+        Returns the outputs and their gradients with respect to the rows of x, the inputs in the order of
+        FAN_INPUTS. Every quantity is carried as a value and a gradient of shape (num inputs, num_nodes).
+        """
+        Ps, W, A, V, pr, MN = x
+        eye = np.eye(len(FAN_INPUTS))[:, :, None] * np.ones_like(Ps)
+        dPs, dW, dA, dV, dpr, dMN = eye
+
+        k = GAMMA / (GAMMA - 1.0)
+        e_ideal = 1.0 / k
+        e_real = 1.0 / (k * self.options["eff_poly"])
+
+        # Inlet static and total conditions from the mass flow
+        Ts = Ps * A * V / (W * R_AIR)
+        dTs = Ts * (dPs / Ps + dA / A + dV / V - dW / W)
+        Tt = Ts + V**2 / (2.0 * CP_AIR)
+        dTt = dTs + V / CP_AIR * dV
+        Pt = Ps * (Tt / Ts) ** k
+        dPt = Pt * (dPs / Ps + k * (dTt / Tt - dTs / Ts))
+
+        # Temperature ratios of the ideal and the real compression
+        tau_ideal = pr**e_ideal
+        dtau_ideal = tau_ideal * e_ideal / pr * dpr
+        tau_real = pr**e_real
+        dtau_real = tau_real * e_real / pr * dpr
+
+        # Powers in kW
+        c = W * CP_AIR * Tt / 1000.0
+        dc = CP_AIR / 1000.0 * (Tt * dW + W * dTt)
+        power = c * (tau_real - 1.0)
+        dpower = dc * (tau_real - 1.0) + c * dtau_real
+        heat = c * (tau_real - tau_ideal)
+        dheat = dc * (tau_real - tau_ideal) + c * (dtau_real - dtau_ideal)
+        eff = (tau_ideal - 1.0) / (tau_real - 1.0)
+        deff = (dtau_ideal - eff * dtau_real) / (tau_real - 1.0)
+
+        # Exit flow station at the exit Mach number
+        Pt_out = Pt * pr
+        dPt_out = dPt * pr + Pt * dpr
+        Tt_out = Tt * tau_real
+        dTt_out = dTt * tau_real + Tt * dtau_real
+        f = 1.0 + 0.5 * (GAMMA - 1.0) * MN**2
+        df = (GAMMA - 1.0) * MN * dMN
+        Ts_out = Tt_out / f
+        dTs_out = Ts_out * (dTt_out / Tt_out - df / f)
+        Ps_out = Pt_out * f ** (-k)
+        dPs_out = Ps_out * (dPt_out / Pt_out - k * df / f)
+        V_out = MN * np.sqrt(GAMMA * R_AIR * Ts_out)
+        dV_out = V_out * (dMN / MN + 0.5 * dTs_out / Ts_out)
+        A_out = W * R_AIR * Ts_out / (Ps_out * V_out)
+        dA_out = A_out * (dW / W + dTs_out / Ts_out - dPs_out / Ps_out - dV_out / V_out)
+
+        outputs = {
+            "eff": (eff, deff),
+            "prop:shaft_power": (power, dpower),
+            "prop:delta_heat": (heat, dheat),
+            "Fl_O:tot:P": (Pt_out, dPt_out),
+            "Fl_O:tot:T": (Tt_out, dTt_out),
+            "Fl_O:stat:P": (Ps_out, dPs_out),
+            "Fl_O:stat:V": (V_out, dV_out),
+            "Fl_O:stat:area": (A_out, dA_out),
+            "Fl_O:stat:W": (W, dW),
+        }
+        return outputs
+
+    def compute(self, inputs, outputs):
+        x = np.array([inputs[name] for name in FAN_INPUTS])
+        for name, (val, _) in self._outputs_and_grads(x).items():
+            outputs[name] = val
+
+    def compute_partials(self, inputs, partials):
+        x = np.array([inputs[name] for name in FAN_INPUTS])
+        for name, (_, grad) in self._outputs_and_grads(x).items():
+            for i in self._wrt[name]:
+                partials[name, FAN_INPUTS[i]] = grad[i]
+
+
+class FastPoddedFan(om.Group):
+    """
+    Drop-in replacement of PoddedFan and MultiPoddedFan without a thermochemistry solve.
+
+    It has the same promoted inputs and outputs, and the exit flow station
+    and the exit Mach number are at fan.Fl_O:* and fan.MN like in the
+    pyCycle model. Only the design mode of the pyCycle model is covered.
+    """
+
+    def initialize(self):
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
+        self.options.declare("eff_poly", default=0.97, types=float, desc="Polytropic efficiency of the fan")
+
+    def setup(self):
+        nn = self.options["num_nodes"]
+
+        self.add_subsystem("fpr", FPR(num_nodes=nn), promotes_inputs=["*"], promotes_outputs=["*"])
+        self.add_subsystem(
+            "fan",
+            FastFan(num_nodes=nn, eff_poly=self.options["eff_poly"]),
+            promotes_inputs=FAN_INPUTS[:5],
+            promotes_outputs=["prop:shaft_power", "prop:delta_heat"],
+        )
+
+
+def compare_with_pycycle(values, design=True):
+    """
+    Evaluates the pyCycle PoddedFan and the FastPoddedFan at the same fan inputs.
+
+    Parameters
+    ----------
+    values : dict
+        Values of the fan inputs of one node in SI units, keyed by the
+        promoted names of the PoddedFan inputs.
+    design : bool
+        Design mode of the pyCycle model.
+
+    Returns
+    -------
+    results : dict
+        (pyCycle value, fast value) of FPR, prop:shaft_power and prop:delta_heat.
+    """
+    # pyCycle is only imported for the verification
+    from .fan import PoddedFan
+
+    results = {}
+    for fan in [PoddedFan(design=design), FastPoddedFan()]:
+        prob = om.Problem(reports=False)
+        prob.model.add_subsystem("podded_fan", fan, promotes=["*"])
+        prob.setup()
+        for name, val in values.items():
+            prob.set_val(name, val, units=PODDED_FAN_INPUTS[name])
+        prob.run_model()
+
+        for name, out_units in [("FPR", None), ("prop:shaft_power", "kW"), ("prop:delta_heat", "kW")]:
+            results.setdefault(name, []).append(prob.get_val(name, units=out_units)[0])
+
+    return {name: tuple(vals) for name, vals in results.items()}
@@ -1,36 +1,48 @@
 # External modules
+import numpy as np
 import openmdao.api as om
 
 
 class FullBody(om.ExplicitComponent):
+    def initialize(self):
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
+
     def setup(self):
+        nn = self.options["num_nodes"]
+
         self.add_input(
-            "aero:half_mdot:fan_face", desc="Half-body mass flow rate from CFD at the fan face", units="kg/s"
+            "aero:half_mdot:fan_face", shape=nn, desc="Half-body mass flow rate from CFD at the fan face", units="kg/s"
         )
         self.add_input(
-            "aero:half_mdot:fan_exit", desc="Half-body mass flow rate from CFD at the fan exit", units="kg/s"
+            "aero:half_mdot:fan_exit", shape=nn, desc="Half-body mass flow rate from CFD at the fan exit", units="kg/s"
         )
 
-        self.add_input("aero:half_area:fan_face", desc="Half-body area at the fan face", units="m**2")
-        self.add_input("aero:half_area:fan_exit", desc="Half-body area at the fan exit", units="m**2")
+        self.add_input("aero:half_area:fan_face", shape=nn, desc="Half-body area at the fan face", units="m**2")
+        self.add_input("aero:half_area:fan_exit", shape=nn, desc="Half-body area at the fan exit", units="m**2")
 
-        self.add_input("aero:half_fan_power", desc="Half-body fan power from CFD", units="kW")
+        self.add_input("aero:half_fan_power", shape=nn, desc="Half-body fan power from CFD", units="kW")
 
-        self.add_output("aero:mdot:fan_face", desc="Full-body mass flow rate from CFD at the fan face", units="kg/s")
-        self.add_output("aero:mdot:fan_exit", desc="Full-body mass flow rate from CFD at teh fan exit", units="kg/s")
+        self.add_output(
+            "aero:mdot:fan_face", shape=nn, desc="Full-body mass flow rate from CFD at the fan face", units="kg/s"
+        )
+        self.add_output(
+            "aero:mdot:fan_exit", shape=nn, desc="Full-body mass flow rate from CFD at teh fan exit", units="kg/s"
+        )
 
-        self.add_output("aero:area:fan_face", desc="Full-body area at the fan face", units="m**2")
-        self.add_output("aero:area:fan_exit", desc="Full-body area at the fan exit", units="m**2")
+        self.add_output("aero:area:fan_face", shape=nn, desc="Full-body area at the fan face", units="m**2")
+        self.add_output("aero:area:fan_exit", shape=nn, desc="Full-body area at the fan exit", units="m**2")
 
-        self.add_output("aero:fan_power", desc="Full-body fan power from CFD", units="kW")
+        self.add_output("aero:fan_power", shape=nn, desc="Full-body fan power from CFD", units="kW")
 
-        self.declare_partials("aero:mdot:fan_face", "aero:half_mdot:fan_face", val=-2.0)
-        self.declare_partials("aero:mdot:fan_exit", "aero:half_mdot:fan_exit", val=2.0)
+        # Every output only depends on the same node of its input, so the jacobians are diagonal
+        ar = np.arange(nn)
+        self.declare_partials("aero:mdot:fan_face", "aero:half_mdot:fan_face", rows=ar, cols=ar, val=-2.0)
+        self.declare_partials("aero:mdot:fan_exit", "aero:half_mdot:fan_exit", rows=ar, cols=ar, val=2.0)
 
-        self.declare_partials("aero:area:fan_face", "aero:half_area:fan_face", val=2.0)
-        self.declare_partials("aero:area:fan_exit", "aero:half_area:fan_exit", val=2.0)
+        self.declare_partials("aero:area:fan_face", "aero:half_area:fan_face", rows=ar, cols=ar, val=2.0)
+        self.declare_partials("aero:area:fan_exit", "aero:half_area:fan_exit", rows=ar, cols=ar, val=2.0)
 
-        self.declare_partials("aero:fan_power", "aero:half_fan_power", val=2.0)
+        self.declare_partials("aero:fan_power", "aero:half_fan_power", rows=ar, cols=ar, val=2.0)
 
     def compute(self, inputs, outputs):
         outputs["aero:mdot:fan_face"] = -2.0 * inputs["aero:half_mdot:fan_face"]
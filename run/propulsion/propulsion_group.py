@@ -1,136 +1,111 @@
+# Standard Python modules
+import os
+
 # External modules
 from mphys import Builder
+import numpy as np
 import openmdao.api as om
-from tabulate import tabulate
 
 # Local modules
-from .fan import PoddedFan
+from utils.debug_sink import DebugComp
+from .fast_fan import FastPoddedFan
+from .fan import MultiPoddedFan, PoddedFan
 from .full_body import FullBody
 
 
-class FanInletDebug(om.ExplicitComponent):
+class FanInletDebug(DebugComp):
+    def initialize(self):
+        super().initialize()
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
+
     def setup(self):
-        self.add_input("aero:P_stat:fan_face", desc="Static pressure from CFD at the fan face", units="Pa")
-        self.add_input("aero:P_tot:fan_face", desc="Total pressure from CFD at the fan face", units="Pa")
-        self.add_input("aero:P_tot:fan_exit", desc="Total pressure from CFD at the fan exit", units="Pa")
+        nn = self.options["num_nodes"]
 
-        self.add_input("aero:half_area:fan_face", desc="Half-body area from CFD at the fan face", units="m**2")
-        self.add_input("aero:area:fan_face", desc="Full-body area from CFD at the fan face", units="m**2")
+        self.add_input("aero:P_stat:fan_face", shape=nn, desc="Static pressure from CFD at the fan face", units="Pa")
+        self.add_input("aero:P_tot:fan_face", shape=nn, desc="Total pressure from CFD at the fan face", units="Pa")
+        self.add_input("aero:P_tot:fan_exit", shape=nn, desc="Total pressure from CFD at the fan exit", units="Pa")
 
         self.add_input(
-            "aero:half_mdot:fan_face", desc="Half-body mass flow rate from CFD at the fan face", units="kg/s"
+            "aero:half_area:fan_face", shape=nn, desc="Half-body area from CFD at the fan face", units="m**2"
         )
-        self.add_input("aero:mdot:fan_face", desc="Full-body mass flow rate from CFD at the fan face", units="kg/s")
+        self.add_input("aero:area:fan_face", shape=nn, desc="Full-body area from CFD at the fan face", units="m**2")
+
         self.add_input(
-            "aero:half_mdot:fan_exit", desc="Half-body mass flow rate from CFD at the fan exit", units="kg/s"
+            "aero:half_mdot:fan_face", shape=nn, desc="Half-body mass flow rate from CFD at the fan face", units="kg/s"
+        )
+        self.add_input(
+            "aero:mdot:fan_face", shape=nn, desc="Full-body mass flow rate from CFD at the fan face", units="kg/s"
+        )
+        self.add_input(
+            "aero:half_mdot:fan_exit", shape=nn, desc="Half-body mass flow rate from CFD at the fan exit", units="kg/s"
+        )
+        self.add_input(
+            "aero:mdot:fan_exit", shape=nn, desc="Full-body mass flow rate from CFD at the fan exit", units="kg/s"
         )
-        self.add_input("aero:mdot:fan_exit", desc="Full-body mass flow rate from CFD at the fan exit", units="kg/s")
-
-        self.add_input("aero:V:fan_face", desc="Static velocity from CFD at the fan face", units="m/s")
-
-        self.add_output("foo")
 
-    def compute(self, inputs, outputs):
-        outputs["foo"] = 1.0
-        if self.comm.rank == 0:
-            print("\n*******************************", flush=True)
-            print("***     FAN INLET DEBUG     ***", flush=True)
-            print("*******************************", flush=True)
-
-            meta = self._var_abs2meta["input"]
-            table = [[key.split(".")[-1], val[0], meta["cruise0.coupling.prop.fan_inlet_debug."+key]["units"]] for key, val in inputs.items()]
-            headers = ["Name", "Value", "Units"]
-            print(
-                tabulate(
-                    table,
-                    headers=headers,
-                    colalign=("right", "left", "left"),
-                    floatfmt=".4f",
-                )
-            )
+        self.add_input("aero:V:fan_face", shape=nn, desc="Static velocity from CFD at the fan face", units="m/s")
 
-            print("*******************************\n", flush=True)
 
+class FanPowerDebug(DebugComp):
+    def initialize(self):
+        super().initialize()
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
 
-class FanPowerDebug(om.ExplicitComponent):
     def setup(self):
+        nn = self.options["num_nodes"]
+
         self.add_input(
             "prop:delta_heat",
+            shape=nn,
             desc="Energy lost as heat from fan efficiency losses",
             units="kW",
         )
-        self.add_input("aero:fan_power", desc="Full-body fan power from CFD", units="kW")
-        self.add_input("prop:shaft_power", desc="Shaft power computed in pyCycle", units="kW")
+        self.add_input("aero:fan_power", shape=nn, desc="Full-body fan power from CFD", units="kW")
+        self.add_input("prop:shaft_power", shape=nn, desc="Shaft power computed in pyCycle", units="kW")
 
-        self.add_input("total_shaft_power", desc="Total shaft power for the fan", units="kW")
+        self.add_input("total_shaft_power", shape=nn, desc="Total shaft power for the fan", units="kW")
         self.add_input(
             "aero:half_delta_heat",
+            shape=nn,
             desc="Half-body fan efficiency losse due to heat",
             units="kW",
         )
 
-        self.add_output("foo")
-
-    def compute(self, inputs, outputs):
-        outputs["foo"] = 1.0
-        if self.comm.rank == 0:
-            print("\n*******************************", flush=True)
-            print("***     FAN POWER DEBUG     ***", flush=True)
-            print("*******************************", flush=True)
-
-            meta = self._var_abs2meta["input"]
-            table = [[key.split(".")[-1], val[0], meta["cruise0.coupling.prop.power_debug."+key]["units"]] for key, val in inputs.items()]
-            headers = ["Name", "Value", "Units"]
-            print(tabulate(table, headers=headers, colalign=("right", "left", "left"), floatfmt=".4f"))
-
-            print("*******************************\n", flush=True)
 
+class FanPerfDebug(DebugComp):
+    def initialize(self):
+        super().initialize()
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
 
-class FanPerfDebug(om.ExplicitComponent):
     def setup(self):
+        nn = self.options["num_nodes"]
 
         self.add_input(
             "aero:half_fan_thrust",
+            shape=nn,
             desc="Half-body actuator zone thrust from CFD",
             units="N",
         )
-        self.add_input("aero:half_drag", desc="Half-body wall drag from CFD", units="N")
+        self.add_input("aero:half_drag", shape=nn, desc="Half-body wall drag from CFD", units="N")
 
-        self.add_input("Fn", desc="Installed net thrust of the podded fan", units="N")
-        self.add_input("FPR", desc="FPR")
-        
-        self.add_output("foo")
-
-    def compute(self, inputs, outputs):
-        outputs["foo"] = 1.0
-        if self.comm.rank == 0:
-            print("\n********************************", flush=True)
-            print("***      FAN PERF DEBUG      ***", flush=True)
-            print("********************************", flush=True)
-
-            meta = self._var_abs2meta["input"]
-            table = [[key.split(".")[-1], val[0], meta["cruise0.coupling.prop.perf_debug."+key]["units"]] for key, val in inputs.items()]
-            headers = ["Name", "Value", "Units"]
-            print(
-                tabulate(
-                    table,
-                    headers=headers,
-                    colalign=("right", "left", "left"),
-                    floatfmt=".4f",
-                )
-            )
-
-            print("*******************************\n", flush=True)
+        self.add_input("Fn", shape=nn, desc="Installed net thrust of the podded fan", units="N")
+        self.add_input("FPR", shape=nn, desc="FPR")
 
 
 class NetThrust(om.ExplicitComponent):
+    def initialize(self):
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
+
     def setup(self):
-        self.add_input("aero:half_fan_thrust", desc="Half-body fan thrust from CFD", units="N")
-        self.add_input("aero:half_drag", desc="Half-body wall drag from CFD", units="N")
+        nn = self.options["num_nodes"]
 
-        self.add_output("Fn", desc="Installed net thrust of the podded fan", units="N")
+        self.add_input("aero:half_fan_thrust", shape=nn, desc="Half-body fan thrust from CFD", units="N")
+        self.add_input("aero:half_drag", shape=nn, desc="Half-body wall drag from CFD", units="N")
 
-        self.declare_partials("Fn", ["aero:half_fan_thrust", "aero:half_drag"])
+        self.add_output("Fn", shape=nn, desc="Installed net thrust of the podded fan", units="N")
+
+        ar = np.arange(nn)
+        self.declare_partials("Fn", ["aero:half_fan_thrust", "aero:half_drag"], rows=ar, cols=ar)
 
     def compute(self, inputs, outputs):
         outputs["Fn"] = inputs["aero:half_fan_thrust"] - inputs["aero:half_drag"]
@@ -142,24 +117,31 @@ class NetThrust(om.ExplicitComponent):
 
 class TotalPower(om.ExplicitComponent):
 
+    def initialize(self):
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
+
     def setup(self):
+        nn = self.options["num_nodes"]
 
         self.add_input(
             "prop:delta_heat",
+            shape=nn,
             desc="Energy lost as heat from fan efficiency losses",
             units="kW",
         )
-        self.add_input("aero:fan_power", desc="Full-body fan power from CFD", units="kW")
+        self.add_input("aero:fan_power", shape=nn, desc="Full-body fan power from CFD", units="kW")
 
-        self.add_output("total_shaft_power", desc="Total shaft power for the fan", units="kW")
+        self.add_output("total_shaft_power", shape=nn, desc="Total shaft power for the fan", units="kW")
         self.add_output(
             "aero:half_delta_heat",
+            shape=nn,
             desc="Half-body fan efficiency losse due to heat",
             units="kW",
         )
 
-        self.declare_partials("total_shaft_power", ["aero:fan_power", "prop:delta_heat"])
-        self.declare_partials("aero:half_delta_heat", "prop:delta_heat")
+        ar = np.arange(nn)
+        self.declare_partials("total_shaft_power", ["aero:fan_power", "prop:delta_heat"], rows=ar, cols=ar)
+        self.declare_partials("aero:half_delta_heat", "prop:delta_heat", rows=ar, cols=ar)
 
 
     def compute(self, inputs, outputs):
@@ -176,29 +158,66 @@ class PropulsionGroup(om.Group):
     def initialize(self):
         self.options.declare("design", default=True)
         self.options.declare("fan_model", default="az")
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of flight conditions evaluated at once")
+        self.options.declare(
+            "fast_fan", default=False, types=bool, desc="Flag to use the closed form fan model instead of pyCycle"
+        )
+        self.options.declare(
+            "debug_file", default=None, types=(str, type(None)), desc="Debug sink file. No debug comps are added if None"
+        )
 
     def setup(self):
         fan_model = self.options["fan_model"]
         design = self.options["design"]
+        nn = self.options["num_nodes"]
+        debug_file = self.options["debug_file"]
+
+        # The closed form fan replaces pyCycle for any number of nodes
+        if self.options["fast_fan"]:
+            if not design:
+                raise ValueError("The fast fan model only covers the design mode of the pyCycle fan")
+            podded_fan = FastPoddedFan(num_nodes=nn)
+        # A single node keeps the plain pyCycle model so the fan internals stay at the usual paths
+        elif nn == 1:
+            podded_fan = PoddedFan(design=design)
+        else:
+            podded_fan = MultiPoddedFan(design=design, num_nodes=nn)
+
         # Add the subsystems
-        self.add_subsystem("full_body", FullBody(), promotes=["*"])
-        self.add_subsystem("fan_inlet_debug", FanInletDebug(), promotes_inputs=["*"])
-        self.add_subsystem("podded_fan", PoddedFan(design=design), promotes=["*"])
-        self.add_subsystem("net_thrust", NetThrust(), promotes=["*"])
-        self.add_subsystem("total_power", TotalPower(), promotes=["*"])
-        self.add_subsystem("perf_debug", FanPerfDebug(), promotes_inputs=["*"])
-        self.add_subsystem("power_debug", FanPowerDebug(), promotes_inputs=["*"])
+        self.add_subsystem("full_body", FullBody(num_nodes=nn), promotes=["*"])
+        if debug_file is not None:
+            self.add_subsystem(
+                "fan_inlet_debug", FanInletDebug(num_nodes=nn, debug_file=debug_file), promotes_inputs=["*"]
+            )
+        self.add_subsystem("podded_fan", podded_fan, promotes=["*"])
+        self.add_subsystem("net_thrust", NetThrust(num_nodes=nn), promotes=["*"])
+        self.add_subsystem("total_power", TotalPower(num_nodes=nn), promotes=["*"])
+        if debug_file is not None:
+            self.add_subsystem("perf_debug", FanPerfDebug(num_nodes=nn, debug_file=debug_file), promotes_inputs=["*"])
+            self.add_subsystem(
+                "power_debug", FanPowerDebug(num_nodes=nn, debug_file=debug_file), promotes_inputs=["*"]
+            )
 
 
 class PoddedFanBuilder(Builder):
-    def __init__(self, fan_model="az", outdir="./", design=True):
+    def __init__(self, fan_model="az", outdir="./", design=True, num_nodes=1, debug=False, fast_fan=False):
         
         self.fan_model = fan_model
         self.outdir = outdir
         self.design = design
+        self.num_nodes = num_nodes
+        self.debug = debug
+        self.fast_fan = fast_fan
 
     def get_coupling_group_subsystem(self, scenario_name=None):
-        coupling_group = PropulsionGroup(fan_model=self.fan_model, design=self.design)
+        debug_file = os.path.join(self.outdir, "debug.jsonl") if self.debug else None
+        coupling_group = PropulsionGroup(
+            fan_model=self.fan_model,
+            design=self.design,
+            num_nodes=self.num_nodes,
+            fast_fan=self.fast_fan,
+            debug_file=debug_file,
+        )
         return coupling_group
     
 
@@ -0,0 +1,6 @@
+# Standard Python modules
+import os
+import sys
+
+# The run scripts import their modules relative to the run directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
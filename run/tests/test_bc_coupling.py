@@ -0,0 +1,24 @@
+# External modules
+import numpy as np
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_check_partials
+import pytest
+
+# Local modules
+from bc_coupling import BCEnergyConservation, BCStaticsConservation
+
+
+@pytest.mark.parametrize("comp_class", [BCStaticsConservation, BCEnergyConservation])
+def test_partials(comp_class):
+    prob = om.Problem(reports=False)
+    prob.model.add_subsystem("comp", comp_class(), promotes=["*"])
+    prob.setup(force_alloc_complex=True)
+
+    # Inputs of the order of the ones of a cruise point, distinct so that no partial is checked at a symmetric point
+    rng = np.random.default_rng(0)
+    for name, meta in prob.model.comp.get_io_metadata(iotypes="input").items():
+        prob.set_val(name, rng.uniform(0.5, 2.0) * 10.0 ** rng.integers(0, 5), units=meta["units"])
+    prob.run_model()
+
+    data = prob.check_partials(method="cs", out_stream=None)
+    assert_check_partials(data, atol=1e-8, rtol=1e-8)
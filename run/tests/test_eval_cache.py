@@ -0,0 +1,71 @@
+# External modules
+import openmdao.api as om
+import pytest
+
+# Local modules
+from utils.eval_cache import KEY_OPTIONS, EvaluationCache
+
+
+class ToyTop(om.Group):
+    """Top stand-in with a design IVC, one response and one output that is not a response."""
+
+    def initialize(self):
+        for name in KEY_OPTIONS:
+            self.options.declare(name, default=None)
+
+    def input_files(self):
+        return []
+
+    def setup(self):
+        self.add_subsystem("aero_dvs", om.IndepVarComp("x", 1.0))
+        self.add_subsystem("comp", om.ExecComp(["y = x**2", "z = 3.0*x"]))
+        self.connect("aero_dvs.x", "comp.x")
+
+        self.add_design_var("aero_dvs.x")
+        self.add_objective("comp.y")
+
+
+@pytest.fixture
+def cached_prob(tmp_path):
+    prob = om.Problem(ToyTop(), reports=False)
+    prob.setup()
+    prob.final_setup()
+
+    eval_cache = EvaluationCache(prob.model, prob.driver, str(tmp_path))
+    eval_cache.attach()
+    return prob, eval_cache
+
+
+def test_hit_and_miss(cached_prob):
+    prob, eval_cache = cached_prob
+    for x in [2.0, 5.0, 2.0]:
+        prob.set_val("aero_dvs.x", x)
+        prob.run_model()
+    assert (eval_cache.hits, eval_cache.misses) == (1, 2)
+
+    # A hit only sets the responses, the model still holds the solution of the last miss
+    assert prob.get_val("comp.y")[0] == pytest.approx(4.0)
+    assert prob.get_val("comp.z")[0] == pytest.approx(15.0)
+    assert not eval_cache.is_current()
+
+    # The totals of a hit need the solution of its design, the second request is a hit
+    for _ in range(2):
+        totals = prob.driver._compute_totals(of=["comp.y"], wrt=["aero_dvs.x"], return_format="dict")
+        assert totals["comp.y"]["aero_dvs.x"][0, 0] == pytest.approx(4.0)
+    assert (eval_cache.hits, eval_cache.misses) == (2, 3)
+    assert eval_cache.is_current()
+
+
+def test_detach(cached_prob):
+    prob, eval_cache = cached_prob
+    for x in [2.0, 5.0]:
+        prob.set_val("aero_dvs.x", x)
+        prob.run_model()
+    eval_cache.detach()
+
+    # Without the cache a repeated design is evaluated again and all outputs are of that design
+    prob.set_val("aero_dvs.x", 2.0)
+    prob.run_model()
+    assert eval_cache.hits == 0
+    assert prob.get_val("comp.z")[0] == pytest.approx(6.0)
+    assert eval_cache.misses == 2
@@ -0,0 +1,133 @@
+"""CFD convergence tolerances that tighten as SNOPT converges"""
+
+# External modules
+import numpy as np
+
+# ADflow options that are adapted, the flow and the adjoint relative tolerance
+TOL_OPTIONS = ["L2ConvergenceRel", "adjointl2convergencerel"]
+
+
+class AdaptiveTolerance:
+    """
+    Ties the relative tolerances of the flow and adjoint solves to the progress of SNOPT.
+
+    SNOPT calls snstop after every major iteration with its optimality and
+    feasibility measures. The new relative tolerance is
+
+        factor * max(optimality, feasibility)
+
+    limited to [tight, loose], where tight is the tolerance the solvers
+    were set up with. Once both measures are within strict_ratio of the
+    SNOPT tolerances, the tight tolerance is used. The tolerance never
+    loosens again, so the last iterations always use fully converged
+    solutions. SNOPT only runs on the root proc, so the new tolerance is
+    broadcast and set on the solvers at the start of the next model
+    evaluation, which all procs take part in. The current tolerances are
+    part of the keys of an evaluation cache, so results of a looser
+    tolerance are not reused once it is tightened. The tolerances are
+    only adapted between attach and detach, so the evaluations outside of
+    the optimization use the tight tolerances.
+
+    Parameters
+    ----------
+    model : Top
+        The model whose ADflow solvers are adapted. It has to be set up.
+    opt_tol : float
+        Major optimality tolerance of SNOPT.
+    feas_tol : float
+        Major feasibility tolerance of SNOPT.
+    loose : float
+        Loosest relative tolerance.
+    factor : float
+        Ratio of the relative tolerance to the larger of the SNOPT measures.
+    strict_ratio : float
+        Ratio of the SNOPT measures to their tolerances below which the tight tolerance is used.
+    """
+
+    def __init__(self, model, opt_tol, feas_tol, loose=1e-4, factor=1e-2, strict_ratio=10.0):
+        self.model = model
+        self.opt_tol = opt_tol
+        self.feas_tol = feas_tol
+        self.factor = factor
+        self.strict_ratio = strict_ratio
+        self.comm = model.comm
+
+        # Every local solver once, in serial all points share one
+        self.solvers = []
+        for point in model.local_scenarios:
+            solver = model.aero_builders[point].solver
+            if solver not in self.solvers:
+                self.solvers.append(solver)
+
+        self.tight = {name: self.solvers[0].getOption(name) for name in TOL_OPTIONS}
+        self.loose = loose
+
+        # Start loose, or as tight as the solvers were set up if that is looser
+        self.tol = {name: max(tight, loose) for name, tight in self.tight.items()}
+        self._pending = None
+        self.history = []
+
+    def attach(self, driver, eval_cache=None):
+        """
+        Adds snstop to the SNOPT options of the driver and sets the tolerances before every model evaluation.
+
+        Has to be called after the evaluation cache is attached, so the tolerances are set before its lookup.
+        """
+        driver.opt_settings["snSTOP function handle"] = self.snstop
+        if eval_cache is not None:
+            eval_cache.add_key_state(lambda: self.tol)
+
+        func = self._run_model = self.model.run_solve_nonlinear
+
+        def wrapper(*args, **kwargs):
+            self._update()
+            return func(*args, **kwargs)
+
+        self.model.run_solve_nonlinear = wrapper
+        self._set_options()
+
+    def detach(self):
+        """Removes the wrapper of the model evaluation and sets the tight tolerances again."""
+        self.model.run_solve_nonlinear = self._run_model
+        self._pending = None
+        self.tol = dict(self.tight)
+        self._set_options()
+
+    def snstop(self, iter_dict):
+        """Computes the tolerances for the next iteration from the SNOPT measures. Only called on the root proc."""
+        optimality = iter_dict["optimality"]
+        feasibility = iter_dict["feasibility"]
+
+        if optimality <= self.strict_ratio * self.opt_tol and feasibility <= self.strict_ratio * self.feas_tol:
+            tol = {name: tight for name, tight in self.tight.items()}
+        else:
+            tol = {
+                name: float(np.clip(self.factor * max(optimality, feasibility), tight, max(tight, self.loose)))
+                for name, tight in self.tight.items()
+            }
+
+        # Never loosen the tolerances again
+        self._pending = {name: min(val, self.tol[name]) for name, val in tol.items()}
+        self.history.append(
+            {"major": iter_dict["nMajor"], "optimality": optimality, "feasibility": feasibility, **self._pending}
+        )
+        print(
+            f"Major {iter_dict['nMajor']}: optimality {optimality:.3e}, feasibility {feasibility:.3e}, "
+            "CFD tolerances " + ", ".join(f"{name} {val:.1e}" for name, val in self._pending.items()),
+            flush=True,
+        )
+
+        # 0 lets SNOPT continue
+        return 0
+
+    def _update(self):
+        pending = self.comm.bcast(self._pending, root=0)
+        self._pending = None
+        if pending is not None and pending != self.tol:
+            self.tol = pending
+            self._set_options()
+
+    def _set_options(self):
+        for solver in self.solvers:
+            for name, val in self.tol.items():
+                solver.setOption(name, val)
@@ -1,4 +1,96 @@
-def add_geo_dvs(model, vars, filter):
+# Standard Python modules
+from fnmatch import fnmatchcase
+import re
+
+# Integer sets in braces, e.g. XSecCurve_{0,1,3-7}
+_INDEX_SET = re.compile(r"\{([0-9,\-\s]+)\}")
+
+
+def expand_pattern(pattern):
+    """Expands the integer sets in braces of a pattern, e.g. XSec_{0,3-5} to XSec_0, XSec_3, XSec_4 and XSec_5."""
+    match = _INDEX_SET.search(pattern)
+    if match is None:
+        return [pattern]
+
+    indices = []
+    for item in match.group(1).split(","):
+        start, _, end = item.strip().partition("-")
+        indices.extend(range(int(start), int(end or start) + 1))
+
+    head, tail = pattern[: match.start()], pattern[match.end() :]
+    return [name for i in indices for name in expand_pattern(f"{head}{i}{tail}")]
+
+
+class GeoDVRegistry:
+    """
+    Index of the geometric variables by component, group and parameter.
+
+    Groups are selected per component with patterns. A pattern is a group
+    name that may contain integer sets in braces, e.g. XSecCurve_{0,1,3-7},
+    and glob wildcards, e.g. XSec_*. It may end in :var to only select one
+    parameter of the groups, e.g. XSecCurve_*:Ellipse_Height. Names without
+    wildcards are looked up directly, so the cost of a selection does not
+    grow with the number of variables.
+
+    Parameters
+    ----------
+    vars : list(named_tuple)
+        A list of named tuples containing the geometric variable info.
+    exclude : list(str)
+        DVs that are set otherwise, e.g. by a link, and are never selected.
+    """
+
+    def __init__(self, vars, exclude=()):
+        exclude = set(exclude)
+        self.vars = {}
+        self.groups = {}
+        for var in vars:
+            if self.dv_name(var) in exclude:
+                continue
+            self.vars[(var.comp, var.group, var.var)] = var
+            self.groups.setdefault(var.comp, {}).setdefault(var.group, []).append(var)
+
+    @staticmethod
+    def dv_name(var):
+        """Returns the name of the DV of a geometric variable, comp:group:var."""
+        return f"{var.comp}:{var.group}:{var.var}"
+
+    def select(self, filter):
+        """
+        Returns the geometric variables selected by a filter, in the order of the vars.
+
+        Parameters
+        ----------
+        filter : dict
+            Patterns of the groups to select, keyed by the component.
+        """
+        selected = {}
+        for comp, patterns in filter.items():
+            groups = self.groups.get(comp, {})
+            for pattern in patterns:
+                group_pattern, _, var_pattern = pattern.partition(":")
+
+                matches = []
+                for name in expand_pattern(group_pattern):
+                    if any(c in name for c in "*?["):
+                        matches.extend(var for group, vars in groups.items() if fnmatchcase(group, name) for var in vars)
+                    else:
+                        matches.extend(groups.get(name, []))
+
+                if var_pattern:
+                    matches = [var for var in matches if fnmatchcase(var.var, var_pattern)]
+                if not matches:
+                    raise ValueError(f"No geometric variables of {comp} match {pattern}")
+
+                for var in matches:
+                    selected[(var.comp, var.group, var.var)] = var
+
+        # The order of the vars keeps the DV vectors of the optimizer the same as before
+        order = {key: i for i, key in enumerate(self.vars)}
+        return [selected[key] for key in sorted(selected, key=order.get)]
+
+
+def add_geo_dvs(model, vars, filter, exclude=()):
     """Adds geometric DV's to an OpenMDAO model.
 
     Parameters
@@ -10,10 +102,21 @@ def add_geo_dvs(model, vars, filter):
     filter : dict
         A dictionary that filters the components, groups,
         cross sections, and angles that will be added to the model from
-        the vars list.
+        the vars list. The groups are patterns, see GeoDVRegistry.
+    exclude : list(str)
+        DVs that are not added, e.g. the ones set by the linking comp.
+
+    Returns
+    -------
+    dv_names : list(str)
+        The names of the added DVs.
     """
-    for var in vars:
-        dv_name = f"geo_dvs.{var.comp}:{var.group}:{var.var}"
-        for key in filter.keys():
-            if var.comp == key and var.group in filter[key]:
-                model.add_design_var(dv_name, lower=var.lower, upper=var.upper, ref=var.ref)
+    selected = GeoDVRegistry(vars, exclude=exclude).select(filter)
+
+    dv_names = []
+    for var in selected:
+        dv_name = f"geo_dvs.{GeoDVRegistry.dv_name(var)}"
+        model.add_design_var(dv_name, lower=var.lower, upper=var.upper, ref=var.ref)
+        dv_names.append(dv_name)
+
+    return dv_names
@@ -0,0 +1,132 @@
+# Standard Python modules
+import functools
+import os
+
+# External modules
+from mpi4py import MPI
+import numpy as np
+
+# Local modules
+from propulsion.fan import PoddedFan
+
+
+class Checkpoint:
+    """
+    Saves and restores the solver states of the scenarios in a Top model.
+
+    After every converged analysis, the ADflow states of each local point
+    are written by every proc and the outputs and state caches of the
+    PoddedFans are written by the root proc of each fan. Loading them
+    before a restarted run makes the first new analysis start from the
+    last converged flow and fan solutions instead of a cold start. The
+    restart has to use the same mesh level and number of procs.
+
+    Parameters
+    ----------
+    model : Top
+        The model to checkpoint. It has to be set up.
+    path : str
+        Directory to write the checkpoint files to.
+    """
+
+    def __init__(self, model, path):
+        self.model = model
+        self.path = path
+        self.use_adflow = model.options["aero_surrogate"] is None
+
+        os.makedirs(path, exist_ok=True)
+
+    def _adflow_file(self, point):
+        return os.path.join(self.path, f"{point}_adflow_{MPI.COMM_WORLD.rank}.npy")
+
+    def _fan_file(self, podded_fan):
+        return os.path.join(self.path, f"{podded_fan.pathname}.npz")
+
+    def _level_file(self):
+        return os.path.join(self.path, "level.txt")
+
+    def saved_level(self):
+        """Returns the mesh level of the saved flow states, or None if there is no checkpoint."""
+        if not os.path.isfile(self._level_file()):
+            return None
+        with open(self._level_file()) as f:
+            return f.read().strip()
+
+    def attach(self):
+        """Saves a checkpoint after every model evaluation."""
+        # The flow states can only be restored on the same mesh
+        if MPI.COMM_WORLD.rank == 0:
+            with open(self._level_file(), "w") as f:
+                f.write(self.model.options["level"])
+
+        func = self.model.run_solve_nonlinear
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            self.save()
+            return result
+
+        self.model.run_solve_nonlinear = wrapper
+
+    def save(self):
+        """Writes the current states if the flow solutions of all local points converged."""
+        for point, scenario in self.model.local_scenarios.items():
+            if self.use_adflow:
+                solver = self.model.aero_builders[point].solver
+                ap = self.model.aero_problems[point]
+
+                # Never overwrite a good checkpoint with a failed solution
+                funcs = {}
+                solver.checkSolutionFailure(ap, funcs)
+                if funcs["fail"]:
+                    continue
+
+                solver.setAeroProblem(ap)
+                _write_atomic(self._adflow_file(point), solver.getStates())
+
+            for podded_fan in scenario.system_iter(recurse=True, typ=PoddedFan):
+                if podded_fan.comm.rank == 0:
+                    file_name = self._fan_file(podded_fan)
+                    tmp_file = f"{file_name}.tmp.npz"
+                    podded_fan.save_state(tmp_file)
+                    os.replace(tmp_file, file_name)
+
+    def load(self, flow=True):
+        """
+        Restores the states of all local points that have a checkpoint.
+
+        Parameters
+        ----------
+        flow : bool
+            Flag to restore the ADflow states. The fan states do not depend
+            on the mesh, so they can also be restored from a checkpoint of
+            another mesh level if this is False.
+
+        Returns
+        -------
+        loaded : list of str
+            The points whose ADflow or fan states were restored.
+        """
+        loaded = []
+        for point, scenario in self.model.local_scenarios.items():
+            if flow and self.use_adflow and os.path.isfile(self._adflow_file(point)):
+                solver = self.model.aero_builders[point].solver
+                solver.setAeroProblem(self.model.aero_problems[point])
+                solver.setStates(np.load(self._adflow_file(point)))
+                loaded.append(point)
+
+            for podded_fan in scenario.system_iter(recurse=True, typ=PoddedFan):
+                if os.path.isfile(self._fan_file(podded_fan)):
+                    podded_fan.load_state(self._fan_file(podded_fan))
+                    if point not in loaded:
+                        loaded.append(point)
+
+        return loaded
+
+
+def _write_atomic(file_name, arr):
+    """Writes an array so that a job that is killed while writing leaves the old file intact."""
+    tmp_file = f"{file_name}.tmp.npy"
+    np.save(tmp_file, arr)
+    os.replace(tmp_file, file_name)
@@ -0,0 +1,154 @@
+"""Nonlinear block Gauss-Seidel with Aitken or Anderson acceleration of the coupling interface"""
+
+# External modules
+from mpi4py import MPI
+import numpy as np
+import openmdao.api as om
+
+
+class InterfaceAcceleratedNLBGS(om.NonlinearBlockGS):
+    """
+    NLBGS that accelerates the fixed point iteration of a few interface variables.
+
+    The interface is the set of outputs that are fed back to the start of
+    the block iteration, e.g. the heat of the fan that goes to the actuator
+    zone. After every block iteration, the values x the iteration started
+    from and the values G(x) it ended with give the interface residual
+    r = G(x) - x, and the interface is set to the accelerated update before
+    the next iteration:
+
+    - aitken: x + theta * r, with the relaxation factor theta updated from
+      the change of the residual and limited to [aitken_min_factor,
+      aitken_max_factor].
+    - anderson: the combination of the last anderson_depth + 1 iterates
+      whose residual is smallest in the least squares sense (Anderson
+      mixing with a mixing factor of 1).
+    - none: plain NLBGS.
+
+    Only the interface is accelerated, so the rest of the outputs, e.g. the
+    flow states, are not relaxed. The interface residual of every iteration
+    is kept in history and printed on the root proc if iprint > 0.
+
+    The number of block iterations a plain NLBGS would have taken is
+    estimated from the contraction of the interface residual in the first
+    two iterations, which are always plain, and the iterations saved are
+    summed over all solves.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        self.history = []
+        self.num_solves = 0
+        self.num_iterations = 0
+        self.num_saved = 0
+
+    def _declare_options(self):
+        super()._declare_options()
+
+        self.options.declare(
+            "acceleration",
+            default="anderson",
+            values=["none", "aitken", "anderson"],
+            desc="Acceleration of the interface variables",
+        )
+        self.options.declare(
+            "interface", default=[], types=list, desc="Outputs of the interface, relative to the system of the solver"
+        )
+        self.options.declare(
+            "anderson_depth", default=2, types=int, desc="Number of previous iterates used in the Anderson mixing"
+        )
+
+    def _interface_values(self):
+        outputs = self._system()._outputs
+        with self._system()._unscaled_context(outputs=[outputs]):
+            return np.concatenate([np.atleast_1d(outputs[name]).copy() for name in self.options["interface"]])
+
+    def _set_interface_values(self, vals):
+        outputs = self._system()._outputs
+        with self._system()._unscaled_context(outputs=[outputs]):
+            start = 0
+            for name in self.options["interface"]:
+                size = np.size(outputs[name])
+                outputs[name] = vals[start : start + size]
+                start += size
+
+    def _iter_initialize(self):
+        # The iterates of the previous solve are from another design
+        self._xs = []
+        self._gs = []
+        self._theta = self.options["aitken_initial_factor"]
+        self._res_norms = []
+        return super()._iter_initialize()
+
+    def _single_iteration(self):
+        x = self._interface_values()
+        super()._single_iteration()
+        g = self._interface_values()
+        r = g - x
+
+        # Only the iterates of the Anderson mixing are kept
+        self._xs = self._xs[-self.options["anderson_depth"] :] + [x]
+        self._gs = self._gs[-self.options["anderson_depth"] :] + [g]
+        self._res_norms.append(np.linalg.norm(r))
+
+        x_new, info = self._accelerate()
+        self._set_interface_values(x_new)
+
+        res = self._res_norms[-1]
+        self.history.append({"solve": self.num_solves, "iteration": self._iter_count, "res": res, **info})
+        if self.options["iprint"] > 0 and MPI.COMM_WORLD.rank == 0:
+            extra = " ".join(f"{key}={val:.4g}" for key, val in info.items())
+            print(f"{self.SOLVER} interface iter {self._iter_count}: |r| = {res:.6e} {extra}", flush=True)
+
+    def _accelerate(self):
+        """Returns the next interface values and the parameters of the update."""
+        acceleration = self.options["acceleration"]
+        xs = self._xs
+        gs = self._gs
+
+        # The first update is always plain, there is no history yet
+        if acceleration == "none" or len(xs) < 2:
+            return gs[-1], {}
+
+        r = gs[-1] - xs[-1]
+        r_prev = gs[-2] - xs[-2]
+
+        if acceleration == "aitken":
+            dr = r - r_prev
+            dr_norm = max(np.linalg.norm(dr), 1e-12)
+            theta = self._theta * (1.0 - dr.dot(r) / dr_norm**2)
+            theta = max(self.options["aitken_min_factor"], min(self.options["aitken_max_factor"], theta))
+            self._theta = theta
+            return xs[-1] + theta * r, {"theta": theta}
+
+        # Anderson mixing over the differences of the last iterates
+        depth = min(self.options["anderson_depth"], len(xs) - 1)
+        R = np.array([g - x for x, g in zip(xs[-depth - 1 :], gs[-depth - 1 :])]).T
+        G = np.array(gs[-depth - 1 :]).T
+        dR = np.diff(R, axis=1)
+        dG = np.diff(G, axis=1)
+        gamma = np.linalg.lstsq(dR, r, rcond=None)[0]
+        return gs[-1] - dG.dot(gamma), {"depth": depth}
+
+    def solve(self):
+        super().solve()
+
+        self.num_solves += 1
+        self.num_iterations += self._iter_count
+
+        # Iterations a plain NLBGS would need with the contraction of the first two plain iterations
+        res = self._res_norms
+        # A plain NLBGS stops once the change of the outputs is below atol, an exactly converged interface included
+        target = max(res[-1], self.options["atol"]) if res else 0.0
+        if self.options["acceleration"] != "none" and len(res) >= 2 and 0.0 < res[1] < res[0] and target > 0.0:
+            rate = res[1] / res[0]
+            plain = 1 + int(np.ceil(np.log(target / res[0]) / np.log(rate)))
+            self.num_saved += max(plain - len(res), 0)
+
+    def summary(self):
+        """Returns a one-line summary of the block iterations of all solves."""
+        return (
+            f"{self.num_iterations} block iterations in {self.num_solves} solves, "
+            f"about {self.num_saved} fewer than plain NLBGS ({self.options['acceleration']} acceleration)"
+        )
@@ -0,0 +1,117 @@
+"""Buffered instrumentation sink that the debug components write to instead of printing"""
+
+# Standard Python modules
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+# External modules
+from mpi4py import MPI
+import numpy as np
+import openmdao.api as om
+from tabulate import tabulate
+
+# One sink per file in this process
+_SINKS = {}
+
+
+class DebugSink:
+    """
+    Writes debug records to a JSON lines file from a background thread.
+
+    record only copies the values and puts them in a queue, so the caller
+    never waits for the file system. The records are written in the order
+    they were made and the file is flushed whenever the queue runs empty.
+
+    Parameters
+    ----------
+    file_name : str
+        File to append the records to.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, source, values, units):
+        """Queues the values of a set of variables, keyed by their names."""
+        values = {name: np.array(val, copy=True) for name, val in values.items()}
+        self._queue.put({"time": time.time(), "source": source, "values": values, "units": units})
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.file_name) or ".", exist_ok=True)
+        with open(self.file_name, "a") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    self._queue.task_done()
+                    break
+
+                record["values"] = {name: val.tolist() for name, val in record["values"].items()}
+                f.write(json.dumps(record) + "\n")
+                if self._queue.empty():
+                    f.flush()
+                self._queue.task_done()
+
+    def flush(self):
+        """Blocks until all queued records are written."""
+        self._queue.join()
+
+    def close(self):
+        """Writes the remaining records and stops the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+def get_sink(file_name):
+    """Returns the sink of this process for a file. Every proc writes its own file, tagged with its rank."""
+    root, ext = os.path.splitext(file_name)
+    file_name = f"{root}_{MPI.COMM_WORLD.rank}{ext}"
+
+    if file_name not in _SINKS:
+        _SINKS[file_name] = DebugSink(file_name)
+    return _SINKS[file_name]
+
+
+def print_records(file_name, source=None):
+    """Prints the records of a sink file as tables, optionally only those of one source."""
+    with open(file_name) as f:
+        for line in f:
+            record = json.loads(line)
+            if source is not None and not record["source"].endswith(source):
+                continue
+
+            print(f"\n*** {record['source']} ({time.ctime(record['time'])}) ***")
+            table = [
+                [name, val[0] if len(val) == 1 else val, record["units"][name]] for name, val in record["values"].items()
+            ]
+            print(tabulate(table, headers=["Name", "Value", "Units"], colalign=("right", "left", "left"), floatfmt=".4f"))
+
+
+class DebugComp(om.ExplicitComponent):
+    """
+    Base class for the debug components. The values of all inputs are sent
+    to the debug sink on the root proc of the component every time it runs.
+    """
+
+    def initialize(self):
+        self.options.declare("debug_file", types=str, desc="File of the debug sink")
+
+    def add_input(self, name, **kwargs):
+        # Keep the units here so compute does not have to look them up
+        if not hasattr(self, "_debug_units"):
+            self._debug_units = {}
+        self._debug_units[name] = kwargs.get("units")
+        return super().add_input(name, **kwargs)
+
+    def compute(self, inputs, outputs):
+        if self.comm.rank == 0:
+            values = {name: inputs[name] for name in self._debug_units}
+            get_sink(self.options["debug_file"]).record(self.pathname, values, self._debug_units)
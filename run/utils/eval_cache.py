@@ -0,0 +1,224 @@
+"""On-disk cache of the responses and totals of the designs a driver evaluates"""
+
+# Standard Python modules
+import hashlib
+import json
+import os
+import pickle
+
+# External modules
+import numpy as np
+
+# Version of the stored entries, part of every key so that entries of another layout are never read
+CACHE_VERSION = 2
+
+# Options of Top that change the results of an evaluation
+KEY_OPTIONS = [
+    "input_dir",
+    "model",
+    "level",
+    "multiblock",
+    "feedfwd",
+    "target_net_thrust",
+    "aero_surrogate",
+    "fast_fan",
+]
+
+
+class EvaluationCache:
+    """
+    Caches the responses and total derivatives of a Top model by design.
+
+    The key of a design is a hash of the values of all outputs of the
+    aero_dvs and geo_dvs IVCs, together with the Top options that change
+    the results, the cache version and the contents of the input files of
+    the model, so a later run on other inputs never reuses an entry. State
+    that changes during a run, e.g. the solver tolerances, is added to the
+    key with add_key_state. On a hit, the model evaluation is skipped and the
+    responses are set from the store, and totals are returned from the
+    store. If the totals of a design are not stored but the model holds the
+    state of another design because of an earlier hit, the model is
+    evaluated again before the totals are computed. The root proc keeps
+    one file per design in the cache directory, evicts the least recently
+    used ones beyond max_entries, and broadcasts every lookup to the other
+    procs.
+
+    Other outputs than the responses are not updated on a hit, so the
+    driver does not record the iterations that are hits. The recorder only
+    holds designs whose outputs were all evaluated together. For the same
+    reason, the cache is only attached while the driver runs, and the
+    model has to be evaluated again after detach if it does not hold the
+    solution of the current design.
+
+    Parameters
+    ----------
+    model : Top
+        The model to cache. It has to be set up.
+    driver : Driver
+        The driver whose totals are cached.
+    path : str
+        Directory to store the cached designs in.
+    max_entries : int
+        Number of designs to keep.
+    """
+
+    def __init__(self, model, driver, path, max_entries=100):
+        self.model = model
+        self.driver = driver
+        self.path = path
+        self.max_entries = max_entries
+        self.comm = model.comm
+
+        self.hits = 0
+        self.misses = 0
+
+        # Key of the design whose solution the model holds, and if the last evaluation was a hit
+        self._model_key = None
+        self._hit = False
+
+        options = {name: model.options[name] for name in KEY_OPTIONS}
+        self._options_hash = json.dumps({"version": CACHE_VERSION, **options}, sort_keys=True).encode()
+        self._inputs_hash = self.comm.bcast(self._hash_files(model.input_files()) if self.comm.rank == 0 else None)
+        self._key_states = []
+
+        if self.comm.rank == 0:
+            os.makedirs(path, exist_ok=True)
+
+    def attach(self):
+        """Wraps the model evaluation, the driver's totals and its recording with the cache."""
+        self._run_model = self.model.run_solve_nonlinear
+        self._compute_totals = self.driver._compute_totals
+        self._record_iteration = self.driver.record_iteration
+
+        self.model.run_solve_nonlinear = self._cached_run
+        self.driver._compute_totals = self._cached_totals
+        self.driver.record_iteration = self._cached_record
+
+    def detach(self):
+        """Removes the wrappers of attach, so the model is always evaluated again."""
+        self.model.run_solve_nonlinear = self._run_model
+        self.driver._compute_totals = self._compute_totals
+        self.driver.record_iteration = self._record_iteration
+
+    def is_current(self):
+        """Returns if the model holds the solution of the current design, and not the one before a hit."""
+        return self._model_key == self.design_key()
+
+    def add_key_state(self, func):
+        """Adds a function whose JSON serializable return value is part of the key of every design."""
+        self._key_states.append(func)
+
+    @staticmethod
+    def _hash_files(file_names):
+        """Returns the hash of the names and contents of files. Missing files only add their name."""
+        sha = hashlib.sha1()
+        for file_name in file_names:
+            sha.update(file_name.encode())
+            if os.path.isfile(file_name):
+                with open(file_name, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 24), b""):
+                        sha.update(chunk)
+        return sha.hexdigest()
+
+    def _dv_names(self):
+        meta = self.model.get_io_metadata(iotypes="output", get_remote=True)
+        names = [var_meta["prom_name"] for var_meta in meta.values()]
+        return sorted(name for name in names if name.startswith(("aero_dvs.", "geo_dvs.")))
+
+    def design_key(self):
+        """Returns the hash of the current design and the model options."""
+        sha = hashlib.sha1(self._options_hash)
+        sha.update(self._inputs_hash.encode())
+        for func in self._key_states:
+            sha.update(json.dumps(func(), sort_keys=True).encode())
+        for name in self._dv_names():
+            sha.update(name.encode())
+            sha.update(np.ascontiguousarray(self.model.get_val(name), dtype=float).tobytes())
+        return sha.hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.pkl")
+
+    def _read(self, key):
+        """Returns the stored entry of a design on all procs, or None."""
+        entry = None
+        if self.comm.rank == 0 and os.path.isfile(self._file(key)):
+            with open(self._file(key), "rb") as f:
+                entry = pickle.load(f)
+            # Mark the entry as recently used
+            os.utime(self._file(key))
+        return self.comm.bcast(entry, root=0)
+
+    def _write(self, key, entry):
+        if self.comm.rank != 0:
+            return
+
+        tmp_file = f"{self._file(key)}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(entry, f)
+        os.replace(tmp_file, self._file(key))
+
+        # Evict the least recently used designs
+        files = [os.path.join(self.path, name) for name in os.listdir(self.path) if name.endswith(".pkl")]
+        files.sort(key=os.path.getmtime)
+        for file_name in files[: max(len(files) - self.max_entries, 0)]:
+            os.remove(file_name)
+
+    def _response_sources(self):
+        return sorted({meta["source"] for meta in self.model.get_responses(recurse=True).values()})
+
+    def _cached_run(self, *args, **kwargs):
+        key = self.design_key()
+        entry = self._read(key)
+
+        self._hit = entry is not None and "responses" in entry
+        if self._hit:
+            self.hits += 1
+            for name, val in entry["responses"].items():
+                self.model.set_val(name, val)
+            return None
+
+        self.misses += 1
+        result = self._run_model(*args, **kwargs)
+        self._model_key = key
+
+        # Only the responses are needed by the driver. Remote ones are gathered by get_val.
+        entry = entry if entry is not None else {}
+        entry["responses"] = {
+            name: np.array(self.model.get_val(name, get_remote=True)) for name in self._response_sources()
+        }
+        self._write(key, entry)
+        return result
+
+    def _cached_record(self, *args, **kwargs):
+        # The other outputs of a hit are the ones of the last evaluated design
+        if not self._hit:
+            self._record_iteration(*args, **kwargs)
+
+    def _cached_totals(self, of=None, wrt=None, return_format="flat_dict", driver_scaling=True):
+        key = self.design_key()
+        totals_key = repr((of, wrt, return_format, driver_scaling))
+        entry = self._read(key)
+
+        if entry is not None and totals_key in entry.get("totals", {}):
+            self.hits += 1
+            return entry["totals"][totals_key]
+
+        # The adjoint needs the solution of this design
+        if self._model_key != key:
+            self._run_model()
+            self._model_key = key
+
+        self.misses += 1
+        totals = self._compute_totals(of=of, wrt=wrt, return_format=return_format, driver_scaling=driver_scaling)
+
+        entry = entry if entry is not None else {}
+        entry.setdefault("totals", {})[totals_key] = totals
+        self._write(key, entry)
+        return totals
+
+    def summary(self):
+        """Returns a one-line summary of the cache use."""
+        calls = self.hits + self.misses
+        rate = 100.0 * self.hits / calls if calls > 0 else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
@@ -0,0 +1,199 @@
+"""Compact, append-only optimization history with a memory-mapped reader"""
+
+# Standard Python modules
+from fnmatch import fnmatchcase
+import json
+import os
+import time
+
+# External modules
+import numpy as np
+from openmdao.recorders.case_recorder import CaseRecorder
+
+INDEX_FILE = "index.json"
+
+
+class StreamRecorder(CaseRecorder):
+    """
+    Streams driver iterations to one raw float64 file per variable.
+
+    Only the driver outputs that match one of the include patterns are
+    stored. Every column file holds one row per iteration, so appending an
+    iteration never rewrites existing data, and a run that is stopped
+    early leaves all fully written rows readable. Every row is written as
+    soon as its iteration is recorded. A continued history keeps counting
+    the iterations from its last row. Use HistoryReader to read the files
+    back.
+
+    Parameters
+    ----------
+    path : str
+        Directory to write the history to.
+    includes : list of str or None
+        Glob patterns of the variables to store. All driver outputs are stored if None.
+    append : bool
+        Flag to keep the rows of an earlier run with the same variables.
+    """
+
+    def __init__(self, path, includes=None, append=False):
+        super().__init__(record_viewer_data=False)
+        self.path = path
+        self.includes = includes
+        self.append = append
+
+        self._columns = None
+        self._abs2prom = {}
+
+    def startup(self, recording_requester, comm=None):
+        super().startup(recording_requester, comm)
+
+        # Without MPI the recorder never gets told which procs record
+        if self._record_on_proc is None:
+            self._record_on_proc = True
+
+        self._columns = None
+
+        # The driver data is keyed by the absolute names, the history by the promoted ones
+        model = recording_requester._problem().model
+        meta = model.get_io_metadata(iotypes="output", get_remote=True)
+        self._abs2prom = {name: var_meta["prom_name"] for name, var_meta in meta.items()}
+
+    def _setup_columns(self, outputs):
+        """Picks the variables to store from the first iteration and writes the index."""
+        names = [
+            name
+            for name in outputs
+            if self.includes is None
+            or any(fnmatchcase(self._abs2prom.get(name, name), pattern) for pattern in self.includes)
+        ]
+
+        # Bookkeeping columns come first
+        columns = {
+            "counter": {"file": "counter.f8", "shape": []},
+            "timestamp": {"file": "timestamp.f8", "shape": []},
+            "success": {"file": "success.f8", "shape": []},
+        }
+        for i, name in enumerate(names):
+            columns[self._abs2prom.get(name, name)] = {
+                "file": f"var_{i:04d}.f8",
+                "source": name,
+                "shape": list(np.shape(outputs[name])),
+            }
+
+        os.makedirs(self.path, exist_ok=True)
+        index_file = os.path.join(self.path, INDEX_FILE)
+
+        # Only continue an earlier history if it stores the same columns
+        if self.append and os.path.isfile(index_file):
+            with open(index_file) as f:
+                if json.load(f)["columns"] == columns:
+                    self._columns = columns
+                    self._continue()
+                    return
+
+        for column in columns.values():
+            open(os.path.join(self.path, column["file"]), "wb").close()
+        with open(index_file, "w") as f:
+            json.dump({"columns": columns}, f, indent=2)
+
+        self._columns = columns
+
+    def _continue(self):
+        """Drops a partially written last row of the earlier history and counts on from its rows."""
+        num_rows = len(HistoryReader(self.path))
+        for column in self._columns.values():
+            size = int(np.prod(column["shape"]))
+            os.truncate(os.path.join(self.path, column["file"]), 8 * size * num_rows)
+
+        # The counter of the first new iteration was already incremented
+        self._counter += num_rows
+
+    def _write(self, row):
+        for name, column in self._columns.items():
+            with open(os.path.join(self.path, column["file"]), "ab") as f:
+                f.write(np.asarray(row[name], dtype="<f8").tobytes())
+
+    def record_iteration_driver(self, recording_requester, data, metadata):
+        if not self._record_on_proc:
+            return
+
+        outputs = data["output"]
+        if self._columns is None:
+            self._setup_columns(outputs)
+
+        row = {
+            "counter": self._counter,
+            "timestamp": metadata.get("timestamp", time.time()),
+            "success": metadata.get("success", 1),
+        }
+        for name, column in self._columns.items():
+            if name not in row:
+                row[name] = np.asarray(outputs[column["source"]], dtype=float).ravel()
+        self._write(row)
+
+    def record_iteration_system(self, recording_requester, data, metadata):
+        raise RuntimeError("StreamRecorder can only be attached to a driver")
+
+    def record_iteration_solver(self, recording_requester, data, metadata):
+        raise RuntimeError("StreamRecorder can only be attached to a driver")
+
+    def record_iteration_problem(self, recording_requester, data, metadata):
+        raise RuntimeError("StreamRecorder can only be attached to a driver")
+
+    def record_metadata_system(self, system, run_number=None):
+        pass
+
+    def record_metadata_solver(self, solver, run_number=None):
+        pass
+
+    def record_derivatives_driver(self, recording_requester, data, metadata):
+        pass
+
+    def record_viewer_data(self, model_viewer_data):
+        pass
+
+
+class HistoryReader:
+    """
+    Reads a history written by StreamRecorder.
+
+    The columns are memory-mapped, so only the parts that are used are
+    read from disk. A partially written last row is ignored.
+
+    Parameters
+    ----------
+    path : str
+        Directory the history was written to.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            self.columns = json.load(f)["columns"]
+
+    @property
+    def names(self):
+        """Names of the stored variables, without the bookkeeping columns."""
+        return [name for name in self.columns if name not in ["counter", "timestamp", "success"]]
+
+    def _num_rows(self, column):
+        size = int(np.prod(column["shape"]))
+        return os.path.getsize(os.path.join(self.path, column["file"])) // (8 * size)
+
+    def __len__(self):
+        return min(self._num_rows(column) for column in self.columns.values())
+
+    def __getitem__(self, name):
+        """Returns the history of a variable as an array with one row per iteration."""
+        column = self.columns[name]
+        n = len(self)
+        shape = (n, *column["shape"])
+        if n == 0:
+            return np.zeros(shape)
+
+        return np.memmap(os.path.join(self.path, column["file"]), dtype="<f8", mode="r", shape=shape)
+
+    def to_dict(self, names=None):
+        """Returns in-memory copies of the histories of the given variables, or of all of them."""
+        names = self.names if names is None else names
+        return {name: np.array(self[name]) for name in names}
@@ -0,0 +1,90 @@
+# Standard Python modules
+import sys
+
+# External modules
+from mpi4py import MPI
+import numpy as np
+from tabulate import tabulate
+
+
+def split_comm(num_groups, comm=MPI.COMM_WORLD):
+    """
+    Splits a comm into num_groups contiguous blocks of procs.
+
+    Returns
+    -------
+    subcomm : MPI.Comm
+        The comm of the group this proc is in.
+    color : int
+        The index of the group.
+    """
+    if num_groups > comm.size:
+        raise ValueError(f"Cannot split {comm.size} procs into {num_groups} groups")
+
+    color = comm.rank * num_groups // comm.size
+    return comm.Split(color, comm.rank), color
+
+
+def parallel_check_totals(prob, color, num_groups, comm=MPI.COMM_WORLD, out_stream=sys.stdout, **kwargs):
+    """
+    Checks the total derivatives of prob with the design variables split between groups of procs.
+
+    Every group has its own copy of the problem on the comm returned by
+    split_comm and only perturbs every num_groups-th design variable. The
+    comparisons of all groups are gathered and printed as one table on
+    the root proc of comm.
+
+    Parameters
+    ----------
+    prob : Problem
+        The problem of this group, already set up on the group's comm.
+    color : int
+        The index of this group.
+    num_groups : int
+        The number of groups.
+    comm : MPI.Comm
+        The comm that was split into the groups.
+    out_stream : file-like or None
+        Where to print the table.
+    **kwargs : dict
+        Passed on to check_totals, e.g. method, step and form.
+
+    Returns
+    -------
+    data : dict or None
+        The analytic and approximated jacobians of all groups, keyed by (of, wrt), on the root proc.
+        None on the other procs.
+    """
+    wrt = list(prob.model.get_design_vars())[color::num_groups]
+
+    # Keep only the jacobians, they are all that is needed for the table
+    data = {}
+    if len(wrt) > 0:
+        for key, vals in prob.check_totals(wrt=wrt, out_stream=None, **kwargs).items():
+            J = vals["J_rev"] if "J_rev" in vals else vals["J_fwd"]
+            data[key] = {"J": J, "J_fd": vals["J_fd"]}
+
+    # Only one proc per group sends its results
+    send = data if prob.comm.rank == 0 else None
+    all_data = comm.gather(send, root=0)
+
+    if comm.rank != 0:
+        return None
+
+    merged = {}
+    for group_data in all_data:
+        if group_data is not None:
+            merged.update(group_data)
+
+    if out_stream is not None:
+        table = []
+        for (of, wrt_name), vals in merged.items():
+            J, J_fd = vals["J"], vals["J_fd"]
+            abs_err = np.linalg.norm(J - J_fd)
+            rel_err = abs_err / max(np.linalg.norm(J_fd), 1e-30)
+            table.append([of, wrt_name, np.linalg.norm(J), np.linalg.norm(J_fd), abs_err, rel_err])
+
+        headers = ["Of", "Wrt", "|J|", "|J_fd|", "Abs error", "Rel error"]
+        print(tabulate(table, headers=headers, floatfmt=".4e"), file=out_stream, flush=True)
+
+    return merged
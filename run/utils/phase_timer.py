@@ -0,0 +1,167 @@
+"""Wall time, call count and memory instrumentation of the systems in a model"""
+
+# Standard Python modules
+from collections import defaultdict
+import csv
+import functools
+import json
+import os
+import resource
+import time
+
+# Methods that are timed on every instrumented system, with the name they get in the trace
+TIMED_METHODS = {
+    "_solve_nonlinear": "solve_nonlinear",
+    "_apply_linear": "apply_linear",
+    "_solve_linear": "solve_linear",
+    "_linearize": "linearize",
+    "_transfer": "transfer",
+}
+
+
+class PhaseTimer:
+    """
+    Times the nonlinear and linear methods of the systems in a model.
+
+    Every system down to max_depth gets its solve_nonlinear (compute for
+    explicit components), apply_linear, solve_linear, linearize and
+    transfer methods wrapped with a timer. The times of a group include
+    the times of its subsystems. A record is written after every model
+    evaluation and, if a driver is attached, after every total derivative
+    evaluation. The timers of all procs are reduced to the root proc,
+    which appends the record to timing.jsonl and timing.csv in the output
+    directory. The timers are reset after every record, so each record
+    only holds the time since the previous one.
+
+    Parameters
+    ----------
+    model : Group
+        The model to instrument. It has to be set up.
+    output_dir : str
+        Directory to write the trace files to.
+    max_depth : int
+        Depth of the deepest systems to instrument. The model has depth 0.
+    """
+
+    def __init__(self, model, output_dir, max_depth=4):
+        self.model = model
+        self.output_dir = output_dir
+        self.comm = model.comm
+        self.driver = None
+
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.num_records = 0
+
+        for system in model.system_iter(include_self=True, recurse=True):
+            depth = 0 if system.pathname == "" else system.pathname.count(".") + 1
+            if depth <= max_depth:
+                self._instrument(system)
+
+        self._wrap_record(model, "run_solve_nonlinear", "analysis")
+
+        if self.comm.rank == 0:
+            os.makedirs(output_dir, exist_ok=True)
+            with open(os.path.join(output_dir, "timing.csv"), "w", newline="") as f:
+                csv.writer(f).writerow(
+                    ["record", "iteration", "kind", "name", "calls", "time_max", "time_sum", "num_procs"]
+                )
+            open(os.path.join(output_dir, "timing.jsonl"), "w").close()
+
+    def _instrument(self, system):
+        name = system.pathname if system.pathname else "model"
+        for method, label in TIMED_METHODS.items():
+            func = getattr(system, method, None)
+            # Do not time a method twice if the model is set up again
+            if func is None or getattr(func, "_phase_timer", None) is self:
+                continue
+            setattr(system, method, self._timed(func, f"{name}:{label}"))
+
+    def _timed(self, func, key):
+        times = self.times
+        calls = self.calls
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                times[key] += time.perf_counter() - t0
+                calls[key] += 1
+
+        wrapper._phase_timer = self
+        return wrapper
+
+    def _wrap_record(self, obj, method, kind):
+        func = getattr(obj, method)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            self.record(kind)
+            return result
+
+        setattr(obj, method, wrapper)
+
+    def attach_driver(self, driver):
+        """Writes a record after every total derivative evaluation of a driver, tagged with its iteration."""
+        self.driver = driver
+        self._wrap_record(driver, "_compute_totals", "totals")
+
+    def record(self, kind):
+        """Reduces the timers of all procs, writes them as one record and resets them. Collective."""
+        # Peak resident memory of this proc in MB, linux reports it in kB
+        mem = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+        local = {key: (self.calls[key], self.times[key]) for key in self.times}
+        all_local = self.comm.gather(local, root=0)
+        all_mem = self.comm.gather(mem, root=0)
+
+        self.times.clear()
+        self.calls.clear()
+        self.num_records += 1
+
+        if self.comm.rank != 0:
+            return
+
+        # Systems that live on several procs report the slowest proc and the total
+        phases = {}
+        for proc_data in all_local:
+            for key, (calls, t) in proc_data.items():
+                phase = phases.setdefault(key, {"calls": 0, "time_max": 0.0, "time_sum": 0.0, "num_procs": 0})
+                phase["calls"] = max(phase["calls"], calls)
+                phase["time_max"] = max(phase["time_max"], t)
+                phase["time_sum"] += t
+                phase["num_procs"] += 1
+
+        iteration = self.driver.iter_count if self.driver is not None else None
+        trace = {
+            "record": self.num_records,
+            "iteration": iteration,
+            "kind": kind,
+            "time": time.time(),
+            "mem_max_mb": max(all_mem),
+            "mem_per_proc_mb": all_mem,
+            "phases": phases,
+        }
+
+        with open(os.path.join(self.output_dir, "timing.jsonl"), "a") as f:
+            f.write(json.dumps(trace) + "\n")
+
+        with open(os.path.join(self.output_dir, "timing.csv"), "a", newline="") as f:
+            writer = csv.writer(f)
+            for key in sorted(phases, key=lambda k: -phases[k]["time_max"]):
+                phase = phases[key]
+                writer.writerow(
+                    [
+                        self.num_records,
+                        iteration,
+                        kind,
+                        key,
+                        phase["calls"],
+                        f"{phase['time_max']:.6f}",
+                        f"{phase['time_sum']:.6f}",
+                        phase["num_procs"],
+                    ]
+                )
@@ -6,6 +6,10 @@ InitialConditions = namedtuple(
 )
 
 def get_point_specs(feedfwd: bool = False):
+    # Every key is a point. Top builds one scenario for each point and the
+    # first point is used as the design point. New points need an entry in
+    # all of the dicts below.
+
     # flight conditions
     alpha = {
         "cruise0": 0.0,
@@ -0,0 +1,60 @@
+"""Wall times of the phases of the problem setup, reported per proc"""
+
+# Standard Python modules
+from contextlib import contextmanager
+import json
+import os
+import time
+
+# External modules
+from tabulate import tabulate
+
+# Times of the phases of this proc in the order they were first entered
+_PHASES = {}
+
+
+@contextmanager
+def startup_phase(name):
+    """Adds the wall time of the block to a phase. Phases that are entered more than once are summed."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _PHASES[name] = _PHASES.get(name, 0.0) + time.perf_counter() - t0
+
+
+def report_startup(comm, file_name=None):
+    """
+    Prints the slowest and fastest proc of every phase on the root proc. Collective.
+
+    Phases are nested, e.g. geometry is part of setup, so the times do not
+    add up to the total. Phases that only run on some procs, like the
+    scenarios of a parallel multipoint model, report the procs they ran on.
+
+    Parameters
+    ----------
+    comm : MPI.Comm
+        Comm of the problem.
+    file_name : str or None
+        JSON file to write the times of all procs to.
+    """
+    all_phases = comm.gather(dict(_PHASES), root=0)
+    if comm.rank != 0:
+        return
+
+    names = []
+    for phases in all_phases:
+        names.extend(name for name in phases if name not in names)
+
+    table = []
+    for name in names:
+        times = [phases[name] for phases in all_phases if name in phases]
+        table.append([name, max(times), min(times), len(times)])
+
+    print("\nStartup times:")
+    print(tabulate(table, headers=["Phase", "Max (s)", "Min (s)", "Procs"], floatfmt=".3f"), flush=True)
+
+    if file_name is not None:
+        os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+        with open(file_name, "w") as f:
+            json.dump({"phases": names, "times": all_phases}, f, indent=2)
@@ -0,0 +1,130 @@
+"""Binary, memory mapped copies of the Plot3D surface files of the integration surfaces and the actuator zone"""
+
+# Standard Python modules
+import os
+
+# External modules
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Points closer than this are merged, like in the reader of ADflow
+MERGE_TOL = 1e-12
+
+
+def binary_files(xyz_file):
+    """Returns the names of the point and connectivity files of the binary copy of a Plot3D surface file."""
+    stem = os.path.splitext(xyz_file)[0]
+    return f"{stem}.pts.npy", f"{stem}.conn.npy"
+
+
+def read_plot3d_surface(xyz_file):
+    """
+    Reads a multi-zone Plot3D surface file into unique points and quad connectivity.
+
+    The result is the same surface as the reader of ADflow returns for
+    convertToTris=False, with the points shared by the zones merged and
+    the connectivity 0-based.
+
+    Parameters
+    ----------
+    xyz_file : str
+        Plot3D surface file.
+
+    Returns
+    -------
+    pts : ndarray
+        Points of shape (num points, 3).
+    conn : ndarray
+        Connectivity of the quads of shape (num quads, 4).
+    """
+    with open(xyz_file, "r") as f:
+        data = f.read().split()
+
+    num_zones = int(data[0])
+    sizes = np.array(data[1 : 1 + 3 * num_zones], dtype=int).reshape((num_zones, 3))
+    coords = np.array(data[1 + 3 * num_zones :], dtype=float)
+
+    pts = []
+    conn = []
+    start = 0
+    num_pts = 0
+    for ni, nj, _ in sizes:
+        size = ni * nj
+        # Every zone stores all x, then all y, then all z, with i running fastest
+        pts.append(coords[start : start + 3 * size].reshape((3, size)).T)
+        start += 3 * size
+
+        ind = num_pts + np.arange(size).reshape((nj, ni))
+        conn.append(
+            np.stack([ind[:-1, :-1], ind[:-1, 1:], ind[1:, 1:], ind[1:, :-1]], axis=-1).reshape((-1, 4))
+        )
+        num_pts += size
+
+    pts = np.concatenate(pts)
+    conn = np.concatenate(conn)
+
+    # Every point is replaced by the first point it coincides with
+    link = np.arange(len(pts))
+    pairs = cKDTree(pts).query_pairs(MERGE_TOL, output_type="ndarray")
+    if len(pairs) > 0:
+        np.minimum.at(link, pairs[:, 1], pairs[:, 0])
+    unique, inverse = np.unique(link, return_inverse=True)
+
+    return pts[unique], inverse[conn]
+
+
+def convert_surface_file(xyz_file):
+    """Writes the binary copy of a Plot3D surface file next to it and returns the number of points and quads."""
+    pts, conn = read_plot3d_surface(xyz_file)
+    for file_name, arr in zip(binary_files(xyz_file), [pts, conn]):
+        # Written under a temporary name so a running job never maps a partial file
+        tmp_file = f"{file_name}.tmp.npy"
+        np.save(tmp_file, np.ascontiguousarray(arr))
+        os.replace(tmp_file, file_name)
+
+    return len(pts), len(conn)
+
+
+def load_surface(xyz_file):
+    """
+    Maps the binary copy of a Plot3D surface file.
+
+    The files are mapped read-only, so all procs on a node share the pages
+    of one copy in the page cache instead of each parsing the text file.
+
+    Returns
+    -------
+    pts, conn : ndarray or None
+        The mapped points and connectivity, or None if there is no binary
+        copy or it is older than the text file.
+    """
+    pts_file, conn_file = binary_files(xyz_file)
+    if not (os.path.isfile(pts_file) and os.path.isfile(conn_file)):
+        return None, None
+
+    if os.path.isfile(xyz_file) and min(map(os.path.getmtime, [pts_file, conn_file])) < os.path.getmtime(xyz_file):
+        return None, None
+
+    return np.load(pts_file, mmap_mode="r"), np.load(conn_file, mmap_mode="r")
+
+
+def use_binary_surfaces(CFDSolver):
+    """
+    Makes an ADflow solver read the surface files from their binary copies.
+
+    addIntegrationSurface and addActuatorRegion read their Plot3D file
+    with the surface reader of the solver. The reader is replaced with one
+    that maps the binary copy written by convert_surface_file and falls
+    back to the text file if there is none.
+    """
+    read_surf_file = CFDSolver._readPlot3DSurfFile
+
+    def read_binary_surf_file(fileName, convertToTris=True, **kwargs):
+        if not convertToTris and kwargs.get("coordXfer") is None:
+            pts, conn = load_surface(fileName)
+            if pts is not None:
+                return pts, conn
+
+        return read_surf_file(fileName, convertToTris=convertToTris, **kwargs)
+
+    CFDSolver._readPlot3DSurfFile = read_binary_surf_file
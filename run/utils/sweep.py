@@ -0,0 +1,149 @@
+"""Off-design sweeps of a set up Top model over a table of flight conditions"""
+
+# Standard Python modules
+import csv
+
+# External modules
+from mpi4py import MPI
+import numpy as np
+import openmdao.api as om
+
+# Columns of the sweep table. thrust is optional.
+SWEEP_COLUMNS = ["alpha", "mach", "altitude", "thrust"]
+
+
+def read_sweep_table(file_name):
+    """
+    Reads the flight conditions of a sweep from a CSV file with a header row.
+
+    The alpha, mach and altitude columns are required, thrust is optional.
+    Other columns are ignored.
+
+    Returns
+    -------
+    points : list of dict
+        One dict of the column values per row.
+    """
+    with open(file_name, newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [name for name in SWEEP_COLUMNS[:3] if name not in reader.fieldnames]
+        if len(missing) > 0:
+            raise ValueError(f"The sweep table {file_name} has no columns {missing}")
+
+        columns = [name for name in SWEEP_COLUMNS if name in reader.fieldnames]
+        return [{name: float(row[name]) for name in columns} for row in reader]
+
+
+def order_points(points, start):
+    """
+    Orders the points so that each one is the nearest remaining point to the previous one.
+
+    The distances are measured with every column scaled by its range in
+    the table, so that no column dominates because of its units.
+
+    Parameters
+    ----------
+    points : list of dict
+        The flight conditions.
+    start : dict
+        The flight condition the model is at before the sweep.
+
+    Returns
+    -------
+    order : list of int
+        Indices of the points in the order to run them.
+    """
+    columns = list(points[0].keys())
+    X = np.array([[point[name] for name in columns] for point in points])
+    scale = np.ptp(X, axis=0)
+    scale[scale == 0.0] = 1.0
+    X = X / scale
+
+    current = np.array([start.get(name, X[0, i] * scale[i]) for i, name in enumerate(columns)]) / scale
+    remaining = list(range(len(points)))
+    order = []
+    while len(remaining) > 0:
+        dist = np.linalg.norm(X[remaining] - current, axis=1)
+        nearest = remaining.pop(int(np.argmin(dist)))
+        order.append(nearest)
+        current = X[nearest]
+
+    return order
+
+
+def run_sweep(prob, inputs, outputs, points, out_file, start=None, checkpoint=None):
+    """
+    Runs the model at every point of a sweep and streams the results to a CSV file.
+
+    The model is set up once and every point starts from the solution of
+    the previous one, so the points are run in the order of order_points.
+    Points whose analysis fails are written with NaN results and the
+    sweep continues. With a checkpoint, the states of every converged
+    point are saved, and the next point after a failure starts from the
+    last converged solution instead of the failed one.
+
+    Parameters
+    ----------
+    prob : Problem
+        The set up problem.
+    inputs : dict
+        Names of the model inputs to set, keyed by the sweep column.
+    outputs : dict
+        Names of the model outputs to write, keyed by the CSV column.
+    points : list of dict
+        The flight conditions.
+    out_file : str
+        CSV file to write the results to.
+    start : dict or None
+        The flight condition the model is at before the sweep.
+    checkpoint : Checkpoint or None
+        Checkpoint to save the converged states to and restore them from after a failure.
+    """
+    comm = MPI.COMM_WORLD
+    order = order_points(points, start if start is not None else {})
+
+    header = ["point"] + list(points[0].keys()) + list(outputs.keys()) + ["failed"]
+    if comm.rank == 0:
+        f = open(out_file, "w", newline="")
+        writer = csv.writer(f)
+        writer.writerow(header)
+        f.flush()
+
+    # Only the states saved by this sweep are restored, not the files of an earlier run
+    saved = False
+    for count, i in enumerate(order):
+        point = points[i]
+        if comm.rank == 0:
+            print(f"Sweep point {count + 1} of {len(points)}: {point}", flush=True)
+
+        for name, val in point.items():
+            if name in inputs:
+                prob.set_val(inputs[name], val)
+
+        failed = False
+        try:
+            prob.run_model()
+        except om.AnalysisError:
+            failed = True
+
+        # A failed scenario only raises on its own procs, the rest have to skip the collective gathering as well
+        failed = comm.allreduce(failed, op=MPI.LOR)
+
+        if checkpoint is not None and not failed:
+            checkpoint.save()
+            saved = True
+
+        results = []
+        for name in outputs.values():
+            val = np.nan if failed else prob.get_val(name, get_remote=True)[0]
+            results.append(val)
+
+        if comm.rank == 0:
+            writer.writerow([i] + list(point.values()) + results + [int(failed)])
+            f.flush()
+
+        if checkpoint is not None and failed and saved:
+            checkpoint.load()
+
+    if comm.rank == 0:
+        f.close()